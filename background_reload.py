@@ -0,0 +1,77 @@
+import queue, sys, threading
+from env_document import EnvDocument
+from perf_log import span
+
+
+class BackgroundReloader:
+    # Parses env.json on a worker thread and hands the finished document to
+    # the Tk thread, which picks it up with after(). Tk widgets are only ever
+    # touched from the Tk thread.
+    def __init__(self, root, on_loaded, on_error, interval=100):
+        self.root = root
+        self.on_loaded = on_loaded
+        self.on_error = on_error
+        self.interval = interval
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.calls = queue.Queue()
+        self.worker = threading.Thread(target=self.work, name="BackgroundReloader", daemon=True)
+        self.worker.start()
+        self.poll_id = self.root.after(self.interval, self.poll)
+
+    def request(self, file_path):
+        # Safe to call from any thread, e.g. a file watcher callback
+        self.requests.put(file_path)
+
+    def call_in_ui(self, callback, *args):
+        # Runs callback on the Tk thread at the next poll, once however many
+        # identical calls were queued; safe from any thread
+        self.calls.put((callback, args))
+
+    def work(self):
+        while True:
+            file_path = self.requests.get()
+            # Requests that piled up during the last parse collapse into one
+            while file_path is not None and not self.requests.empty():
+                file_path = self.requests.get_nowait()
+            if file_path is None:
+                return
+            try:
+                with span('reload'):
+                    document = EnvDocument.load(file_path, lazy=True, cache=True)
+                self.results.put((file_path, document, None))
+            except Exception as e:
+                self.results.put((file_path, None, e))
+
+    def poll(self):
+        # Rescheduled even if a callback raises; each callback's exception is
+        # reported like any other Tk callback error and the rest still run
+        try:
+            result = None
+            while not self.results.empty():
+                result = self.results.get_nowait()
+            if result is not None:
+                file_path, document, error = result
+                if error is None:
+                    self.run_callback(self.on_loaded, file_path, document)
+                else:
+                    self.run_callback(self.on_error, file_path, error)
+            calls = []
+            while not self.calls.empty():
+                call = self.calls.get_nowait()
+                if call not in calls:
+                    calls.append(call)
+            for callback, args in calls:
+                self.run_callback(callback, *args)
+        finally:
+            self.poll_id = self.root.after(self.interval, self.poll)
+
+    def run_callback(self, callback, *args):
+        try:
+            callback(*args)
+        except Exception:
+            self.root.report_callback_exception(*sys.exc_info())
+
+    def stop(self):
+        self.requests.put(None)
+        self.root.after_cancel(self.poll_id)
@@ -0,0 +1,132 @@
+# Writes a synthetic env.json shaped like a WolvenKit export, for the
+# benchmarks or for trying the GUI on a big file.
+#
+#   python -m benchmarks.generate big_env.json --states 500 --transitions dense --areas 300 --points 16
+import argparse, random
+from env_loader import dumps_env
+from env_ops import make_curve, new_state
+
+AREA_TYPES = ('FogAreaSettings', 'ColorGradingAreaSettings', 'SkyAreaSettings', 'CloudsAreaSettings', 'LightingAreaSettings')
+
+
+def make_curve_points(points, rng):
+    curve = make_curve(0.0)
+    curve['Elements'] = [{'Point': round(24 * index / points, 3), 'Value': round(rng.random(), 4)} for index in range(points)]
+    return curve
+
+
+def transition_pairs(states, transitions, rng):
+    # 'dense' or anything >= states² gives every ordered pair
+    if transitions == 'dense' or transitions >= states * states:
+        return [(source, target) for source in range(states) for target in range(states)]
+    pairs = set()
+    while len(pairs) < transitions:
+        pairs.add((rng.randrange(states), rng.randrange(states)))
+    return sorted(pairs)
+
+
+def make_env(states=100, transitions=400, areas=50, points=8, seed=0):
+    rng = random.Random(seed)
+    # Its own generator, so the transitions match files made before states had curves
+    curve_rng = random.Random(f"{seed}-curves")
+    handle_id = 0
+    weather_states = []
+    for index in range(states):
+        state = new_state(f"bench_state_{index}", handle_id=str(handle_id))
+        if index % 3 == 0:
+            state['Data']['effect']['DepotPath']['$storage'] = 'string'
+            state['Data']['effect']['DepotPath']['$value'] = f"base\\fx\\weather\\bench_{index}.effect"
+        if index % 2 == 0:
+            # Like the vanilla states, half change their chances through the day
+            state['Data']['probability'] = make_curve_points(points, curve_rng)
+        weather_states.append(state)
+        handle_id += 1
+
+    weather_state_transitions = []
+    for source, target in transition_pairs(states, transitions, rng):
+        weather_state_transitions.append({
+            'HandleId': str(handle_id),
+            'Data': {
+                '$type': 'worldWeatherStateTransition',
+                'probability': None,
+                'sourceWeatherState': {'HandleRefId': str(source)},
+                'targetWeatherState': {'HandleRefId': str(target)},
+                'transitionDuration': make_curve(0.5) if (source + target) % 5 == 0 else None
+            }
+        })
+        handle_id += 1
+
+    area_parameters = []
+    for index in range(areas):
+        area_id = handle_id
+        area_type = AREA_TYPES[index % len(AREA_TYPES)]
+        area_parameters.append({
+            'HandleId': str(area_id),
+            'Data': {
+                '$type': area_type,
+                'enable': 1 if index % 4 else 0,
+                'hdrMode': {'HandleId': str(area_id + 1), 'Data': {'$type': 'HDRModeAreaSettings'}},
+                'mode': {'HandleId': str(area_id + 2), 'Data': {'$type': 'ModeAreaSettings'}},
+                'curves': [make_curve_points(points, rng) for _ in range(4)],
+                'ref': {'HandleRefId': str(area_id + 1)}
+            }
+        })
+        handle_id += 3
+
+    return {
+        'Header': {
+            'WolvenKitVersion': '8.14.0',
+            'WKitJsonVersion': '0.0.8',
+            'GameVersion': 2120,
+            'DataType': 'CR2W',
+            'ArchiveFileName': ''
+        },
+        'Data': {
+            'Version': 195,
+            'BuildVersion': 0,
+            'RootChunk': {
+                '$type': 'worldEnvironmentDefinition',
+                'weatherStates': weather_states,
+                'weatherStateTransitions': weather_state_transitions,
+                'renderSettingFactors': {
+                    'resolutionFilmGrainScale': make_curve_points(points, rng),
+                    'resolutionFilmGrainStrength': make_curve_points(points, rng)
+                },
+                'worldRenderSettings': {'areaParameters': area_parameters}
+            },
+            'EmbeddedFiles': []
+        }
+    }
+
+
+def write_env(file_path, **options):
+    with open(file_path, 'w', encoding='utf-8') as file:
+        file.write(dumps_env(make_env(**options)))
+
+
+def transitions_arg(text):
+    return text if text == 'dense' else int(text)
+
+
+def add_size_arguments(parser):
+    parser.add_argument('--states', type=int, default=100)
+    parser.add_argument('--transitions', type=transitions_arg, default=400, help="a count, or 'dense' for every ordered pair")
+    parser.add_argument('--areas', type=int, default=50)
+    parser.add_argument('--points', type=int, default=8, help="points per area and film grain curve")
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def size_options(args):
+    return {'states': args.states, 'transitions': args.transitions, 'areas': args.areas, 'points': args.points, 'seed': args.seed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic env.json")
+    parser.add_argument('output')
+    add_size_arguments(parser)
+    args = parser.parse_args()
+    write_env(args.output, **size_options(args))
+
+
+if __name__ == "__main__":
+    main()
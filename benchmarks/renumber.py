@@ -0,0 +1,158 @@
+# Compares HandleRenumberer against the ensure_unique_handle_ids that used to
+# live in main.py and transitions.py.
+#
+#   python -m benchmarks.renumber --states 2000 --transitions 8000 --areas 500
+import argparse, copy, time
+from handle_ids import HandleRenumberer
+
+
+def legacy_ensure_unique_handle_ids(data):
+    handle_id = 0
+    handle_id_map = {}
+
+    for state in data['Data']['RootChunk']['weatherStates']:
+        state['HandleId'] = str(handle_id)
+        handle_id_map[state['HandleId']] = handle_id
+        handle_id += 1
+
+    for transition in data['Data']['RootChunk']['weatherStateTransitions']:
+        transition['HandleId'] = str(handle_id)
+        handle_id_map[transition['HandleId']] = handle_id
+        handle_id += 1
+
+    for key, value in data['Data']['RootChunk'].items():
+        if key not in ['weatherStates', 'weatherStateTransitions']:
+            if isinstance(value, list):
+                for item in value:
+                    if 'HandleId' in item:
+                        item['HandleId'] = str(handle_id)
+                        handle_id_map[item['HandleId']] = handle_id
+                        handle_id += 1
+
+    def update_handle_ref_ids(data):
+        if isinstance(data, dict):
+            for key, value in data.items():
+                if key == 'HandleRefId' and value in handle_id_map:
+                    data[key] = str(handle_id_map[value])
+                else:
+                    update_handle_ref_ids(value)
+        elif isinstance(data, list):
+            for item in data:
+                update_handle_ref_ids(item)
+
+    update_handle_ref_ids(data['Data']['RootChunk'])
+
+    for transition in data['Data']['RootChunk']['weatherStateTransitions']:
+        source_id = transition['Data']['sourceWeatherState']['HandleRefId']
+        target_id = transition['Data']['targetWeatherState']['HandleRefId']
+        if source_id in handle_id_map:
+            transition['Data']['sourceWeatherState']['HandleRefId'] = str(handle_id_map[source_id])
+        if target_id in handle_id_map:
+            transition['Data']['targetWeatherState']['HandleRefId'] = str(handle_id_map[target_id])
+
+    for area in data['Data']['RootChunk']['worldRenderSettings']['areaParameters']:
+        area['HandleId'] = str(handle_id)
+        handle_id_map[area['HandleId']] = handle_id
+        handle_id += 1
+
+        if 'hdrMode' in area['Data']:
+            area['Data']['hdrMode']['HandleId'] = str(handle_id)
+            handle_id_map[area['Data']['hdrMode']['HandleId']] = handle_id
+            handle_id += 1
+
+        if 'mode' in area['Data']:
+            area['Data']['mode']['HandleId'] = str(handle_id)
+            handle_id_map[area['Data']['mode']['HandleId']] = handle_id
+            handle_id += 1
+
+
+def make_document(states, transitions, areas):
+    handle_id = 0
+    weather_states = []
+    for index in range(states):
+        weather_states.append({
+            'HandleId': str(handle_id),
+            'Data': {'$type': 'worldWeatherState', 'name': {'$type': 'CName', '$storage': 'string', '$value': f"state_{index}"}}
+        })
+        handle_id += 1
+
+    weather_state_transitions = []
+    for index in range(transitions):
+        weather_state_transitions.append({
+            'HandleId': str(handle_id),
+            'Data': {
+                '$type': 'worldWeatherStateTransition',
+                'probability': None,
+                'sourceWeatherState': {'HandleRefId': str(index % states)},
+                'targetWeatherState': {'HandleRefId': str((index * 7 + 1) % states)},
+                'transitionDuration': None
+            }
+        })
+        handle_id += 1
+
+    area_parameters = []
+    for index in range(areas):
+        area_id = handle_id
+        area_parameters.append({
+            'HandleId': str(area_id),
+            'Data': {
+                '$type': 'WorldRenderAreaSettings',
+                'hdrMode': {'HandleId': str(area_id + 1), 'Data': {'$type': 'HDRModeAreaSettings'}},
+                'mode': {'HandleId': str(area_id + 2), 'Data': {'$type': 'ModeAreaSettings'}},
+                'parameters': [{'curve': {'Elements': [{'Point': point, 'Value': 0.5} for point in range(8)]}}, {'HandleRefId': str(area_id + 1)}]
+            }
+        })
+        handle_id += 3
+
+    return {'Data': {'RootChunk': {
+        'weatherStates': weather_states,
+        'weatherStateTransitions': weather_state_transitions,
+        'worldRenderSettings': {'areaParameters': area_parameters}
+    }}}
+
+
+def best_of(function, documents):
+    timings = []
+    for document in documents:
+        start = time.perf_counter()
+        function(document)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time HandleId renumbering on a synthetic env.json")
+    parser.add_argument('--states', type=int, default=2000)
+    parser.add_argument('--transitions', type=int, default=8000)
+    parser.add_argument('--areas', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    template = make_document(args.states, args.transitions, args.areas)
+    handle_count = args.states + args.transitions + args.areas * 3
+    print(f"{handle_count} handles, best of {args.repeat}")
+
+    legacy = best_of(legacy_ensure_unique_handle_ids, [copy.deepcopy(template) for _ in range(args.repeat)])
+    print(f"ensure_unique_handle_ids   {legacy * 1000:9.2f} ms")
+
+    fresh = best_of(lambda data: HandleRenumberer().renumber(data['Data']['RootChunk']), [copy.deepcopy(template) for _ in range(args.repeat)])
+    print(f"HandleRenumberer (cold)    {fresh * 1000:9.2f} ms")
+
+    # Repeated saves on one document reuse the cached static locations
+    renumberer = HandleRenumberer()
+    cached_document = copy.deepcopy(template)
+    renumberer.renumber(cached_document['Data']['RootChunk'])
+    cached = best_of(lambda data: renumberer.renumber(data['Data']['RootChunk']), [cached_document] * args.repeat)
+    print(f"HandleRenumberer (cached)  {cached * 1000:9.2f} ms")
+
+    # Both must agree on the ids they hand out
+    expected = copy.deepcopy(template)
+    actual = copy.deepcopy(template)
+    legacy_ensure_unique_handle_ids(expected)
+    HandleRenumberer().renumber(actual['Data']['RootChunk'])
+    if expected != actual:
+        print("WARNING: renumbered documents differ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+# Times the code paths behind the GUI's buttons on a generated (or given)
+# env.json and writes the timings as JSON, so runs from two commits can be
+# compared.
+#
+#   python -m benchmarks.suite --states 500 --transitions 20000 --output before.json
+#   python -m benchmarks.suite --states 500 --transitions 20000 --compare before.json --max-slowdown 1.2
+import argparse, datetime, json, os, platform, statistics, subprocess, sys, tempfile, time
+import doc_cache
+from benchmarks.generate import add_size_arguments, size_options, write_env
+from checklist import CheckedNames
+from edit_history import RemoveStateEdit, StatePropertiesEdit
+from env_document import EnvDocument
+from curves import np
+from env_ops import check_curves, export_rows, format_lua
+from transitions import EditTransitionsApp
+from weather_simulation import WeatherModel, simulate
+
+
+class Selection:
+    # Stands in for the transitions window's listbox when there is no display
+    # to create the real one on
+    def __init__(self, items=(), index=None):
+        self.items = list(items)
+        self.index = index
+
+    def curselection(self):
+        return () if self.index is None else (self.index,)
+
+    def get(self, index):
+        return self.items[index[0] if isinstance(index, tuple) else index]
+
+
+class TransitionsHarness:
+    # Just enough of EditTransitionsApp to run its selection handler
+    on_left_listbox_select = EditTransitionsApp.on_left_listbox_select
+    get_state_id_by_name = EditTransitionsApp.get_state_id_by_name
+    get_state_name_by_id = EditTransitionsApp.get_state_name_by_id
+
+    def __init__(self, document, selected):
+        names = document.state_names()
+        self.document = document
+        self.left_listbox = Selection(names, names.index(selected))
+        self.preceding_list = CheckedNames(names)
+        self.target_list = CheckedNames(names)
+
+
+def open_transitions(document, selected):
+    # The real window when Tk can open a display, otherwise the harness
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:
+        return TransitionsHarness(document, selected), False
+    from env_session import EnvSession
+    app = EditTransitionsApp(root, EnvSession('', document))
+    index = document.state_names().index(selected)
+    app.left_listbox.selection_set(index)
+    return app, True
+
+
+class Context:
+    def __init__(self, env_path, work_dir):
+        self.env_path = env_path
+        self.work_dir = work_dir
+        names = self.load().state_names()
+        self.names = names
+        self.middle = names[len(names) // 2] if names else None
+        self.transitions = None
+        self.tk = False
+
+    def load(self):
+        return EnvDocument.load(self.env_path, lazy=True, cache=True)
+
+    def output_path(self, name):
+        return os.path.join(self.work_dir, name)
+
+
+def bench_load_json(context):
+    return lambda: EnvDocument.load(context.env_path, lazy=True, cache=True)
+
+
+def bench_load_json_uncached(context):
+    return lambda: EnvDocument.load(context.env_path, lazy=True)
+
+
+def bench_ensure_unique_handle_ids(context):
+    return context.load().ensure_unique_handle_ids
+
+
+def bench_remove_states(context):
+    # Goes through the edit history like the main window's <<< button, which
+    # runs update_handle_ids_after_removal
+    document = context.load()
+    return lambda: document.history.perform(RemoveStateEdit(context.middle))
+
+
+def bench_on_left_listbox_select(context):
+    # Selecting only reads the document, so one window serves every run
+    if context.transitions is None:
+        context.transitions, context.tk = open_transitions(context.load(), context.middle)
+    return lambda: context.transitions.on_left_listbox_select(None)
+
+
+def bench_export_states(context):
+    document = context.load()
+
+    def run():
+        with open(context.output_path('exportedWeatherStates.json'), 'w') as file:
+            file.write(format_lua(export_rows(document, context.names)))
+    return run
+
+
+def bench_save_json(context):
+    # One edited state, so the save splices a single entry into the old file
+    document = context.load()
+    document.history.perform(StatePropertiesEdit(context.middle, {'probability': 0.25}))
+    return lambda: document.save(context.output_path('env.json'), backups=0)
+
+
+def bench_save_json_after_remove(context):
+    # What the main window's Save does after a state was disabled
+    document = context.load()
+    document.history.perform(RemoveStateEdit(context.middle))
+
+    def run():
+        document.ensure_unique_handle_ids()
+        document.save(context.output_path('env.json'), backups=0)
+    return run
+
+
+def bench_check_curves(context):
+    # Every state's four curves at every minute of the day
+    document = context.load()
+    document.weather_states  # parsed outside the timed region
+    return lambda: check_curves(document, minutes=1)
+
+
+def bench_simulate(context):
+    # Ten thousand in-game days from the curves and transitions of the file
+    model = WeatherModel(context.load())
+    return lambda: simulate(model, days=10000, seed=0)
+
+
+BENCHMARKS = {
+    'load_json': bench_load_json,
+    'load_json_uncached': bench_load_json_uncached,
+    'ensure_unique_handle_ids': bench_ensure_unique_handle_ids,
+    'remove_states': bench_remove_states,
+    'on_left_listbox_select': bench_on_left_listbox_select,
+    'export_states': bench_export_states,
+    'save_json': bench_save_json,
+    'save_json_after_remove': bench_save_json_after_remove,
+}
+if np is not None:
+    BENCHMARKS['check_curves'] = bench_check_curves
+    BENCHMARKS['simulate'] = bench_simulate
+
+
+def measure(setup, context, warmup, repeat):
+    # Every run gets a fresh setup, outside the timed region, so benchmarks
+    # that change the document always start from the file on disk
+    times = []
+    for run in range(warmup + repeat):
+        function = setup(context)
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if run >= warmup:
+            times.append(elapsed)
+    return {
+        'repeat': repeat,
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'times': times,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    # Median ratios against an earlier run; returns the worst one
+    with open(baseline_path, 'r') as file:
+        baseline = json.load(file)
+    print(f"\ncompared with {baseline_path} ({baseline.get('commit')})")
+    worst = 0.0
+    for name, result in results['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            continue
+        ratio = result['median'] / before['median'] if before['median'] else float('inf')
+        worst = max(worst, ratio)
+        print(f"{name:28} {before['median'] * 1000:10.3f} ms -> {result['median'] * 1000:10.3f} ms  x{ratio:.2f}")
+    if baseline.get('size') != results['size']:
+        print("note: the baseline was run on a different document size")
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the env_switcher code paths on a synthetic env.json")
+    add_size_arguments(parser)
+    parser.add_argument('--env', metavar='PATH', help="benchmark this env.json instead of generating one")
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), metavar='NAME', help="run only these benchmarks")
+    parser.add_argument('--output', metavar='PATH', help="write the results as JSON")
+    parser.add_argument('--compare', metavar='PATH', help="a results file from an earlier run to compare with")
+    parser.add_argument('--max-slowdown', type=float, metavar='RATIO', help="with --compare, exit 1 if a median got slower than this")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='envswitcher-bench-') as work_dir:
+        # Keep the parse cache of the throwaway files out of the user's cache
+        doc_cache.CACHE_DIR = os.path.join(work_dir, 'cache')
+        env_path = args.env or os.path.join(work_dir, 'env.json')
+        if not args.env:
+            write_env(env_path, **size_options(args))
+        context = Context(env_path, work_dir)
+        print(f"{os.path.getsize(env_path) / 1e6:.1f} MB, {len(context.names)} states, warmup {args.warmup}, best/median of {args.repeat}")
+
+        results = {
+            'commit': git_commit(),
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'size': {'env': os.path.abspath(args.env)} if args.env else size_options(args),
+            'file_bytes': os.path.getsize(env_path),
+            'results': {},
+        }
+        for name in args.only or BENCHMARKS:
+            result = measure(BENCHMARKS[name], context, args.warmup, args.repeat)
+            results['results'][name] = result
+            print(f"{name:28} min {result['min'] * 1000:10.3f} ms   median {result['median'] * 1000:10.3f} ms")
+        results['tk'] = context.tk
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        worst = compare(results, args.compare)
+        if args.max_slowdown and worst > args.max_slowdown:
+            print(f"slower than x{args.max_slowdown}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
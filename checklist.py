@@ -0,0 +1,110 @@
+import tkinter as tk
+from tkinter import font as tkfont
+
+
+class CheckedNames:
+    # Which of a list of names are checked, as one byte per row. Setting a new
+    # selection only clears the rows the previous one had set, so it costs
+    # the number of checked rows, not the number of names.
+    def __init__(self, names=()):
+        self.set_names(names)
+
+    def set_names(self, names):
+        self.names = list(names)
+        self.rows = {}
+        for row, name in enumerate(self.names):
+            self.rows.setdefault(name, row)
+        self.checked = bytearray(len(self.names))
+        self.set_rows = set()
+
+    def set_checked(self, names):
+        for row in self.set_rows:
+            self.checked[row] = 0
+        self.set_rows = {self.rows[name] for name in names if name in self.rows}
+        for row in self.set_rows:
+            self.checked[row] = 1
+
+    def toggle(self, row):
+        self.checked[row] ^= 1
+        self.set_rows.add(row)
+
+    def is_checked(self, row):
+        return bool(self.checked[row])
+
+    def checked_names(self):
+        return [self.names[row] for row in sorted(self.set_rows) if self.checked[row]]
+
+
+class VirtualChecklist:
+    # A scrolling list of checkboxes drawn on a canvas. Only the rows in view
+    # exist as canvas items, so building it and changing the selection cost
+    # the same for ten states or a thousand.
+    def __init__(self, parent, command=None):
+        self.model = CheckedNames()
+        self.command = command
+        self.font = tkfont.nametofont('TkDefaultFont')
+        self.row_height = self.font.metrics('linespace') + 4
+        self.drawn = None
+
+        self.scrollbar = tk.Scrollbar(parent, orient=tk.VERTICAL, width=20)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.canvas = tk.Canvas(parent, highlightthickness=0, yscrollincrement=self.row_height, yscrollcommand=self.on_scrolled)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.config(command=self.canvas.yview)
+
+        self.canvas.bind('<Configure>', lambda event: self.redraw())
+        self.canvas.bind('<Button-1>', self.on_click)
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def set_names(self, names):
+        self.model.set_names(names)
+        self.canvas.configure(scrollregion=(0, 0, 0, len(self.model.names) * self.row_height))
+        self.redraw(force=True)
+
+    def set_checked(self, names):
+        self.model.set_checked(names)
+        self.redraw(force=True)
+
+    def checked_names(self):
+        return self.model.checked_names()
+
+    def on_scrolled(self, first, last):
+        self.scrollbar.set(first, last)
+        self.redraw()
+
+    def visible_rows(self):
+        top = self.canvas.canvasy(0)
+        first = max(0, int(top // self.row_height))
+        last = min(len(self.model.names), int((top + self.canvas.winfo_height()) // self.row_height) + 1)
+        return first, last
+
+    def redraw(self, force=False):
+        rows = self.visible_rows()
+        if rows == self.drawn and not force:
+            return
+        self.canvas.delete('row')
+        for row in range(*rows):
+            self.draw_row(row)
+        self.drawn = rows
+
+    def draw_row(self, row):
+        tags = ('row', f'row{row}')
+        y = row * self.row_height + self.row_height // 2
+        self.canvas.create_rectangle(10, y - 6, 22, y + 6, outline='grey40', fill='white', tags=tags)
+        if self.model.is_checked(row):
+            self.canvas.create_line(12, y, 15, y + 3, 20, y - 4, width=2, tags=tags)
+        self.canvas.create_text(28, y, text=self.model.names[row], anchor='w', font=self.font, tags=tags)
+
+    def on_click(self, event):
+        row = int(self.canvas.canvasy(event.y) // self.row_height)
+        if not 0 <= row < len(self.model.names):
+            return
+        self.model.toggle(row)
+        self.canvas.delete(f'row{row}')
+        self.draw_row(row)
+        if self.command:
+            self.command()
@@ -0,0 +1,141 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NUMPY_MISSING = "Evaluating curves needs NumPy: pip install numpy"
+
+# Curve Points are hours of the day. The day wraps around, so the stretch
+# after the last point blends back into the first one. Constant curves hold
+# each value until the next point; every other InterpolationType is evaluated
+# as Linear, since the json carries no tangents for the Bezier and Hermite ones.
+DAY = 24.0
+SPAN = 80.0
+ORIGIN = 28.0
+
+
+def curve_points(curve):
+    # [[point, value], ...] in the order they are stored; None for a null curve
+    if not isinstance(curve, dict):
+        return None
+    return [[element['Point'], element['Value']] for element in curve.get('Elements', [])]
+
+
+def format_points(curve):
+    # "0.5" for one point at noon, otherwise "hour:value" pairs: "6:0.1, 18:0.3"
+    points = curve_points(curve)
+    if points is None:
+        return ""
+    if len(points) == 1 and points[0][0] == 12:
+        return str(points[0][1])
+    return ", ".join(f"{point}:{value}" for point, value in points)
+
+
+def parse_points(text):
+    # The reverse of format_points: None, a number or a list of [point, value]
+    text = text.strip()
+    if text in ('', 'null'):
+        return None
+    if ':' not in text:
+        return float(text)
+    points = []
+    for item in text.replace(',', ' ').split():
+        point, separator, value = item.partition(':')
+        if not separator:
+            raise ValueError(f"Expected hour:value, got {item!r}")
+        point = float(point)
+        if not 0 <= point <= DAY:
+            raise ValueError(f"Curve points are hours from 0 to 24, got {point:g}")
+        points.append([int(point) if point.is_integer() else point, float(value)])
+    return sorted(points)
+
+
+class CurveStore:
+    # Many curves packed into flat arrays: the points and values of curve i
+    # are points[offsets[i]:offsets[i + 1]]. Null curves have no points and
+    # evaluate to nan. evaluate() looks up every (curve, hour) pair with one
+    # searchsorted over all curves at once.
+    def __init__(self, curves):
+        if np is None:
+            raise ImportError(NUMPY_MISSING)
+        self.curves = list(curves)
+        elements = [curve.get('Elements', []) if isinstance(curve, dict) else [] for curve in self.curves]
+        self.counts = np.array([len(items) for items in elements], dtype=np.int64)
+        self.offsets = np.zeros(len(self.curves) + 1, dtype=np.int64)
+        np.cumsum(self.counts, out=self.offsets[1:])
+        total = int(self.offsets[-1])
+        self.points = np.fromiter((element['Point'] for items in elements for element in items), dtype=float, count=total)
+        self.values = np.fromiter((element['Value'] for items in elements for element in items), dtype=float, count=total)
+        self.null = np.array([not isinstance(curve, dict) for curve in self.curves], dtype=bool)
+        self.steps = np.array([isinstance(curve, dict) and curve.get('InterpolationType') == 'Constant'
+                               for curve in self.curves], dtype=bool)
+
+    @classmethod
+    def for_states(cls, document, field):
+        return cls(state['Data'].get(field) for state in document.weather_states)
+
+    def __len__(self):
+        return len(self.curves)
+
+    def rows(self):
+        # The curve index of every point
+        return np.repeat(np.arange(len(self.curves)), self.counts)
+
+    def point_mask(self, mask):
+        # A per-curve mask spread over the curves' points
+        return np.repeat(mask, self.counts)
+
+    def ranges(self):
+        # (lowest, highest) value of every curve; nan for curves without points
+        low = np.full(len(self.curves), np.nan)
+        high = np.full(len(self.curves), np.nan)
+        filled = self.counts > 0
+        if filled.any():
+            starts = self.offsets[:-1][filled]
+            low[filled] = np.minimum.reduceat(self.values, starts)
+            high[filled] = np.maximum.reduceat(self.values, starts)
+        return low, high
+
+    def points_of(self, index):
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return [[point, value] for point, value in zip(self.points[start:end].tolist(), self.values[start:end].tolist())]
+
+    def wrapped(self):
+        # Sorted keys and values of every point, with each curve's last point
+        # repeated a day earlier and its first point a day later, so every
+        # hour of the day has a point on both sides within its own curve
+        filled = np.flatnonzero(self.counts > 0)
+        rows = self.rows()
+        order = np.lexsort((self.points, rows))
+        points, values = self.points[order], self.values[order]
+        firsts = self.offsets[filled]
+        lasts = self.offsets[filled + 1] - 1
+        base = filled * SPAN + ORIGIN
+        # Before the points, so a point at 0 wins a tie with the wrapped one at 24
+        keys = np.concatenate((base + points[lasts] - DAY, rows * SPAN + ORIGIN + points, base + points[firsts] + DAY))
+        values = np.concatenate((values[lasts], values, values[firsts]))
+        order = np.argsort(keys, kind='stable')
+        return keys[order], values[order]
+
+    def evaluate(self, hours):
+        # Values of every curve at every hour, shape (curves, hours)
+        hours = np.mod(np.asarray(hours, dtype=float), DAY)
+        result = np.full((len(self.curves), len(hours)), np.nan)
+        filled = np.flatnonzero(self.counts > 0)
+        if not len(filled) or not len(hours):
+            return result
+        keys, values = self.wrapped()
+        queries = (filled[:, None] * SPAN + ORIGIN + hours[None, :]).ravel()
+        left = np.searchsorted(keys, queries, side='right') - 1
+        right = left + 1
+        width = keys[right] - keys[left]
+        fraction = np.divide(queries - keys[left], width, out=np.zeros_like(queries), where=width > 0)
+        linear = values[left] + fraction * (values[right] - values[left])
+        stepped = np.repeat(self.steps[filled], len(hours))
+        result[filled] = np.where(stepped, values[left], linear).reshape(len(filled), len(hours))
+        return result
+
+    def day(self, minutes=1):
+        # Every curve sampled every few minutes from midnight
+        return self.evaluate(np.arange(0, DAY * 60, minutes) / 60)
+
@@ -0,0 +1,79 @@
+import hashlib, os, pickle
+from env_loader import PARSED_KEYS, EnvLayout, RawJSON, gc_paused, loads_env
+
+CACHE_VERSION = 1
+CACHE_DIR = os.environ.get('ENVSWITCHER_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'envswitcher')
+
+
+def cache_path(file_path):
+    name = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, f"{name}.pickle")
+
+
+def cache_key(file_path, stat, source, parsed_keys):
+    digest = hashlib.sha256(source).hexdigest()
+    return (CACHE_VERSION, os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, digest, tuple(parsed_keys))
+
+
+def read_entry(file_path, key, source):
+    # The key is pickled on its own in front of the payload, so a stale entry
+    # is rejected without unpickling the document
+    try:
+        with open(cache_path(file_path), 'rb') as file:
+            if pickle.load(file) != key:
+                return None
+            with gc_paused():
+                data, layout_spans, raw_keys = pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError):
+        return None
+
+    layout = EnvLayout(source, *layout_spans) if layout_spans else None
+    if raw_keys:
+        parsed = data['Data']['RootChunk']
+        data['Data']['RootChunk'] = {
+            member: RawJSON(layout.member_bytes(member)) if member in raw_keys else parsed[member]
+            for member in layout.members
+        }
+    return data, layout
+
+
+def write_entry(file_path, key, data, layout):
+    layout_spans = None
+    raw_keys = []
+    if layout is not None:
+        layout_spans = (layout.body_start, layout.body_end, layout.outer_indent, layout.member_indent,
+                        [(member, start, end) for member, (start, end) in layout.members.items()])
+        # Raw members are re-sliced from the file on a hit instead of being stored twice
+        root_chunk = data['Data']['RootChunk']
+        raw_keys = [member for member, value in root_chunk.items() if isinstance(value, RawJSON)]
+        data = dict(data, Data=dict(data['Data'], RootChunk={
+            member: value for member, value in root_chunk.items() if member not in raw_keys
+        }))
+
+    path = cache_path(file_path)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(temp_path, 'wb') as file:
+            pickle.dump(key, file, pickle.HIGHEST_PROTOCOL)
+            pickle.dump((data, layout_spans, raw_keys), file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def load_env_cached(file_path, parsed_keys=PARSED_KEYS):
+    with open(file_path, 'rb') as file:
+        stat = os.fstat(file.fileno())
+        source = file.read()
+
+    key = cache_key(file_path, stat, source, parsed_keys)
+    cached = read_entry(file_path, key, source)
+    if cached is not None:
+        return cached
+
+    with gc_paused():
+        data, layout = loads_env(source, parsed_keys)
+    write_entry(file_path, key, data, layout)
+    return data, layout
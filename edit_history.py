@@ -0,0 +1,309 @@
+from collections import deque
+from env_loader import gc_paused
+from env_ops import CURVE_FIELDS, get_state_data, set_factor_values, set_global_properties, set_many_properties, set_state_properties
+
+HISTORY_LIMIT = 500
+
+
+class EditHistory:
+    # Undo/redo made of edits that know how to revert themselves. An edit only
+    # keeps the values it replaced (old curve dicts, a removed state and its
+    # transitions), never a copy of the document, and the oldest edits fall
+    # off once limit is reached. With a journal attached every step is also
+    # written to it as an op dict (see edit_journal).
+    def __init__(self, document, limit=HISTORY_LIMIT):
+        self.document = document
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = []
+        self.journal = None
+
+    def perform(self, edit):
+        # Edits that change nothing return False and aren't recorded
+        if edit.apply(self.document) is False:
+            return False
+        self.undo_stack.append(edit)
+        self.redo_stack.clear()
+        if self.journal is not None:
+            self.journal.append(edit.to_op())
+        return True
+
+    def undo(self):
+        if not self.undo_stack:
+            return None
+        edit = self.undo_stack.pop()
+        edit.revert(self.document)
+        self.redo_stack.append(edit)
+        if self.journal is not None:
+            self.journal.append({'op': 'undo'})
+        return edit
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        edit = self.redo_stack.pop()
+        edit.apply(self.document)
+        self.undo_stack.append(edit)
+        if self.journal is not None:
+            self.journal.append({'op': 'redo'})
+        return edit
+
+
+def edit_from_op(document, op):
+    # The edit for an env_ops style op dict, e.g. one read back from a journal
+    kind = op.get('op')
+    if kind == 'disable':
+        return RemoveStateEdit(op['state'])
+    if kind == 'transitions':
+        state = document.get_state(op['state'])
+        if state is None:
+            raise ValueError(f"Unknown weather state: {op['state']}")
+        return TransitionsEdit(state, states_by_name(document, op.get('sources')), states_by_name(document, op.get('targets')))
+    if kind == 'edges':
+        return EdgesEdit([states_by_name(document, pair) for pair in op.get('add', [])],
+                         [states_by_name(document, pair) for pair in op.get('remove', [])])
+    if kind == 'set':
+        return StatePropertiesEdit(op['state'], op['values'])
+    if kind == 'global':
+        return GlobalPropertiesEdit(op['values'])
+    if kind == 'bulk':
+        return BulkPropertiesEdit(op['values'])
+    if kind == 'factor':
+        return FactorEdit(op['category'], op['values'])
+    raise ValueError(f"Unknown operation: {kind}")
+
+
+def states_by_name(document, names):
+    if names is None:
+        return None
+    states = [document.get_state(name) for name in names]
+    if None in states:
+        raise ValueError(f"Unknown weather state in {names}")
+    return states
+
+
+def state_name(state):
+    return state['Data']['name']['$value']
+
+
+class RemoveStateEdit:
+    def __init__(self, name):
+        self.name = name
+        self.label = f"remove {name}"
+
+    def apply(self, document):
+        state = document.get_state(self.name)
+        if state is None:
+            return False
+        # Transitions are remembered by the state dicts at their ends, which
+        # survive renumbering, rather than by HandleId
+        state_id = state['HandleId']
+        graph = document.graph
+        self.transitions = linked_transitions(document, [(source_id, state_id) for source_id in graph.sources(state_id)])
+        self.transitions += linked_transitions(document, [(state_id, target_id) for target_id in graph.targets(state_id)
+                                                          if target_id != state_id])
+        self.index = next(index for index, entry in enumerate(document.weather_states) if entry is state)
+        self.state = state
+        document.remove_state(self.name)
+
+    def to_op(self):
+        return {'op': 'disable', 'state': self.name}
+
+    def revert(self, document):
+        document.insert_state(self.index, self.state)
+        for source, target, transition in self.transitions:
+            relink_transition(document, source, target, transition)
+        document.ensure_unique_handle_ids()
+
+
+class TransitionsEdit:
+    # Replaces the sources and/or targets of one state; every state is given
+    # as its state dict
+    def __init__(self, state, sources=None, targets=None):
+        self.state = state
+        self.sources = sources
+        self.targets = targets
+        self.label = f"transitions of {state_name(state)}"
+
+    def apply(self, document):
+        graph = document.graph
+        state_id = self.state['HandleId']
+        self.previous = []
+        changed = False
+        if self.sources is not None:
+            source_ids = [source['HandleId'] for source in self.sources]
+            changed |= set(source_ids) != graph.sources(state_id)
+            self.previous += linked_transitions(document, [(source_id, state_id) for source_id in graph.sources(state_id)])
+        if self.targets is not None:
+            target_ids = [target['HandleId'] for target in self.targets]
+            changed |= set(target_ids) != graph.targets(state_id)
+            self.previous += linked_transitions(document, [(state_id, target_id) for target_id in graph.targets(state_id)])
+        if not changed:
+            return False
+        if self.sources is not None:
+            graph.set_sources(state_id, source_ids)
+        if self.targets is not None:
+            graph.set_targets(state_id, target_ids)
+
+    def to_op(self):
+        op = {'op': 'transitions', 'state': state_name(self.state)}
+        if self.sources is not None:
+            op['sources'] = [state_name(source) for source in self.sources]
+        if self.targets is not None:
+            op['targets'] = [state_name(target) for target in self.targets]
+        return op
+
+    def revert(self, document):
+        state_id = self.state['HandleId']
+        if self.sources is not None:
+            document.graph.set_sources(state_id, [])
+        if self.targets is not None:
+            document.graph.set_targets(state_id, [])
+        for source, target, transition in self.previous:
+            relink_transition(document, source, target, transition)
+
+
+def linked_transitions(document, edges):
+    # (source state, target state, transition) for (source id, target id)
+    # edges; an edge whose HandleRefId doesn't name a weather state has no
+    # state dict to relink to and is left out
+    transitions = []
+    for source_id, target_id in edges:
+        source = document.get_state_by_handle_id(source_id)
+        target = document.get_state_by_handle_id(target_id)
+        if source is not None and target is not None:
+            transitions.append((source, target, document.graph.get(source_id, target_id)))
+    return transitions
+
+
+def relink_transition(document, source, target, transition):
+    source_id, target_id = source['HandleId'], target['HandleId']
+    transition['Data']['sourceWeatherState']['HandleRefId'] = source_id
+    transition['Data']['targetWeatherState']['HandleRefId'] = target_id
+    document.graph.add(source_id, target_id, transition)
+
+
+class EdgesEdit:
+    # Adds and removes any number of transitions at once, each given as a
+    # (source, target) pair of state dicts
+    def __init__(self, add=(), remove=()):
+        self.add = [tuple(pair) for pair in add]
+        self.remove = [tuple(pair) for pair in remove]
+        self.label = f"{len(self.add) + len(self.remove)} transitions"
+
+    def apply(self, document):
+        # A dense matrix can add hundreds of thousands of transition dicts
+        with gc_paused():
+            graph = document.graph
+            self.removed = []
+            for source, target in self.remove:
+                transition = graph.remove(source['HandleId'], target['HandleId'])
+                if transition is not None:
+                    self.removed.append((source, target, transition))
+            self.added = [(source, target) for source, target in self.add
+                          if not graph.has_edge(source['HandleId'], target['HandleId'])]
+            for source, target in self.added:
+                graph.add(source['HandleId'], target['HandleId'])
+        if not self.removed and not self.added:
+            return False
+
+    def revert(self, document):
+        for source, target in self.added:
+            document.graph.remove(source['HandleId'], target['HandleId'])
+        for source, target, transition in self.removed:
+            relink_transition(document, source, target, transition)
+
+    def to_op(self):
+        return {'op': 'edges',
+                'add': [[state_name(source), state_name(target)] for source, target in self.add],
+                'remove': [[state_name(source), state_name(target)] for source, target in self.remove]}
+
+
+class StatePropertiesEdit:
+    def __init__(self, name, values):
+        self.name = name
+        self.values = values
+        self.label = f"properties of {name}"
+
+    def apply(self, document):
+        state_data = get_state_data(document, self.name)
+        previous = {field: state_data.get(field) for field in self.values if field in CURVE_FIELDS}
+        if 'effect' in self.values:
+            depot_path = state_data['effect']['DepotPath']
+            previous['effect'] = (depot_path['$storage'], depot_path['$value'])
+        set_state_properties(document, self.name, self.values)
+        self.previous = previous
+
+    def to_op(self):
+        return {'op': 'set', 'state': self.name, 'values': self.values}
+
+    def revert(self, document):
+        state_data = get_state_data(document, self.name)
+        for field, value in self.previous.items():
+            if field == 'effect':
+                state_data['effect']['DepotPath']['$storage'], state_data['effect']['DepotPath']['$value'] = value
+            else:
+                state_data[field] = value
+        document.mark_state_changed(self.name)
+
+
+class GlobalPropertiesEdit:
+    def __init__(self, values):
+        self.values = values
+        self.label = "global properties"
+
+    def apply(self, document):
+        # The replaced curve dicts are kept by reference; nothing mutates them
+        self.previous = [(state['Data'], {field: state['Data'].get(field) for field in self.values})
+                         for state in document.weather_states]
+        set_global_properties(document, self.values)
+
+    def to_op(self):
+        return {'op': 'global', 'values': self.values}
+
+    def revert(self, document):
+        for state_data, values in self.previous:
+            state_data.update(values)
+        document.mark_changed('weatherStates')
+
+
+class BulkPropertiesEdit:
+    # Curve values for many states at once, {name: {field: value or None}}
+    def __init__(self, values):
+        self.values = values
+        self.label = f"properties of {len(values)} states"
+
+    def apply(self, document):
+        if not self.values:
+            return False
+        previous = {name: {field: get_state_data(document, name).get(field) for field in fields}
+                    for name, fields in self.values.items()}
+        set_many_properties(document, self.values)
+        self.previous = previous
+
+    def to_op(self):
+        return {'op': 'bulk', 'values': self.values}
+
+    def revert(self, document):
+        for name, values in self.previous.items():
+            document.get_state_data(name).update(values)
+            document.mark_state_changed(name)
+
+
+class FactorEdit:
+    # New Values for the Elements of one renderSettingFactors curve
+    def __init__(self, category, values):
+        self.category = category
+        self.values = values
+        self.label = category
+
+    def apply(self, document):
+        factor = document.root_chunk['renderSettingFactors'].get(self.category)
+        previous = [element['Value'] for element in factor['Elements']] if factor else None
+        set_factor_values(document, self.category, self.values)
+        self.previous = previous
+
+    def revert(self, document):
+        set_factor_values(document, self.category, self.previous)
+
+    def to_op(self):
+        return {'op': 'factor', 'category': self.category, 'values': self.values}
@@ -0,0 +1,116 @@
+import json, os
+from edit_history import HISTORY_LIMIT, edit_from_op
+from env_writer import fsync_directory, write_atomic
+from file_watcher import current_version
+
+JOURNAL_VERSION = 1
+
+
+def journal_path(file_path):
+    return f"{file_path}.journal"
+
+
+def file_version(file_path):
+    version = current_version(file_path)[0]
+    return list(version) if version else None
+
+
+def effective_ops(records, limit=HISTORY_LIMIT):
+    # Resolves the undo/redo records of a journal into the ops still in
+    # effect, the same way EditHistory would have; ops that fell off the end
+    # of the history can't be undone and stay applied
+    applied, done, undone = [], [], []
+    for record in records:
+        kind = record.get('op')
+        if kind == 'undo':
+            if done:
+                undone.append(done.pop())
+        elif kind == 'redo':
+            if undone:
+                done.append(undone.pop())
+        else:
+            done.append(record)
+            undone.clear()
+        if len(done) > limit:
+            applied.append(done.pop(0))
+    return applied + done
+
+
+def replay_ops(document, ops):
+    # Applies ops through the document's history, so they can be undone
+    # afterwards, and returns the ones that still applied
+    applied = []
+    for op in ops:
+        try:
+            if document.history.perform(edit_from_op(document, op)) is not False:
+                applied.append(op)
+        except (ValueError, KeyError, TypeError):
+            pass
+    return applied
+
+
+class EditJournal:
+    # Append-only log, next to env.json, of the edit ops made since it was last
+    # saved: a header line naming the file version they apply to, then one JSON
+    # line per op, fsynced as it's written. Writing an edit costs as much as
+    # the edit, not the document. Replaying the log over the saved file brings
+    # the edits back after a crash or a reload; saving empties it. An undo of
+    # an edit made before the last save has no op to cancel in the log and is
+    # lost on replay.
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.path = journal_path(file_path)
+        self.base = None
+        self.records = []
+        self.file = None
+
+    def read(self):
+        # (base, records) of the journal on disk; a torn last line from a
+        # crash in the middle of a write is dropped
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                lines = file.read().splitlines()
+        except OSError:
+            return None, []
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+        if not records or not isinstance(records[0], dict) or records[0].get('journal') != JOURNAL_VERSION:
+            return None, []
+        return records[0].get('base'), [record for record in records[1:] if isinstance(record, dict)]
+
+    def rebase(self, records=()):
+        # Starts over from env.json as it is on disk now, holding records
+        self.close()
+        self.base = file_version(self.file_path)
+        self.records = list(records)
+        if records:
+            # The old journal stays in place until the new one is complete
+            header = {'journal': JOURNAL_VERSION, 'base': self.base}
+            lines = ''.join(json.dumps(record) + '\n' for record in (header, *records))
+            write_atomic(self.path, lines.encode('utf-8'))
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+    def append(self, *records):
+        # One write and one fsync per call, however many records it holds
+        new = False
+        if self.file is None:
+            new = not os.path.exists(self.path)
+            self.file = open(self.path, 'a', encoding='utf-8')
+            if new:
+                self.file.write(json.dumps({'journal': JOURNAL_VERSION, 'base': self.base}) + '\n')
+        self.file.write(''.join(json.dumps(record) + '\n' for record in records))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        if new:
+            fsync_directory(os.path.dirname(os.path.abspath(self.path)))
+        self.records.extend(records)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,59 @@
+import glob, os, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from env_document import EnvDocument
+from env_ops import apply_ops, check_ops
+
+
+def expand_files(patterns):
+    # Globs are expanded here so they also work in shells that don't do it
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for file_path in matches:
+            if file_path not in files:
+                files.append(file_path)
+    return files
+
+
+def ops_for_file(ops, env_file):
+    # Export paths may name the file they came from: {name} is the file name
+    # without extension, {folder} the name of the folder it is in
+    name = os.path.splitext(os.path.basename(env_file))[0]
+    folder = os.path.basename(os.path.dirname(os.path.abspath(env_file)))
+    return [dict(op, path=op['path'].format(name=name, folder=folder)) if op.get('op') == 'export' else op for op in ops]
+
+
+def process_file(env_file, ops, output=None, backups=0):
+    # Runs in a pool worker; never raises, so one bad file can't stop the batch
+    start = time.perf_counter()
+    result = {'file': env_file, 'ok': False, 'log': [], 'error': None}
+    try:
+        check_ops(ops)
+        document = EnvDocument.load(env_file, lazy=True)
+        result['log'] = apply_ops(document, ops_for_file(ops, env_file))
+        document.save(output or env_file, backups)
+        result['ok'] = True
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def run_batch(env_files, ops, jobs=None, backups=0, on_result=None):
+    # Applies the same ops to every file on a process pool; results come back
+    # in completion order through on_result and in input order as the return
+    if len(env_files) == 1:
+        results = [process_file(env_files[0], ops, backups=backups)]
+        if on_result:
+            on_result(results[0])
+        return results
+
+    results = {}
+    with ProcessPoolExecutor(jobs) as pool:
+        futures = {pool.submit(process_file, env_file, ops, None, backups): env_file for env_file in env_files}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if on_result:
+                on_result(result)
+    return [results[env_file] for env_file in env_files]
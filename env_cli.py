@@ -0,0 +1,167 @@
+import argparse, json, os, sys, time
+from curves import parse_points
+from env_batch import expand_files, process_file, run_batch
+from env_ops import check_ops
+
+USAGE_EXAMPLES = """
+examples:
+  python -m env_cli env.json --enable my_storm --targets my_storm 24h_weather_rain,24h_weather_fog
+  python -m env_cli env.json --set my_storm probability=0.1 effect=base\\fx\\storm.effect
+  python -m env_cli env.json --set my_storm "probability=0:0.05,12:0.2,20:0.1" --check
+  python -m env_cli env.json --global minDuration= maxDuration=2 --export exportedWeatherStates.json
+  python -m env_cli env.json --ops ops.json --output variant.json
+  python -m env_cli "regions/**/env.json" --ops ops.json --export "exports/{folder}.lua" --jobs 8
+
+Several files (or globs) get the same operations in parallel, one process per
+file; {name} and {folder} in an export path are replaced per file.
+
+An ops file holds a JSON list of operations, applied before the ones given
+as options:
+  [{"op": "enable", "state": "my_storm", "depot_path": "base\\\\weather\\\\24h_basic\\\\my_storm.envparam"},
+   {"op": "set", "state": "my_storm", "values": {"probability": 0.1, "minDuration": null}},
+   {"op": "set", "state": "my_storm", "values": {"maxDuration": [[0, 1.0], [12, 2.5], [18, 1.5]]}},
+   {"op": "global", "values": {"transitionDuration": 0.5}},
+   {"op": "bulk", "values": {"my_storm": {"probability": 0.2}, "24h_weather_rain": {"maxDuration": null}}},
+   {"op": "transitions", "state": "my_storm", "sources": ["24h_weather_sunny"], "targets": []},
+   {"op": "edges", "add": [["my_storm", "24h_weather_rain"]], "remove": [["24h_weather_rain", "my_storm"]]},
+   {"op": "factor", "category": "resolutionFilmGrainScale", "values": [1.0, 1.2]},
+   {"op": "disable", "state": "old_state"},
+   {"op": "check", "minutes": 5},
+   {"op": "export", "path": "exportedWeatherStates.json"}]
+
+A curve value is a number (one point at noon), null, or hour:value pairs that
+keep the curve's interpolation. "check" samples every state's curves through
+the day and refuses to save if a probability leaves 0..1, a duration goes
+negative or minDuration exceeds maxDuration.
+"""
+
+
+def parse_value(field, text):
+    if field == 'effect':
+        return text
+    return parse_points(text)
+
+
+def parse_assignments(items):
+    values = {}
+    for item in items:
+        field, separator, text = item.partition('=')
+        if not separator:
+            raise argparse.ArgumentTypeError(f"expected FIELD=VALUE, got {item!r}")
+        values[field] = parse_value(field, text)
+    return values
+
+
+def parse_names(text):
+    return [name for name in text.split(',') if name]
+
+
+class OpAction(argparse.Action):
+    # Collects the operation options into one list, in the order given
+    def __init__(self, option_strings, dest, make_op=None, **kwargs):
+        super().__init__(option_strings, 'ops', **kwargs)
+        self.make_op = make_op
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        try:
+            op = self.make_op(values)
+        except (argparse.ArgumentTypeError, ValueError) as e:
+            parser.error(f"{option_string}: {e}")
+        namespace.ops = (namespace.ops or []) + [op]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m env_cli',
+        description="Apply weather state edits to an env.json without opening the GUI.",
+        epilog=USAGE_EXAMPLES,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('env_files', nargs='+', metavar='env_file', help="env.json files or globs to edit")
+    parser.add_argument('--ops', dest='ops_file', metavar='FILE', help="JSON file with a list of operations")
+    parser.add_argument('--enable', action=OpAction, metavar='STATE',
+                        make_op=lambda state: {'op': 'enable', 'state': state})
+    parser.add_argument('--disable', action=OpAction, metavar='STATE',
+                        make_op=lambda state: {'op': 'disable', 'state': state})
+    parser.add_argument('--set', action=OpAction, nargs='+', metavar=('STATE', 'FIELD=VALUE'),
+                        make_op=lambda values: {'op': 'set', 'state': values[0], 'values': parse_assignments(values[1:])},
+                        help="set minDuration, maxDuration, probability, transitionDuration or effect of one state (empty value means null, hour:value pairs a curve)")
+    parser.add_argument('--global', action=OpAction, nargs='+', metavar='FIELD=VALUE',
+                        make_op=lambda values: {'op': 'global', 'values': parse_assignments(values)},
+                        help="set a duration/probability field on every state, like the Debug window")
+    parser.add_argument('--sources', action=OpAction, nargs=2, metavar=('STATE', 'NAMES'),
+                        make_op=lambda values: {'op': 'transitions', 'state': values[0], 'sources': parse_names(values[1])},
+                        help="comma separated states that transition into STATE (replaces the current ones)")
+    parser.add_argument('--targets', action=OpAction, nargs=2, metavar=('STATE', 'NAMES'),
+                        make_op=lambda values: {'op': 'transitions', 'state': values[0], 'targets': parse_names(values[1])},
+                        help="comma separated states STATE transitions to (replaces the current ones)")
+    parser.add_argument('--check', action=OpAction, nargs=0,
+                        make_op=lambda values: {'op': 'check'},
+                        help="don't save if a curve goes out of range at some time of day")
+    parser.add_argument('--export', action=OpAction, metavar='PATH',
+                        make_op=lambda path: {'op': 'export', 'path': path},
+                        help="write the Lua weatherStates table of the enabled states")
+    parser.add_argument('--output', metavar='PATH', help="write the result here instead of over env_file (single file only)")
+    parser.add_argument('--jobs', type=int, metavar='N', help="worker processes for several files (default: all cores)")
+    parser.add_argument('--backups', type=int, default=0, metavar='N', help="keep N .bak generations of the target (default 0)")
+    return parser
+
+
+def load_ops_file(file_path):
+    with open(file_path, 'r') as file:
+        ops = json.load(file)
+    if not isinstance(ops, list) or not all(isinstance(op, dict) for op in ops):
+        raise ValueError(f"{file_path} must contain a JSON list of operations")
+    return ops
+
+
+def print_result(result):
+    status = "ok" if result['ok'] else "FAILED"
+    print(f"{status:6} {result['file']} ({result['seconds']:.2f}s)")
+    for line in result['log']:
+        print(f"         {line}")
+    if result['error']:
+        print(f"         error: {result['error']}")
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    env_files = expand_files(args.env_files)
+    if not env_files:
+        parser.error("no env.json files matched")
+    if args.output and len(env_files) > 1:
+        parser.error("--output needs a single env_file")
+    try:
+        ops = (load_ops_file(args.ops_file) if args.ops_file else []) + (args.ops or [])
+        check_ops(ops)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    if not ops:
+        parser.error("no operations given")
+    if len(env_files) > 1:
+        for op in ops:
+            if op.get('op') == 'export' and '{name}' not in op['path'] and '{folder}' not in op['path']:
+                parser.error("with several files the export path needs {name} or {folder}")
+
+    if len(env_files) == 1:
+        result = process_file(env_files[0], ops, args.output, args.backups)
+        for line in result['log']:
+            print(line)
+        if not result['ok']:
+            print(f"error: {result['error']}", file=sys.stderr)
+            return 1
+        print(f"saved {args.output or env_files[0]}")
+        return 0
+
+    start = time.perf_counter()
+    results = run_batch(env_files, ops, args.jobs, args.backups, on_result=print_result)
+    failed = [result for result in results if not result['ok']]
+    busy = sum(result['seconds'] for result in results)
+    print(f"{len(results)} files, {len(failed)} failed, {time.perf_counter() - start:.2f}s wall, "
+          f"{busy:.2f}s in workers on {args.jobs or os.cpu_count()} processes")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+import json, os
+from doc_cache import load_env_cached
+from env_loader import EnvLayout, dumps_env, load_env, materialize
+from env_writer import splice_env, write_env, write_stamp
+from edit_history import EditHistory
+from handle_ids import HandleRenumberer, max_handle_id
+from perf_log import span
+from transition_graph import TransitionGraph
+
+
+def transition_handles(transition):
+    data = transition['Data']
+    return transition['HandleId'], data['sourceWeatherState']['HandleRefId'], data['targetWeatherState']['HandleRefId']
+
+
+class EnvDocument:
+    # .bak generations save() keeps of the file it replaces: none, unless
+    # ENVSWITCHER_BACKUPS=N is set or main.py runs with --backups N
+    backups = int(os.environ.get('ENVSWITCHER_BACKUPS') or 0)
+
+    def __init__(self, data=None, layout=None):
+        self.data = data if data is not None else {}
+        self.layout = layout
+        self.changed_members = set()
+        self.changed_elements = {}
+        # Set when states were added, inserted or removed since the last renumber
+        self.renumber_needed = False
+        self.renumberer = HandleRenumberer()
+        self.graph = TransitionGraph()
+        self.rebuild_indexes()
+        self.history = EditHistory(self)
+
+    @classmethod
+    def load(cls, file_path, lazy=False, cache=False):
+        with span('load_json') as timing:
+            if cache:
+                document = cls(*load_env_cached(file_path))
+            elif lazy:
+                document = cls(*load_env(file_path))
+            else:
+                with open(file_path, 'r') as file:
+                    document = cls(json.load(file))
+            timing.document = document
+        return document
+
+    def save(self, file_path, backups=None):
+        # Writes the whole document, whichever window or edit changed it. New
+        # states and transitions come with placeholder HandleIds, so they are
+        # renumbered here rather than trusting every caller to do it first.
+        if not self.loaded:
+            raise ValueError("No env.json is loaded, nothing to save")
+        if backups is None:
+            backups = self.backups
+        with span('save_json') as timing:
+            timing.document = self
+            if self.renumber_needed or self.graph.dirty:
+                self.ensure_unique_handle_ids()
+            self.sync_transitions()
+            with span('serialize'):
+                source = splice_env(self.data, self.layout, self.changed_members, self.changed_elements)
+                if source is None:
+                    source = dumps_env(self.data).encode('utf-8')
+            with span('write', bytes=len(source)):
+                write_env(file_path, source, backups)
+                write_stamp(file_path, source)
+        journal = self.history.journal
+        if journal is not None and journal.file_path == file_path:
+            journal.rebase()
+        self.layout = EnvLayout.scan(source)
+        self.changed_members = set()
+        self.changed_elements = {}
+
+    def mark_changed(self, key, element=None):
+        # Tells the next save which RootChunk member, or which entry of it,
+        # has to be re-encoded; everything else is copied from the last file
+        if element is None:
+            self.changed_members.add(key)
+        else:
+            self.changed_elements.setdefault(key, set()).add(id(element))
+
+    def mark_state_changed(self, name):
+        state = self.states_by_name.get(name)
+        if state:
+            self.mark_changed('weatherStates', state)
+
+    def materialize(self):
+        # Parse every RootChunk member a lazy load left as raw bytes
+        # The renumberer's cached handle locations only go stale when members
+        # are replaced by their parsed objects
+        with span('materialize'):
+            parsed = materialize(self.root_chunk)
+        if parsed:
+            self.renumberer.invalidate()
+
+    @property
+    def loaded(self):
+        # False for the empty document the windows fall back to when a load fails
+        return isinstance(self.data.get('Data'), dict) and isinstance(self.data['Data'].get('RootChunk'), dict)
+
+    @property
+    def root_chunk(self):
+        return self.data.get('Data', {}).get('RootChunk', {})
+
+    @property
+    def weather_states(self):
+        return self.root_chunk.get('weatherStates', [])
+
+    @property
+    def transitions(self):
+        self.sync_transitions()
+        return self.root_chunk.get('weatherStateTransitions', [])
+
+    def sync_transitions(self):
+        # Edge edits go through the graph; the serialized list is only rebuilt
+        # when something actually reads it (save, renumber, removal). While
+        # the number of transitions stays the same only the positions now
+        # holding a different transition are re-encoded.
+        if self.graph.dirty:
+            previous = self.root_chunk.get('weatherStateTransitions')
+            transitions = self.graph.to_transitions()
+            self.root_chunk['weatherStateTransitions'] = transitions
+            self.graph.dirty = False
+            self.mark_transitions_changed(previous, transitions)
+
+    def mark_transitions_changed(self, previous, transitions, key=None):
+        # Marks the transitions that differ from previous position by position:
+        # by identity, or by key(transition) when previous holds those keys.
+        # A list that changed length is re-encoded whole.
+        if not isinstance(previous, list) or len(previous) != len(transitions):
+            self.mark_changed('weatherStateTransitions')
+            return
+        for before, transition in zip(previous, transitions):
+            changed = key(transition) != before if key else transition is not before
+            if changed:
+                self.mark_changed('weatherStateTransitions', transition)
+
+    def rebuild_indexes(self):
+        # The first state wins on duplicate names/ids, same as the old linear scans
+        self.states_by_name = {}
+        self.states_by_handle_id = {}
+        for state in self.weather_states:
+            self.states_by_name.setdefault(state['Data']['name']['$value'], state)
+            self.states_by_handle_id.setdefault(state['HandleId'], state)
+        self.graph = TransitionGraph(self.transitions)
+
+    def state_names(self):
+        return [state['Data']['name']['$value'] for state in self.weather_states]
+
+    def has_state(self, name):
+        return name in self.states_by_name
+
+    def get_state(self, name):
+        return self.states_by_name.get(name)
+
+    def get_state_data(self, name):
+        state = self.states_by_name.get(name)
+        return state['Data'] if state else None
+
+    def get_handle_id(self, name):
+        # Resolved through the state dict so renumbering can never leave it stale
+        state = self.states_by_name.get(name)
+        return state['HandleId'] if state else None
+
+    def get_state_by_handle_id(self, handle_id):
+        return self.states_by_handle_id.get(handle_id)
+
+    def get_state_name(self, handle_id):
+        state = self.states_by_handle_id.get(handle_id)
+        return state['Data']['name']['$value'] if state else None
+
+    def add_state(self, state):
+        self.root_chunk['weatherStates'].append(state)
+        self.mark_changed('weatherStates')
+        self.renumber_needed = True
+        self.states_by_name.setdefault(state['Data']['name']['$value'], state)
+        self.states_by_handle_id.setdefault(state['HandleId'], state)
+
+    def insert_state(self, index, state):
+        # Puts a removed state back at its old position under a free HandleId;
+        # the caller relinks its transitions and then renumbers
+        self.materialize()
+        self.sync_transitions()
+        state['HandleId'] = str(max_handle_id(self.root_chunk) + 1)
+        self.root_chunk['weatherStates'].insert(index, state)
+        self.mark_changed('weatherStates')
+        self.renumber_needed = True
+        self.rebuild_indexes()
+
+    def remove_state(self, name):
+        state = self.states_by_name.get(name)
+        if state is None:
+            return None
+        handle_id = state['HandleId']
+        self.root_chunk['weatherStates'].remove(state)
+        self.mark_changed('weatherStates')
+        self.renumber_needed = True
+        self.remove_transitions(handle_id)
+        self.update_handle_ids_after_removal(handle_id)
+        self.rebuild_indexes()
+        return state
+
+    def remove_transitions(self, handle_id):
+        return self.graph.remove_state(handle_id)
+
+    def update_handle_ids_after_removal(self, removed_handle_id):
+        removed_handle_id = int(removed_handle_id)
+        self.mark_changed('weatherStates')
+        self.mark_changed('weatherStateTransitions')
+        for state in self.weather_states:
+            handle_id = int(state['HandleId'])
+            if handle_id > removed_handle_id:
+                state['HandleId'] = str(handle_id - 1)
+
+        for transition in self.transitions:
+            handle_id = int(transition['HandleId'])
+            if handle_id > removed_handle_id:
+                transition['HandleId'] = str(handle_id - 1)
+            source_id = int(transition['Data']['sourceWeatherState']['HandleRefId'])
+            target_id = int(transition['Data']['targetWeatherState']['HandleRefId'])
+            if source_id > removed_handle_id:
+                transition['Data']['sourceWeatherState']['HandleRefId'] = str(source_id - 1)
+            if target_id > removed_handle_id:
+                transition['Data']['targetWeatherState']['HandleRefId'] = str(target_id - 1)
+
+    def ensure_unique_handle_ids(self):
+        # Renumbering reaches into areaParameters, so raw members get parsed here
+        with span('ensure_unique_handle_ids') as timing:
+            timing.document = self
+            self.materialize()
+            self.sync_transitions()
+            transitions = self.root_chunk.get('weatherStateTransitions', [])
+            before = [transition_handles(transition) for transition in transitions]
+            for key in self.renumberer.renumber(self.root_chunk):
+                if key == 'weatherStateTransitions':
+                    self.mark_transitions_changed(before, transitions, transition_handles)
+                else:
+                    self.mark_changed(key)
+            self.rebuild_indexes()
+            self.renumber_needed = False
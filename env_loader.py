@@ -0,0 +1,165 @@
+import gc, json, re
+from contextlib import contextmanager
+from functools import lru_cache
+
+# RootChunk members the editor windows actually read. Everything else is kept
+# as the raw bytes it was loaded from until something asks for it.
+PARSED_KEYS = ('weatherStates', 'weatherStateTransitions', 'renderSettingFactors')
+
+ROOT_CHUNK_PATTERN = re.compile(rb'\n([ \t]*)"RootChunk": \{')
+FIRST_ENTRY_PATTERN = re.compile(rb'\r?\n([ \t]*)\S')
+
+
+class RawJSON:
+    __slots__ = ('raw',)
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def __len__(self):
+        return len(self.raw)
+
+    def load(self):
+        return json.loads(self.raw)
+
+
+@contextmanager
+def gc_paused():
+    # Building hundreds of thousands of dicts/lists triggers the cyclic GC
+    # over and over for no benefit; nothing allocated here is garbage yet
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+@lru_cache(maxsize=32)
+def entry_pattern(indent, keyed):
+    # Pretty-printed JSON can't have a raw newline inside a string, so a line
+    # at exactly this indentation is an entry of the container being split
+    if keyed:
+        return re.compile(rb'\n' + re.escape(indent) + rb'"((?:[^"\\]|\\.)*)": ')
+    return re.compile(rb'\n' + re.escape(indent) + rb'(?![\]}\s])')
+
+
+def entry_spans(source, start, end, indent, keyed):
+    matches = list(entry_pattern(indent, keyed).finditer(source, start, end))
+    first = start + 1 if source[start:start + 1] == b'\r' else start
+    if not matches or matches[0].start() != first:
+        return None
+    spans = []
+    for index, match in enumerate(matches):
+        value_end = matches[index + 1].start() if index + 1 < len(matches) else end
+        while value_end > match.end() and source[value_end - 1] in b' \t\r\n':
+            value_end -= 1
+        if source[value_end - 1] == ord(','):
+            value_end -= 1
+        key = json.loads(b'"' + match.group(1) + b'"') if keyed else None
+        spans.append((key, match.end(), value_end))
+    return spans
+
+
+class EnvLayout:
+    # Byte offsets of the RootChunk members (and, on demand, of the entries
+    # inside them) in the file as it was last read or written
+    def __init__(self, source, body_start, body_end, outer_indent, member_indent, members):
+        self.source = source
+        self.body_start = body_start
+        self.body_end = body_end
+        self.outer_indent = outer_indent
+        self.member_indent = member_indent
+        self.unit = member_indent[len(outer_indent):]
+        self.newline = b'\r\n' if source[body_start:body_start + 1] == b'\r' else b'\n'
+        self.members = {key: (start, end) for key, start, end in members}
+        self.element_cache = {}
+
+    @classmethod
+    def scan(cls, source):
+        root_match = ROOT_CHUNK_PATTERN.search(source)
+        if not root_match:
+            return None
+        outer_indent = root_match.group(1)
+        body_start = root_match.end()
+
+        close_match = re.compile(rb'\n' + re.escape(outer_indent) + rb'\}').search(source, body_start)
+        first_match = FIRST_ENTRY_PATTERN.match(source, body_start)
+        if not close_match or not first_match:
+            return None
+        member_indent = first_match.group(1)
+        if len(member_indent) <= len(outer_indent) or not member_indent.startswith(outer_indent):
+            return None
+
+        members = entry_spans(source, body_start, close_match.start(), member_indent, True)
+        if members is None:
+            return None
+        return cls(source, body_start, close_match.start(), outer_indent, member_indent, members)
+
+    def member_bytes(self, key):
+        start, end = self.members[key]
+        return self.source[start:end]
+
+    def element_spans(self, key):
+        # Entries of a list or dict member, keyed by position or by dict key
+        if key not in self.element_cache:
+            start, end = self.members[key]
+            opening = self.source[start:start + 1]
+            spans = None
+            if opening in (b'[', b'{') and end - start > 2:
+                spans = entry_spans(self.source, start + 1, end - 1, self.member_indent + self.unit, opening == b'{')
+            self.element_cache[key] = spans
+        return self.element_cache[key]
+
+
+def loads_env(source, parsed_keys=PARSED_KEYS):
+    layout = EnvLayout.scan(source)
+    if layout is None:
+        return json.loads(source), None
+
+    skeleton = source[:layout.body_start] + source[layout.body_end:]
+    data = json.loads(skeleton)
+    if not isinstance(data.get('Data', {}).get('RootChunk'), dict):
+        return json.loads(source), None
+
+    root_chunk = {}
+    for key in layout.members:
+        value = layout.member_bytes(key)
+        root_chunk[key] = json.loads(value) if key in parsed_keys else RawJSON(value)
+    data['Data']['RootChunk'] = root_chunk
+    return data, layout
+
+
+def load_env(file_path, parsed_keys=PARSED_KEYS):
+    with open(file_path, 'rb') as file:
+        source = file.read()
+    with gc_paused():
+        return loads_env(source, parsed_keys)
+
+
+def dumps_env(data):
+    # Raw members are swapped for placeholders while encoding and spliced back
+    # in verbatim afterwards
+    raw_values = []
+
+    def placeholder(value):
+        if isinstance(value, RawJSON):
+            raw_values.append(value.raw)
+            return f"\0raw{len(raw_values) - 1}\0"
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    text = json.dumps(data, indent=4, default=placeholder)
+    for index, raw in enumerate(raw_values):
+        text = text.replace(json.dumps(f"\0raw{index}\0"), raw.decode('utf-8').replace('\r\n', '\n'), 1)
+    return text
+
+
+def materialize(container):
+    # Returns whether anything was still raw and had to be parsed
+    parsed = False
+    for key, value in container.items():
+        if isinstance(value, RawJSON):
+            container[key] = value.load()
+            parsed = True
+    return parsed
@@ -0,0 +1,394 @@
+import os
+from curves import NUMPY_MISSING, CurveStore, np
+from handle_ids import max_handle_id
+
+# Vanilla states that always stay enabled
+EXCLUDED_STATES = ["24h_weather_sunny", "24h_weather_rain", "24h_weather_fog", "24h_weather_pollution", "24h_weather_toxic_rain", "24h_weather_sandstorm", "24h_weather_light_clouds", "24h_weather_cloudy", "24h_weather_heavy_clouds", "q302_squat_morning", "q302_deeb_blue", "sa_courier_clouds", "q306_epilogue_cloudy_morning", "q306_rainy_night", "q302_light_rain"]
+
+# Quest states that are left out of the exported Lua table
+EXPORT_EXCLUDED_STATES = ["q302_squat_morning", "q302_deeb_blue", "sa_courier_clouds", "q306_epilogue_cloudy_morning", "q306_rainy_night", "q302_light_rain"]
+
+ENVPARAM_DEPOT_FOLDER = "base\\weather\\24h_basic\\"
+
+CURVE_FIELDS = ('minDuration', 'maxDuration', 'probability', 'transitionDuration')
+
+
+def make_curve(value, previous=None):
+    # value is None, a number (one point at noon) or [[point, value], ...].
+    # A previous curve keeps its InterpolationType, LinkType and other keys,
+    # and its elements' other keys when the number of points is unchanged.
+    if value is None:
+        return None
+    points = [[12, value]] if isinstance(value, (int, float)) else value
+    if not isinstance(previous, dict):
+        return {
+            "InterpolationType": "Linear",
+            "LinkType": "ESLT_Normal",
+            "Elements": [{"Point": point, "Value": value} for point, value in points]
+        }
+    elements = previous.get('Elements') or []
+    if len(elements) != len(points):
+        elements = [{}] * len(points)
+    return {**previous, 'Elements': [{**element, 'Point': point, 'Value': value}
+                                     for element, (point, value) in zip(elements, points)]}
+
+
+def envparam_depot_path(relative_path):
+    return ENVPARAM_DEPOT_FOLDER + relative_path.replace(os.sep, "\\")
+
+
+def new_state(name, depot_path=None, handle_id="0"):
+    return {
+        'HandleId': handle_id,
+        'Data': {
+            '$type': 'worldWeatherState',
+            'effect': {
+                'DepotPath': {
+                    '$type': 'ResourcePath',
+                    '$storage': 'uint64',
+                    '$value': "0"
+                },
+                'Flags': "Soft"
+            },
+            'environmentAreaParameters': {
+                'DepotPath': {
+                    '$type': 'ResourcePath',
+                    '$storage': 'string',
+                    '$value': depot_path or envparam_depot_path(f"{name}.envparam")
+                },
+                'Flags': "Default"
+            },
+            'maxDuration': make_curve(1.5),
+            'minDuration': None,
+            'name': {
+                '$type': 'CName',
+                '$storage': 'string',
+                '$value': name
+            },
+            'probability': make_curve(0.0500000007),
+            'transitionDuration': make_curve(0.25)
+        }
+    }
+
+
+def get_state_data(document, name):
+    state_data = document.get_state_data(name)
+    if state_data is None:
+        raise ValueError(f"Unknown weather state: {name}")
+    return state_data
+
+
+def get_handle_id(document, name):
+    get_state_data(document, name)
+    return document.get_handle_id(name)
+
+
+def enable_state(document, name, depot_path=None, handle_id="0"):
+    if document.has_state(name):
+        return False
+    document.add_state(new_state(name, depot_path, handle_id))
+    return True
+
+
+def disable_state(document, name):
+    if name in EXCLUDED_STATES:
+        raise ValueError(f"{name} can't be disabled")
+    return document.remove_state(name) is not None
+
+
+def effect_depot_path(depot_path):
+    # ($storage, $value) of an effect DepotPath; blank or "0" means no effect
+    if depot_path in (None, "", "0", 0):
+        return "uint64", 0
+    if not isinstance(depot_path, str) or not depot_path.endswith(".effect"):
+        raise ValueError("Depot path should be a string ending with '.effect'")
+    return "string", depot_path
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def check_curve_value(field, value):
+    if field not in CURVE_FIELDS:
+        raise ValueError(f"Unknown property: {field}")
+    if value is None or is_number(value):
+        return
+    if not isinstance(value, (list, tuple)) or not value or not all(
+            isinstance(pair, (list, tuple)) and len(pair) == 2 and all(is_number(number) for number in pair)
+            for pair in value):
+        raise ValueError(f"{field} must be a number, null or a list of [hour, value] pairs")
+
+
+def set_state_properties(document, name, values):
+    # values maps curve fields (None for null) and 'effect' to their new values;
+    # everything is validated before the state is touched
+    state_data = get_state_data(document, name)
+    for field, value in values.items():
+        if field != 'effect':
+            check_curve_value(field, value)
+    effect = effect_depot_path(values['effect']) if 'effect' in values else None
+
+    for field, value in values.items():
+        if field in CURVE_FIELDS:
+            state_data[field] = make_curve(value, state_data.get(field))
+    if effect is not None:
+        state_data['effect']['DepotPath']['$storage'], state_data['effect']['DepotPath']['$value'] = effect
+    document.mark_state_changed(name)
+
+
+def set_global_properties(document, values):
+    for field, value in values.items():
+        check_curve_value(field, value)
+    for state in document.weather_states:
+        for field, value in values.items():
+            state['Data'][field] = make_curve(value, state['Data'].get(field))
+    document.mark_changed('weatherStates')
+
+
+def set_many_properties(document, values):
+    # values maps state names to {curve field: value or None}; everything is
+    # validated before any state is touched
+    states = {name: get_state_data(document, name) for name in values}
+    for fields in values.values():
+        for field, value in fields.items():
+            check_curve_value(field, value)
+    for name, fields in values.items():
+        for field, value in fields.items():
+            states[name][field] = make_curve(value, states[name].get(field))
+        document.mark_state_changed(name)
+
+
+def curve_problems(names, curves, minutes=5):
+    # Messages for states whose curves go wrong at some time of day, sampled
+    # every few minutes: probability outside 0..1, negative durations or
+    # minDuration above maxDuration. curves maps every curve field to the
+    # curve dicts of the named states.
+    if np is None:
+        raise ValueError(NUMPY_MISSING)
+    days = {field: CurveStore(curves[field]).day(minutes) for field in CURVE_FIELDS}
+    problems = []
+
+    def report(bad, message):
+        # bad is a (states, samples) mask; the first bad time of each state is shown
+        for row in np.flatnonzero(bad.any(axis=1)).tolist():
+            minute = int(np.argmax(bad[row])) * minutes
+            problems.append(f"{names[row]}: {message} at {minute // 60:02d}:{minute % 60:02d}")
+
+    with np.errstate(invalid='ignore'):
+        report((days['probability'] < 0) | (days['probability'] > 1), "probability outside 0..1")
+        for field in ('minDuration', 'maxDuration', 'transitionDuration'):
+            report(days[field] < 0, f"negative {field}")
+        report(days['minDuration'] > days['maxDuration'], "minDuration above maxDuration")
+    return problems
+
+
+def check_curves(document, minutes=5):
+    return curve_problems(document.state_names(), {field: [state['Data'].get(field) for state in document.weather_states]
+                                                   for field in CURVE_FIELDS}, minutes)
+
+
+def set_transitions(document, name, sources=None, targets=None):
+    state_id = get_handle_id(document, name)
+    if sources is not None:
+        document.graph.set_sources(state_id, [get_handle_id(document, source) for source in sources])
+    if targets is not None:
+        document.graph.set_targets(state_id, [get_handle_id(document, target) for target in targets])
+
+
+def set_factor_values(document, category, values):
+    factor = document.root_chunk['renderSettingFactors'].get(category)
+    if factor is None:
+        raise ValueError(f"Unknown render setting factor: {category}")
+    if len(values) != len(factor['Elements']):
+        raise ValueError(f"{category} has {len(factor['Elements'])} points, got {len(values)} values")
+    for element, value in zip(factor['Elements'], values):
+        element['Value'] = value
+    document.mark_changed('renderSettingFactors', factor)
+
+
+def set_edges(document, add=(), remove=()):
+    # add and remove are lists of [source, target] state names
+    for source, target in remove:
+        document.graph.remove(get_handle_id(document, source), get_handle_id(document, target))
+    for source, target in add:
+        document.graph.add(get_handle_id(document, source), get_handle_id(document, target))
+
+
+def localized_name(name):
+    if name.startswith('q302_'):
+        name = name.replace('q302_', '')
+    elif name.startswith('24h_weather_'):
+        name = name.replace('24h_weather_', '')
+    return ' '.join(word.capitalize() for word in name.split('_'))
+
+
+def dlssd_flag(document, name):
+    state_data = document.get_state_data(name)
+    if state_data:
+        effect_value = state_data['effect']['DepotPath']['$value']
+        if effect_value == 0:
+            return False
+        elif effect_value.endswith('.effect'):
+            return True
+    return False
+
+
+def export_rows(document, names):
+    return [
+        [name, localized_name(name), 1 if name in EXCLUDED_STATES else 2, dlssd_flag(document, name)]
+        for name in names if name not in EXPORT_EXCLUDED_STATES
+    ]
+
+
+def format_lua(rows):
+    lines = [f'\t{{ "{row[0]}", "{row[1]}", {row[2]}, {str(row[3]).lower()} }}' for row in rows]
+    return 'local weatherStates = {\n' + ',\n'.join(lines) + ('\n' if lines else '') + '}\n'
+
+
+def is_name(value):
+    return isinstance(value, str)
+
+
+def is_optional_name(value):
+    return value is None or isinstance(value, str)
+
+
+def is_names(value):
+    return isinstance(value, list) and all(isinstance(name, str) for name in value)
+
+
+def is_values(value):
+    return isinstance(value, dict) and all(isinstance(field, str) for field in value)
+
+
+def is_state_properties(value):
+    return is_values(value) and is_optional_name(value.get('effect'))
+
+
+def is_state_values(value):
+    return isinstance(value, dict) and all(isinstance(name, str) and is_values(fields) for name, fields in value.items())
+
+
+def is_pairs(value):
+    return isinstance(value, list) and all(isinstance(pair, list) and len(pair) == 2 and is_names(pair) for pair in value)
+
+
+def is_numbers(value):
+    return isinstance(value, list) and all(is_number(item) for item in value)
+
+
+def is_minutes(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+OP_CHECKS = {
+    is_name: "a string",
+    is_optional_name: "a string or null",
+    is_names: "a list of state names",
+    is_values: "an object of properties",
+    is_state_properties: "an object of properties with a string or null 'effect'",
+    is_state_values: "an object of state names to properties",
+    is_pairs: "a list of [source, target] pairs",
+    is_numbers: "a list of numbers",
+    is_minutes: "a positive whole number",
+}
+
+# {kind: {key: (check, required)}} of every op apply_ops understands
+OP_SCHEMA = {
+    'enable': {'state': (is_name, True), 'depot_path': (is_optional_name, False)},
+    'disable': {'state': (is_name, True)},
+    'set': {'state': (is_name, True), 'values': (is_state_properties, True)},
+    'global': {'values': (is_values, True)},
+    'bulk': {'values': (is_state_values, True)},
+    'transitions': {'state': (is_name, True), 'sources': (is_names, False), 'targets': (is_names, False)},
+    'edges': {'add': (is_pairs, False), 'remove': (is_pairs, False)},
+    'factor': {'category': (is_name, True), 'values': (is_numbers, True)},
+    'check': {'minutes': (is_minutes, False)},
+    'export': {'path': (is_name, True)},
+}
+
+
+def check_ops(ops):
+    # Raises ValueError for the first malformed op, so a bad ops file fails
+    # before anything is applied instead of halfway through
+    if not isinstance(ops, list):
+        raise ValueError("Operations must be a list")
+    for number, op in enumerate(ops, 1):
+        if not isinstance(op, dict):
+            raise ValueError(f"Operation {number} must be an object")
+        kind = op.get('op')
+        if kind not in OP_SCHEMA:
+            raise ValueError(f"Unknown operation: {kind}")
+        for key, (check, required) in OP_SCHEMA[kind].items():
+            if key not in op:
+                if required:
+                    raise ValueError(f"Operation {number} ({kind}) needs '{key}'")
+            elif not check(op[key]):
+                raise ValueError(f"Operation {number} ({kind}): '{key}' must be {OP_CHECKS[check]}")
+
+
+def apply_ops(document, ops):
+    # Runs ops in order and renumbers handles once at the end, if anything
+    # added or removed states or transitions. Returns one log line per op.
+    # Op dicts look like {"op": "enable", "state": ...}, see env_cli.
+    check_ops(ops)
+    log = []
+    next_handle_id = None
+    renumber = False
+    for op in ops:
+        kind = op.get('op')
+        if kind == 'enable':
+            if next_handle_id is None:
+                # New states get ids above every existing handle, so later ops
+                # in the batch can wire transitions to them before renumbering
+                document.materialize()
+                next_handle_id = max_handle_id(document.root_chunk) + 1
+            if enable_state(document, op['state'], op.get('depot_path'), str(next_handle_id)):
+                next_handle_id += 1
+                renumber = True
+                log.append(f"enabled {op['state']}")
+            else:
+                log.append(f"{op['state']} already enabled")
+        elif kind == 'disable':
+            if disable_state(document, op['state']):
+                renumber = True
+                log.append(f"disabled {op['state']}")
+            else:
+                log.append(f"{op['state']} already disabled")
+        elif kind == 'set':
+            set_state_properties(document, op['state'], op['values'])
+            log.append(f"set {', '.join(op['values'])} on {op['state']}")
+        elif kind == 'global':
+            set_global_properties(document, op['values'])
+            log.append(f"set {', '.join(op['values'])} on all states")
+        elif kind == 'bulk':
+            set_many_properties(document, op['values'])
+            log.append(f"set properties on {len(op['values'])} states")
+        elif kind == 'transitions':
+            set_transitions(document, op['state'], op.get('sources'), op.get('targets'))
+            renumber = True
+            log.append(f"set transitions of {op['state']}")
+        elif kind == 'edges':
+            set_edges(document, op.get('add', []), op.get('remove', []))
+            renumber = True
+            log.append(f"added {len(op.get('add', []))} and removed {len(op.get('remove', []))} transitions")
+        elif kind == 'factor':
+            set_factor_values(document, op['category'], op['values'])
+            log.append(f"set {op['category']}")
+        elif kind == 'check':
+            problems = check_curves(document, op.get('minutes', 5))
+            if problems:
+                raise ValueError(f"{len(problems)} curve problems:\n" + "\n".join(problems))
+            log.append("curves checked")
+        elif kind == 'export':
+            rows = export_rows(document, document.state_names())
+            with open(op['path'], 'w') as file:
+                file.write(format_lua(rows))
+            log.append(f"exported {len(rows)} states to {op['path']}")
+        else:
+            raise ValueError(f"Unknown operation: {kind}")
+
+    if renumber:
+        document.ensure_unique_handle_ids()
+    return log
@@ -0,0 +1,27 @@
+class EnvSession:
+    # One loaded env.json shared by every editor window of the process.
+    # Windows subscribe to hear about edits made by the others, instead of
+    # waiting for a save and a file watcher reload.
+    def __init__(self, env_file_path, document):
+        self.env_file_path = env_file_path
+        self.document = document
+        self.listeners = []
+
+    def subscribe(self, callback):
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def notify(self, source=None):
+        # Listeners get (document, source) and ignore changes they made themselves
+        for callback in list(self.listeners):
+            callback(self.document, source)
+
+    def replace(self, document, source=None, env_file_path=None):
+        self.document = document
+        if env_file_path is not None:
+            self.env_file_path = env_file_path
+        self.notify(source)
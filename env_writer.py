@@ -0,0 +1,167 @@
+import hashlib, json, os, shutil, tempfile, uuid
+from env_loader import RawJSON
+
+# Identifies this process in the version stamps it writes
+WRITER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def encode_at(value, layout, indent):
+    if isinstance(value, RawJSON):
+        return value.raw
+    text = json.dumps(value, indent=layout.unit.decode())
+    return text.replace('\n', (layout.newline + indent).decode()).encode('utf-8')
+
+
+def element_replacements(layout, key, value, identities):
+    spans = layout.element_spans(key)
+    if spans is None:
+        return None
+    if isinstance(value, list):
+        if len(spans) != len(value):
+            return None
+        elements = value
+    elif isinstance(value, dict):
+        if [span_key for span_key, start, end in spans] != list(value):
+            return None
+        elements = value.values()
+    else:
+        return None
+
+    indent = layout.member_indent + layout.unit
+    return [
+        (start, end, encode_at(element, layout, indent))
+        for (span_key, start, end), element in zip(spans, elements)
+        if id(element) in identities
+    ]
+
+
+def splice_env(data, layout, changed_members, changed_elements):
+    # Rewrites only the members/entries that changed since the layout was
+    # taken and copies every other byte of the previous file. Returns None when
+    # the document no longer lines up with the layout and needs a full dump.
+    root_chunk = data.get('Data', {}).get('RootChunk')
+    if layout is None or not isinstance(root_chunk, dict) or list(root_chunk) != list(layout.members):
+        return None
+
+    replacements = []
+    for key, (start, end) in layout.members.items():
+        value = root_chunk[key]
+        if isinstance(value, RawJSON):
+            continue
+        if key not in changed_members and key in changed_elements:
+            found = element_replacements(layout, key, value, changed_elements[key])
+            if found is not None:
+                replacements.extend(found)
+                continue
+        if key in changed_members or key in changed_elements:
+            replacements.append((start, end, encode_at(value, layout, layout.member_indent)))
+
+    pieces = []
+    position = 0
+    for start, end, blob in replacements:
+        pieces.append(layout.source[position:start])
+        pieces.append(blob)
+        position = end
+    pieces.append(layout.source[position:])
+    return b''.join(pieces)
+
+
+def rotate_backups(file_path, generations):
+    # file.bak1 is the newest generation, file.bak<generations> the oldest
+    oldest = f"{file_path}.bak{generations}"
+    if os.path.exists(oldest):
+        os.remove(oldest)
+    for generation in range(generations - 1, 0, -1):
+        backup = f"{file_path}.bak{generation}"
+        if os.path.exists(backup):
+            os.replace(backup, f"{file_path}.bak{generation + 1}")
+    try:
+        # A hard link keeps the old contents without a copy or a moment
+        # where file_path does not exist
+        os.link(file_path, f"{file_path}.bak1")
+    except OSError:
+        shutil.copy2(file_path, f"{file_path}.bak1")
+
+
+def fsync_directory(directory):
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_atomic(file_path, source, backups=0):
+    # The new contents go to a sibling temp file that is fsynced and renamed
+    # over the target, so readers see either the old file or the new one and a
+    # failed write leaves the target untouched
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(file_path)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(source)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(file_path):
+            shutil.copymode(file_path, temp_path)
+            if backups > 0:
+                rotate_backups(file_path, backups)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    fsync_directory(directory)
+
+
+def write_env(file_path, source, backups=0):
+    # write_atomic for env.json: a payload without a RootChunk is never
+    # allowed to replace a non-empty file, since with backups off nothing
+    # would be left to recover the json from
+    if b'"RootChunk"' not in source and os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+        raise ValueError(f"Refusing to replace {file_path} with a json that has no RootChunk")
+    write_atomic(file_path, source, backups)
+
+
+def stamp_path(file_path):
+    return f"{file_path}.stamp"
+
+
+def read_stamp(file_path):
+    try:
+        with open(stamp_path(file_path), 'r', encoding='utf-8') as file:
+            stamp = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return stamp if isinstance(stamp, dict) else None
+
+
+def write_stamp(file_path, source):
+    # The sidecar records who wrote the current contents, so watchers can
+    # skip their own saves and tell a file they have already loaded from a
+    # new one without hashing it
+    stat = os.stat(file_path)
+    stamp = {
+        'writer': WRITER_ID,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': hashlib.sha256(source).hexdigest(),
+    }
+    path = stamp_path(file_path)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(stamp, file)
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return None
+    return stamp
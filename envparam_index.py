@@ -0,0 +1,118 @@
+import hashlib, os, pickle, threading
+from doc_cache import CACHE_DIR
+
+INDEX_VERSION = 1
+
+
+def index_path(root, recursive):
+    name = hashlib.sha1(f"{os.path.abspath(root)}|{recursive}".encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, f"envparams-{name}.pickle")
+
+
+class EnvparamIndex:
+    # The .envparam files under an archive folder, kept per directory together
+    # with the directory's mtime. A refresh only re-lists directories whose
+    # mtime moved or that a watcher reported; the rest cost one stat each.
+    def __init__(self, root, recursive=False):
+        self.root = os.path.abspath(root)
+        self.recursive = recursive
+        self.directories = {}
+        self.dirty = set()
+        self.paths = None
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(index_path(self.root, self.recursive), 'rb') as file:
+                version, directories = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError):
+            return
+        if version == INDEX_VERSION:
+            self.directories = directories
+
+    def save(self):
+        path = index_path(self.root, self.recursive)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(temp_path, 'wb') as file:
+                pickle.dump((INDEX_VERSION, self.directories), file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def invalidate(self, directory):
+        # Safe to call from a watcher thread
+        with self.lock:
+            self.dirty.add(os.path.abspath(directory))
+
+    def scan_directory(self, directory, mtime_ns):
+        file_names = []
+        subdirectories = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.endswith('.envparam') and entry.is_file():
+                    file_names.append(entry.name)
+                elif self.recursive and entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.name)
+        file_names.sort()
+        subdirectories.sort()
+        return mtime_ns, file_names, subdirectories
+
+    def refresh(self):
+        # Returns True when the set of files changed since the last refresh
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+
+        changed = False
+        scanned_any = False
+        seen = set()
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            seen.add(directory)
+            entry = self.directories.get(directory)
+            if entry is None or entry[0] != mtime_ns or directory in dirty:
+                try:
+                    scanned = self.scan_directory(directory, mtime_ns)
+                except OSError:
+                    continue
+                if entry is None or scanned[1:] != entry[1:]:
+                    changed = True
+                scanned_any = True
+                entry = self.directories[directory] = scanned
+            stack.extend(os.path.join(directory, name) for name in reversed(entry[2]))
+
+        for directory in list(self.directories):
+            if directory not in seen:
+                del self.directories[directory]
+                changed = True
+        if changed:
+            self.paths = None
+        if scanned_any or changed:
+            self.save()
+        return changed
+
+    def relative_paths(self):
+        # State name -> path of its .envparam relative to the root; the
+        # shallowest, alphabetically first file wins when names repeat
+        if self.paths is not None:
+            return self.paths
+        paths = {}
+        for directory in sorted(self.directories, key=lambda path: (path.count(os.sep), path)):
+            relative = os.path.relpath(directory, self.root)
+            for file_name in self.directories[directory][1]:
+                name = file_name[:-len('.envparam')]
+                if name not in paths:
+                    paths[name] = file_name if relative == os.curdir else os.path.join(relative, file_name)
+        self.paths = paths
+        return paths
+
+    def names(self):
+        return list(self.relative_paths())
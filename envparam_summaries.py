@@ -0,0 +1,173 @@
+import hashlib, json, multiprocessing, os, pickle, threading
+from concurrent.futures import ProcessPoolExecutor
+from doc_cache import CACHE_DIR
+
+SUMMARY_VERSION = 1
+# Below this many stale files the pool costs more to start than it saves
+POOL_THRESHOLD = 16
+
+
+def summary_path(root):
+    name = hashlib.sha1(os.path.abspath(root).encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, f"summaries-{name}.pickle")
+
+
+def find_area_parameters(node, depth=3):
+    # The areaParameters list sits a level or two below the RootChunk
+    if not isinstance(node, dict) or depth < 0:
+        return None
+    if isinstance(node.get('areaParameters'), list):
+        return node['areaParameters']
+    for value in node.values():
+        found = find_area_parameters(value, depth - 1)
+        if found is not None:
+            return found
+    return None
+
+
+def summarize(data):
+    root_chunk = data.get('Data', {}).get('RootChunk', {}) if isinstance(data, dict) else {}
+    areas = find_area_parameters(root_chunk) or []
+    enabled = []
+    for area in areas:
+        area_data = area.get('Data') if isinstance(area, dict) else None
+        if isinstance(area_data, dict) and area_data.get('enable', True):
+            enabled.append(area_data.get('$type', '').replace('AreaSettings', ''))
+    return {'type': root_chunk.get('$type'), 'areas': len(areas), 'enabled': enabled}
+
+
+def summarize_envparam(file_path):
+    # Runs in a pool worker; returns (size, mtime_ns, summary)
+    try:
+        stat = os.stat(file_path)
+    except OSError as e:
+        return None, None, {'error': str(e)}
+    try:
+        with open(file_path, 'rb') as file:
+            summary = summarize(json.load(file))
+    except (OSError, ValueError) as e:
+        # Kept with the file's stat so a broken file isn't re-read every refresh
+        summary = {'error': str(e)}
+    return stat.st_size, stat.st_mtime_ns, summary
+
+
+def summary_text(summary):
+    if summary is None:
+        return ""
+    if 'error' in summary:
+        return "unreadable"
+    if summary['areas']:
+        names = ", ".join(summary['enabled'][:3])
+        more = "…" if len(summary['enabled']) > 3 else ""
+        return f"{len(summary['enabled'])}/{summary['areas']} on: {names}{more}" if names else f"0/{summary['areas']} on"
+    return summary['type'] or ""
+
+
+class EnvparamSummaries:
+    # Compact summaries of .envparam contents, kept on disk per archive folder
+    # and invalidated by each file's size and mtime. Stale files are parsed by a
+    # process pool on a background thread; on_updated is called from that
+    # thread whenever a batch of summaries lands.
+    def __init__(self, on_updated, workers=None):
+        self.on_updated = on_updated
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.root = None
+        self.entries = {}
+        self.pending = None
+        self.thread = None
+        self.stopping = False
+
+    def get(self, relative_path):
+        with self.lock:
+            entry = self.entries.get(relative_path)
+        return entry[2] if entry else None
+
+    def request(self, root, relative_paths):
+        with self.lock:
+            self.pending = (os.path.abspath(root), list(relative_paths))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="EnvparamSummaries", daemon=True)
+                self.thread.start()
+
+    def stop(self):
+        self.stopping = True
+
+    def run(self):
+        while not self.stopping:
+            with self.lock:
+                request, self.pending = self.pending, None
+                if request is None:
+                    self.thread = None
+                    return
+            self.index(*request)
+
+    def load(self, root):
+        try:
+            with open(summary_path(root), 'rb') as file:
+                version, entries = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError):
+            return {}
+        return entries if version == SUMMARY_VERSION else {}
+
+    def save(self, root, entries):
+        path = summary_path(root)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(temp_path, 'wb') as file:
+                pickle.dump((SUMMARY_VERSION, entries), file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def index(self, root, relative_paths):
+        if root != self.root:
+            entries = self.load(root)
+            with self.lock:
+                self.root = root
+                self.entries = entries
+            if entries:
+                self.on_updated()
+
+        stale = []
+        for relative_path in relative_paths:
+            try:
+                stat = os.stat(os.path.join(root, relative_path))
+            except OSError:
+                continue
+            entry = self.entries.get(relative_path)
+            if entry is None or entry[:2] != (stat.st_size, stat.st_mtime_ns):
+                stale.append(relative_path)
+
+        wanted = set(relative_paths)
+        removed = [relative_path for relative_path in self.entries if relative_path not in wanted]
+        if removed:
+            with self.lock:
+                for relative_path in removed:
+                    del self.entries[relative_path]
+        if not stale:
+            if removed:
+                self.save(root, dict(self.entries))
+            return
+
+        file_paths = [os.path.join(root, relative_path) for relative_path in stale]
+        if len(stale) < POOL_THRESHOLD:
+            self.collect(stale, map(summarize_envparam, file_paths))
+        else:
+            # spawn keeps the workers from inheriting Tk and the app's threads
+            with ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                self.collect(stale, pool.map(summarize_envparam, file_paths, chunksize=16))
+                pool.shutdown(cancel_futures=True)
+        self.save(root, dict(self.entries))
+
+    def collect(self, stale, results):
+        batch = max(1, len(stale) // 10)
+        for done, (relative_path, result) in enumerate(zip(stale, results), 1):
+            if self.stopping:
+                return
+            with self.lock:
+                self.entries[relative_path] = result
+            if done % batch == 0 or done == len(stale):
+                self.on_updated()
@@ -0,0 +1,261 @@
+import ctypes, ctypes.util, hashlib, os, select, struct, sys, threading, time
+from env_writer import WRITER_ID, read_stamp
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_MOVED_FROM = 0x00000040
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+def stat_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def content_signature(path):
+    try:
+        with open(path, 'rb') as file:
+            source = file.read()
+    except OSError:
+        return None
+    return len(source), hashlib.sha256(source).hexdigest()
+
+
+def current_version(path):
+    # The version stamp is trusted while it still describes the file on disk,
+    # so a save is recognised without reading and hashing the whole file
+    stat = stat_signature(path)
+    if stat is None:
+        return None, None
+    if os.path.isdir(path):
+        # A watched directory changes when entries are added, removed or renamed
+        return stat, None
+    stamp = read_stamp(path)
+    if stamp and (stamp.get('size'), stamp.get('mtime_ns')) == stat:
+        return (stat[0], stamp.get('sha256')), stamp.get('writer')
+    signature = content_signature(path)
+    if stamp and signature == (stamp.get('size'), stamp.get('sha256')):
+        # Only the mtime moved, e.g. touched; the contents are still the stamped ones
+        return signature, stamp.get('writer')
+    return signature, None
+
+
+class InotifyBackend:
+    # Watches the parent directories, because saves replace env.json by
+    # renaming a temp file over it and a watch on the old inode would go quiet.
+    # A watched directory itself reports any entry being added or removed.
+    mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories = {}
+        self.watch_descriptors = {}
+        self.paths = set()
+
+    def add(self, path):
+        directory = path if os.path.isdir(path) else os.path.dirname(path)
+        if directory not in self.watch_descriptors:
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.mask)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+            self.watch_descriptors[directory] = wd
+            self.directories[wd] = directory
+        self.paths.add(path)
+
+    def remove(self, path):
+        self.paths.discard(path)
+
+    def wait(self, timeout):
+        changed = set()
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return changed
+        try:
+            buffer = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(buffer, offset)
+            offset += INOTIFY_EVENT.size
+            name = buffer[offset:offset + length].rstrip(b'\0')
+            offset += length
+            directory = self.directories.get(wd)
+            if directory is None:
+                continue
+            if directory in self.paths:
+                changed.add(directory)
+            if name:
+                path = os.path.join(directory, os.fsdecode(name))
+                if path in self.paths:
+                    changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingBackend:
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.stats = {}
+        self.wakeup = threading.Event()
+
+    def add(self, path):
+        self.stats[path] = stat_signature(path)
+
+    def remove(self, path):
+        self.stats.pop(path, None)
+
+    def wait(self, timeout):
+        self.wakeup.wait(self.interval if timeout is None else min(timeout, self.interval))
+        self.wakeup.clear()
+        changed = set()
+        for path, previous in list(self.stats.items()):
+            current = stat_signature(path)
+            if current != previous:
+                self.stats[path] = current
+                changed.add(path)
+        return changed
+
+    def close(self):
+        self.wakeup.set()
+
+
+class FileWatcher:
+    # One background thread per process for every window that watches a file
+    # or directory. Bursts of events are debounced, and subscribers are only called when the
+    # size or content hash really differs from what they last saw.
+    def __init__(self, debounce=0.15, poll_interval=1.0):
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.signatures = {}
+        self.pending = {}
+        self.backend = None
+        self.thread = None
+        self.stopping = False
+
+    def make_backend(self):
+        if sys.platform.startswith('linux'):
+            try:
+                return InotifyBackend()
+            except (OSError, AttributeError, TypeError):
+                pass
+        return PollingBackend(self.poll_interval)
+
+    def subscribe(self, path, callback):
+        path = os.path.abspath(path)
+        with self.lock:
+            if self.backend is None:
+                self.backend = self.make_backend()
+            if path not in self.subscribers:
+                self.subscribers[path] = []
+                self.signatures[path] = current_version(path)[0]
+                try:
+                    self.backend.add(path)
+                except OSError:
+                    # e.g. inotify watch limit reached; poll everything instead
+                    self.backend.close()
+                    self.backend = PollingBackend(self.poll_interval)
+                    for watched in self.subscribers:
+                        self.backend.add(watched)
+            if callback not in self.subscribers[path]:
+                self.subscribers[path].append(callback)
+            if self.thread is None:
+                self.stopping = False
+                self.thread = threading.Thread(target=self.run, name="FileWatcher", daemon=True)
+                self.thread.start()
+
+    def unsubscribe(self, path, callback):
+        path = os.path.abspath(path)
+        with self.lock:
+            callbacks = self.subscribers.get(path, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if path in self.subscribers and not callbacks:
+                del self.subscribers[path]
+                self.signatures.pop(path, None)
+                self.pending.pop(path, None)
+                self.backend.remove(path)
+
+    def stop(self):
+        with self.lock:
+            self.stopping = True
+            thread = self.thread
+            self.thread = None
+        if thread is not None:
+            thread.join(self.poll_interval * 2)
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
+
+    def run(self):
+        while not self.stopping:
+            with self.lock:
+                backend = self.backend
+                deadlines = list(self.pending.values())
+            timeout = self.poll_interval
+            if deadlines:
+                timeout = max(0.0, min(min(deadlines) - time.monotonic(), timeout))
+            try:
+                changed = backend.wait(timeout)
+            except (OSError, ValueError):
+                if self.stopping:
+                    break
+                with self.lock:
+                    swapped = backend is not self.backend
+                if swapped:
+                    # subscribe() closed this backend under us to fall back to
+                    # polling; carry on with the new one
+                    continue
+                raise
+
+            now = time.monotonic()
+            due = []
+            with self.lock:
+                for path in changed:
+                    if path in self.subscribers:
+                        self.pending[path] = now + self.debounce
+                for path, deadline in list(self.pending.items()):
+                    if deadline <= now:
+                        del self.pending[path]
+                        due.append(path)
+
+            for path in due:
+                self.check(path)
+
+    def check(self, path):
+        signature, writer = current_version(path)
+        with self.lock:
+            if signature is None or signature == self.signatures.get(path):
+                return
+            self.signatures[path] = signature
+            if writer == WRITER_ID:
+                # Saved by this process, whose windows already share the document
+                return
+            callbacks = list(self.subscribers.get(path, []))
+        for callback in callbacks:
+            callback(path)
+
+
+shared = None
+
+
+def shared_watcher():
+    global shared
+    if shared is None:
+        shared = FileWatcher()
+    return shared
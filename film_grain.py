@@ -1,18 +1,28 @@
 import tkinter as tk
 from tkinter import messagebox
-import json
 import os
-import threading
-import time
+from background_reload import BackgroundReloader
+from edit_history import FactorEdit
+from env_document import EnvDocument
+from file_watcher import shared_watcher
 
 class FilmGrainApp:
-    def __init__(self, root):
+    def __init__(self, root, session=None):
         self.root = root
         self.root.title("Edit Film Grain Properties")
         self.root.minsize(500, 300)
 
-        self.env_file_path = self.get_env_file_path()
-        self.data = self.load_json(self.env_file_path)
+        # Inside the main window's process the document is shared, not loaded
+        self.session = session
+        if session:
+            self.env_file_path = session.env_file_path
+            self.document = session.document
+        else:
+            self.env_file_path = self.get_env_file_path()
+            self.document = self.load_json(self.env_file_path)
+
+        self.root.bind("<Control-z>", lambda event: self.undo())
+        self.root.bind("<Control-y>", lambda event: self.redo())
 
         # Create frames for the headers and listboxes
         left_frame = tk.Frame(root)
@@ -39,6 +49,7 @@ class FilmGrainApp:
 
         self.confirm_label = tk.Label(right_frame, text="", fg="green")
         self.confirm_label.pack(side=tk.LEFT, padx=10)
+        self.update_save_button()
 
         categories = ["resolutionAberrationDispersal", "resolutionFilmGrainScale", "resolutionFilmGrainStrength"]
         for category in categories:
@@ -48,10 +59,11 @@ class FilmGrainApp:
 
         self.current_selection = None
 
-        # Start the file watcher thread
-        self.stop_watching = False
-        self.file_watcher_thread = threading.Thread(target=self.watch_file)
-        self.file_watcher_thread.start()
+        if session:
+            session.subscribe(self.on_document_changed)
+        else:
+            self.reloader = BackgroundReloader(self.root, self.on_reloaded, self.on_reload_failed)
+            shared_watcher().subscribe(self.env_file_path, self.on_file_changed)
 
     def create_entries(self, parent):
         self.entries_frame = tk.Frame(parent)
@@ -67,16 +79,14 @@ class FilmGrainApp:
 
     def load_json(self, file_path):
         try:
-            with open(file_path, 'r') as file:
-                return json.load(file)
+            return EnvDocument.load(file_path, lazy=True, cache=True)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load JSON file: {e}")
-            return {}
+            return EnvDocument()
 
     def save_json(self, file_path):
         try:
-            with open(file_path, 'w') as file:
-                json.dump(self.data, file, indent=4)
+            self.document.save(file_path)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save JSON file: {e}")
 
@@ -85,7 +95,7 @@ class FilmGrainApp:
         if selected_index:
             self.current_selection = selected_index[0]
             selected_category = self.left_listbox.get(selected_index)
-            elements = self.data['Data']['RootChunk']['renderSettingFactors'][selected_category]['Elements']
+            elements = self.document.root_chunk['renderSettingFactors'][selected_category]['Elements']
 
             for widget in self.entries_frame.winfo_children():
                 widget.destroy()
@@ -102,12 +112,15 @@ class FilmGrainApp:
     def save_changes(self):
         if self.current_selection is not None:
             selected_category = self.left_listbox.get(self.current_selection)
-            elements = self.data['Data']['RootChunk']['renderSettingFactors'][selected_category]['Elements']
-
-            for i, (point, value_entry) in enumerate(self.entries[selected_category]):
-                elements[i]['Value'] = float(value_entry.get())
+            try:
+                values = [float(value_entry.get()) for point, value_entry in self.entries[selected_category]]
+            except ValueError:
+                messagebox.showwarning("Warning", "Values must be numbers.")
+                return  # Do not save changes
+            self.document.history.perform(FactorEdit(selected_category, values))
 
             self.save_json(self.env_file_path)
+            self.notify_session()
 
             # Highlight the selected category
             self.left_listbox.selection_clear(0, tk.END)
@@ -118,23 +131,53 @@ class FilmGrainApp:
             self.confirm_label.config(text="Changes saved successfully!")
             self.root.after(3000, self.clear_confirmation)
 
+    def undo(self):
+        if self.document.history.undo():
+            self.on_left_listbox_select(None)
+            self.notify_session()
+
+    def redo(self):
+        if self.document.history.redo():
+            self.on_left_listbox_select(None)
+            self.notify_session()
+
     def clear_confirmation(self):
         self.confirm_label.config(text="")
 
-    def watch_file(self):
-        last_modified_time = os.path.getmtime(self.env_file_path)
-        while not self.stop_watching:
-            time.sleep(1)
-            current_modified_time = os.path.getmtime(self.env_file_path)
-            if current_modified_time != last_modified_time:
-                last_modified_time = current_modified_time
-                self.reload_json()
+    def on_file_changed(self, path):
+        self.reload_json()
 
     def reload_json(self):
-        self.data = self.load_json(self.env_file_path)
+        self.reloader.request(self.env_file_path)
+
+    def on_reloaded(self, file_path, document):
+        self.document = document
+        self.update_save_button()
+
+    def on_reload_failed(self, file_path, error):
+        messagebox.showerror("Error", f"Failed to load JSON file: {error}")
+
+    def on_document_changed(self, document, source):
+        if source is self:
+            return
+        self.env_file_path = self.session.env_file_path
+        self.document = document
+        self.update_save_button()
+
+    def update_save_button(self):
+        # A json that failed to load is never written back over the file
+        self.confirm_button.config(state=tk.NORMAL if self.document.loaded else tk.DISABLED)
+
+    def notify_session(self):
+        if self.session:
+            self.session.notify(self)
 
     def on_closing(self):
-        self.stop_watching = True
+        if self.session:
+            self.session.unsubscribe(self.on_document_changed)
+        else:
+            shared_watcher().unsubscribe(self.env_file_path, self.on_file_changed)
+            self.reloader.stop()
         self.root.destroy()
 
 if __name__ == "__main__":
@@ -1,51 +1,125 @@
 import tkinter as tk
 from tkinter import messagebox
 from tkinter import ttk
-import json
 import os
+from env_document import EnvDocument
+from edit_history import BulkPropertiesEdit
+from listbox_sync import sync_listbox
+from perf_log import timed
+from state_columns import NUMPY_MISSING, StateColumns, np
+
+FIELDS = {"Min Duration": 'minDuration', "Max Duration": 'maxDuration',
+          "Probability": 'probability', "Transition Duration": 'transitionDuration'}
+EFFECTS = {"Any effect": None, "With effect": True, "Without effect": False}
+OPERATIONS = ["Set to", "Scale by", "Add", "Clamp to"]
+ANY_VALUE = "Any value of"
 
 class EditDebugApp:
-    def __init__(self, root):
+    # Changes one property of every state matching the filters. The states are
+    # read into columns once per document; each filter change only rebuilds
+    # the row mask, and Apply writes every changed state back as one edit.
+    def __init__(self, root, session=None):
         self.root = root
         self.root.title("Debug")
-        self.root.minsize(350, 150)
+        self.root.minsize(450, 450)
+
+        # Inside the main window's process the document is shared, not loaded
+        self.session = session
+        if session:
+            self.env_file_path = session.env_file_path
+            self.document = session.document
+            session.subscribe(self.on_document_changed)
+        else:
+            self.env_file_path = self.get_env_file_path()
+            self.document = self.load_json(self.env_file_path)
+        self.columns = StateColumns(self.document)
 
-        self.env_file_path = self.get_env_file_path()
-        self.data = self.load_json(self.env_file_path)
+        self.root.bind("<Control-z>", lambda event: self.undo())
+        self.root.bind("<Control-y>", lambda event: self.redo())
 
         right_frame = tk.Frame(root)
         right_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
-        self.right_header = tk.Label(right_frame, text="Edit Global Properties")
+        self.right_header = tk.Label(right_frame, text="Edit Properties of Many States")
         self.right_header.pack(pady=(0, 10))
 
         warning_frame = tk.Frame(right_frame, bg="red")
         warning_frame.pack(fill=tk.X, padx=10, pady=(0, 15))
-        warning_label = tk.Label(warning_frame, text="Warning: this will override all state values!", bg="red", fg="white", font=("Segoe UI", 10, "bold"))
+        warning_label = tk.Label(warning_frame, text="Warning: this will override the values of every matching state!", bg="red", fg="white", font=("Segoe UI", 10, "bold"))
         warning_label.pack(padx=15, pady=5)
 
-        # Add the new text box below the warning box
-        info_label = tk.Label(right_frame, text="Leave fields blank to save as 'null'.", fg="black")
-        info_label.pack(pady=(0, 15))
+        # Which states: name glob, effect and a range of one current value
+        filter_frame = tk.LabelFrame(right_frame, text="States")
+        filter_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        self.pattern = tk.StringVar(value="*")
+        self.effect = tk.StringVar(value="Any effect")
+        self.range_field = tk.StringVar(value=ANY_VALUE)
+        self.range_low = tk.StringVar()
+        self.range_high = tk.StringVar()
+
+        row = tk.Frame(filter_frame)
+        row.pack(fill=tk.X, padx=5, pady=5)
+        tk.Label(row, text="Name").pack(side=tk.LEFT)
+        tk.Entry(row, textvariable=self.pattern).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        ttk.Combobox(row, textvariable=self.effect, values=list(EFFECTS), state='readonly', width=14).pack(side=tk.LEFT)
+
+        row = tk.Frame(filter_frame)
+        row.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Combobox(row, textvariable=self.range_field, values=[ANY_VALUE] + list(FIELDS), state='readonly', width=18).pack(side=tk.LEFT)
+        tk.Label(row, text="from").pack(side=tk.LEFT, padx=5)
+        tk.Entry(row, textvariable=self.range_low, width=8).pack(side=tk.LEFT)
+        tk.Label(row, text="to").pack(side=tk.LEFT, padx=5)
+        tk.Entry(row, textvariable=self.range_high, width=8).pack(side=tk.LEFT)
+
+        self.match_label = tk.Label(filter_frame, text="", anchor='w')
+        self.match_label.pack(fill=tk.X, padx=5)
+
+        list_frame = tk.Frame(filter_frame)
+        list_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        scrollbar = tk.Scrollbar(list_frame, orient=tk.VERTICAL)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.match_listbox = tk.Listbox(list_frame, height=8, font=("Consolas", 9), yscrollcommand=scrollbar.set)
+        self.match_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=self.match_listbox.yview)
+
+        for variable in (self.pattern, self.effect, self.range_field, self.range_low, self.range_high):
+            variable.trace_add('write', lambda *args: self.update_matches())
 
-        self.entries = {}
-        self.create_entries(right_frame)
+        # What to do with them
+        change_frame = tk.LabelFrame(right_frame, text="Change")
+        change_frame.pack(fill=tk.X, padx=10, pady=5)
 
-        self.confirm_button = tk.Button(right_frame, text="Save", command=self.save_changes)
+        self.field = tk.StringVar(value="Probability")
+        self.operation = tk.StringVar(value="Set to")
+
+        row = tk.Frame(change_frame)
+        row.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Combobox(row, textvariable=self.field, values=list(FIELDS), state='readonly', width=18).pack(side=tk.LEFT)
+        ttk.Combobox(row, textvariable=self.operation, values=OPERATIONS, state='readonly', width=10).pack(side=tk.LEFT, padx=5)
+        self.value_entry = tk.Entry(row, width=8)
+        self.value_entry.pack(side=tk.LEFT)
+        tk.Label(row, text="to").pack(side=tk.LEFT, padx=5)
+        self.high_entry = tk.Entry(row, width=8)
+        self.high_entry.pack(side=tk.LEFT)
+
+        info_label = tk.Label(change_frame, text="Leave \"Set to\" blank to save as 'null'; \"to\" is only used by \"Clamp to\".\nScale by, Add and Clamp to change every point of a curve.", fg="black")
+        info_label.pack(padx=5, pady=(0, 5))
+
+        button_frame = tk.Frame(right_frame)
+        button_frame.pack(fill=tk.X)
+
+        self.apply_button = tk.Button(button_frame, text="Apply", command=self.apply_changes)
+        self.apply_button.pack(side=tk.LEFT, padx=10, pady=10)
+
+        self.confirm_button = tk.Button(button_frame, text="Save", command=self.save_changes)
         self.confirm_button.pack(side=tk.LEFT, padx=10, pady=10)
 
-        self.confirm_label = tk.Label(right_frame, text="", fg="green")
+        self.confirm_label = tk.Label(button_frame, text="", fg="green")
         self.confirm_label.pack(side=tk.LEFT, padx=10)
 
-    def create_entries(self, parent):
-        labels = ["Min Duration", "Max Duration", "Probability", "Transition Duration"]
-        for label in labels:
-            frame = tk.Frame(parent)
-            frame.pack(fill=tk.X, padx=10, pady=5)
-            tk.Label(frame, text=label, anchor='w', padx=10).pack(side=tk.LEFT)
-            entry = tk.Entry(frame)
-            entry.pack(side=tk.RIGHT, fill=tk.X, expand=True)
-            self.entries[label] = entry
+        self.update_matches()
+        self.update_save_buttons()
 
     def get_env_file_path(self):
         if os.path.exists('env_file_path.txt'):
@@ -57,58 +131,137 @@ class EditDebugApp:
 
     def load_json(self, file_path):
         try:
-            with open(file_path, 'r') as file:
-                return json.load(file)
+            return EnvDocument.load(file_path, lazy=True, cache=True)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load JSON file: {e}")
-            return {}
+            return EnvDocument()
 
     def save_json(self, file_path):
         try:
-            with open(file_path, 'w') as file:
-                json.dump(self.data, file, indent=4)
+            self.document.save(file_path)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save JSON file: {e}")
 
-    def save_changes(self):
-        for state in self.data['Data']['RootChunk']['weatherStates']:
-            state_data = state['Data']
+    def parse(self, text):
+        return None if text.strip() == "" else float(text)
 
-            self.update_field(state_data, 'minDuration', self.entries["Min Duration"])
-            self.update_field(state_data, 'maxDuration', self.entries["Max Duration"])
-            self.update_field(state_data, 'probability', self.entries["Probability"])
-            self.update_field(state_data, 'transitionDuration', self.entries["Transition Duration"])
+    def selection(self):
+        # The row mask of the filters, or None while a range bound isn't a number
+        field = FIELDS.get(self.range_field.get())
+        try:
+            low, high = self.parse(self.range_low.get()), self.parse(self.range_high.get())
+        except ValueError:
+            return None
+        return self.columns.select(self.pattern.get(), EFFECTS[self.effect.get()], field, low, high)
 
+    @timed('update_matches')
+    def update_matches(self):
+        mask = self.selection()
+        if mask is None:
+            self.match_label.config(text="Range bounds must be numbers.")
+            return
+        rows = self.columns.rows(mask)
+        self.match_label.config(text=f"{len(rows)} of {len(self.columns)} states match")
+        sync_listbox(self.match_listbox, [self.format_row(row, values) for row, values in zip(rows, self.columns.values(rows))])
+
+    def format_row(self, row, values):
+        # A curve that changes through the day shows its lowest and highest value
+        text = "  ".join(self.format_range(values[field]) for field in FIELDS.values())
+        return f"{text}  {self.columns.names[row]}"
+
+    def format_range(self, values):
+        if values is None:
+            return "-".rjust(13)
+        low, high = values
+        return f"{low:13g}" if low == high else f"{low:g}..{high:g}".rjust(13)
+
+    def apply_changes(self):
+        mask = self.selection()
+        if mask is None:
+            messagebox.showerror("Error", "Range bounds must be numbers.")
+            return
+        field = FIELDS[self.field.get()]
+        operation = self.operation.get()
+        try:
+            value = self.parse(self.value_entry.get())
+            high = self.parse(self.high_entry.get())
+        except ValueError:
+            messagebox.showerror("Error", "Values must be numbers.")
+            return
+        if value is None and operation in ("Scale by", "Add"):
+            messagebox.showerror("Error", f"{operation} needs a value.")
+            return
+
+        if operation == "Set to":
+            self.columns.set(field, mask, value)
+        elif operation == "Scale by":
+            self.columns.scale(field, mask, value)
+        elif operation == "Add":
+            self.columns.offset(field, mask, value)
+        else:
+            self.columns.clamp(field, mask, value, high)
+
+        changes = self.columns.changes()
+        if changes:
+            self.document.history.perform(BulkPropertiesEdit(changes))
+            self.notify_session()
+        self.refresh()
+        self.confirm_label.config(text=f"Changed {len(changes)} states.")
+        self.root.after(3000, self.clear_confirmation)
+
+    def save_changes(self):
+        # Apply changes the document; Save writes it, so an operation like
+        # Scale by is never applied twice
         self.save_json(self.env_file_path)
+        self.notify_session()
 
         # Show confirmation message
         self.confirm_label.config(text="Changes saved successfully!")
         self.root.after(3000, self.clear_confirmation)
 
-    def update_field(self, state_data, field_name, entry):
-        value = self.get_entry_value(entry)
-        if value is None:
-            state_data[field_name] = None
-        else:
-            state_data[field_name] = {
-                "InterpolationType": "Linear",
-                "LinkType": "ESLT_Normal",
-                "Elements": [{"Point": 12, "Value": value}]
-            }
+    def undo(self):
+        if self.document.history.undo():
+            self.refresh()
+            self.notify_session()
+
+    def redo(self):
+        if self.document.history.redo():
+            self.refresh()
+            self.notify_session()
 
     def clear_confirmation(self):
         self.confirm_label.config(text="")
 
-    def get_entry_value(self, entry):
-        value = entry.get()
-        if value == "":
-            return None
-        return float(value)
+    def refresh(self):
+        self.columns = StateColumns(self.document)
+        self.update_matches()
+        self.update_save_buttons()
+
+    def update_save_buttons(self):
+        # A json that failed to load is never edited or written back over the file
+        state = tk.NORMAL if self.document.loaded else tk.DISABLED
+        self.apply_button.config(state=state)
+        self.confirm_button.config(state=state)
+
+    def on_document_changed(self, document, source):
+        if source is self:
+            return
+        self.env_file_path = self.session.env_file_path
+        self.document = document
+        self.refresh()
+
+    def notify_session(self):
+        if self.session:
+            self.session.notify(self)
 
     def on_closing(self):
+        if self.session:
+            self.session.unsubscribe(self.on_document_changed)
         self.root.destroy()
 
 if __name__ == "__main__":
+    if np is None:
+        raise SystemExit(NUMPY_MISSING)
     root = tk.Tk()
     app = EditDebugApp(root)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
@@ -0,0 +1,115 @@
+def collect_handle_refs(node, refs):
+    # Explicit stack so deeply nested chunks can't hit the recursion limit
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if 'HandleRefId' in node:
+                refs.append(node)
+            for value in node.values():
+                if isinstance(value, (dict, list)):
+                    stack.append(value)
+        elif isinstance(node, list):
+            for value in node:
+                if isinstance(value, (dict, list)):
+                    stack.append(value)
+    return refs
+
+
+def max_handle_id(node):
+    # Highest numeric HandleId anywhere below node, or -1
+    highest = -1
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            handle_id = node.get('HandleId')
+            if isinstance(handle_id, str) and handle_id.isdigit():
+                highest = max(highest, int(handle_id))
+            for value in node.values():
+                if isinstance(value, (dict, list)):
+                    stack.append(value)
+        elif isinstance(node, list):
+            for value in node:
+                if isinstance(value, (dict, list)):
+                    stack.append(value)
+    return highest
+
+
+class HandleRenumberer:
+    # States and transitions are edited all the time, so they are rescanned on
+    # every renumber. Everything else in RootChunk (areaParameters and friends)
+    # is only ever renumbered, so its HandleId/HandleRefId locations are found
+    # once and cached for the lifetime of the root chunk.
+    dynamic_keys = ('weatherStates', 'weatherStateTransitions')
+
+    def __init__(self):
+        self.invalidate()
+
+    def invalidate(self):
+        self.root_chunk = None
+        self.static_groups = []
+
+    def scan_static(self, root_chunk):
+        # (RootChunk key, HandleId owners, HandleRefId holders). Other top level
+        # lists come first, then areaParameters with hdrMode and mode, in the
+        # same order ensure_unique_handle_ids always assigned them.
+        groups = []
+        for key, value in root_chunk.items():
+            if key in self.dynamic_keys:
+                continue
+            owners = []
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, dict) and 'HandleId' in item:
+                        owners.append(item)
+            groups.append((key, owners, collect_handle_refs(value, [])))
+
+        owners = []
+        render_settings = root_chunk.get('worldRenderSettings') or {}
+        for area in render_settings.get('areaParameters', []):
+            owners.append(area)
+            if 'hdrMode' in area['Data']:
+                owners.append(area['Data']['hdrMode'])
+            if 'mode' in area['Data']:
+                owners.append(area['Data']['mode'])
+        groups.append(('worldRenderSettings', owners, []))
+
+        self.root_chunk = root_chunk
+        self.static_groups = groups
+
+    def renumber(self, root_chunk):
+        if root_chunk is not self.root_chunk:
+            self.scan_static(root_chunk)
+
+        states = root_chunk.get('weatherStates', [])
+        transitions = root_chunk.get('weatherStateTransitions', [])
+        groups = [
+            ('weatherStates', states, collect_handle_refs(states, [])),
+            ('weatherStateTransitions', transitions, collect_handle_refs(transitions, []))
+        ] + self.static_groups
+
+        # Assign new HandleIds, remembering where each old id went. Duplicate
+        # old ids (freshly added "0" entries) resolve to their first owner.
+        remap = {}
+        changed = set()
+        handle_id = 0
+        for key, owners, refs in groups:
+            for owner in owners:
+                new_id = str(handle_id)
+                remap.setdefault(owner['HandleId'], new_id)
+                if owner['HandleId'] != new_id:
+                    owner['HandleId'] = new_id
+                    changed.add(key)
+                handle_id += 1
+
+        # Point every HandleRefId at the renumbered handle
+        for key, owners, refs in groups:
+            for ref in refs:
+                new_id = remap.get(ref['HandleRefId'])
+                if new_id is not None and ref['HandleRefId'] != new_id:
+                    ref['HandleRefId'] = new_id
+                    changed.add(key)
+
+        # RootChunk members whose contents changed
+        return changed
@@ -0,0 +1,65 @@
+import tkinter as tk
+from difflib import SequenceMatcher
+
+
+def sync_listbox(listbox, items):
+    # Turns the rows on screen into items with only the inserts, deletes and
+    # renames needed, so unchanged rows keep their selection and styling.
+    # Returns the (start, end) index ranges of the rows that were inserted.
+    current = listbox.get(0, tk.END)
+    items = list(items)
+    opcodes = SequenceMatcher(None, current, items, autojunk=False).get_opcodes()
+    inserted = []
+    for tag, i1, i2, j1, j2 in reversed(opcodes):
+        if tag in ('replace', 'delete'):
+            listbox.delete(i1, i2 - 1)
+        if tag in ('replace', 'insert'):
+            listbox.insert(i1, *items[j1:j2])
+            inserted.append((j1, j2))
+    return inserted
+
+
+def reconcile_listbox(listbox, items, key=None):
+    # Keyed by row text (or key(row)) for lists whose order doesn't matter:
+    # rows that are no longer wanted are deleted, rows whose text changed are
+    # relabelled in place, new ones appended, and the rest stay put. Tk shifts
+    # the selection and the scroll position along with the rows.
+    key = key or (lambda row: row)
+    wanted = {key(item): item for item in items}
+    current = listbox.get(0, tk.END)
+    end = len(current)
+    while end > 0:
+        if key(current[end - 1]) in wanted:
+            end -= 1
+            continue
+        start = end - 1
+        while start > 0 and key(current[start - 1]) not in wanted:
+            start -= 1
+        listbox.delete(start, end - 1)
+        end = start
+
+    for index, row in enumerate(listbox.get(0, tk.END)):
+        item = wanted[key(row)]
+        if item != row:
+            selected = listbox.selection_includes(index)
+            listbox.delete(index)
+            listbox.insert(index, item)
+            if selected:
+                listbox.selection_set(index)
+
+    shown = {key(row) for row in current}
+    added = [item for item in items if key(item) not in shown]
+    if added:
+        listbox.insert(tk.END, *added)
+    return added
+
+
+LABEL_SEPARATOR = "  \u2014  "
+
+
+def labelled(name, label):
+    return f"{name}{LABEL_SEPARATOR}{label}" if label else name
+
+
+def unlabelled(row):
+    return row.split(LABEL_SEPARATOR, 1)[0]
@@ -1,17 +1,43 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, Toplevel, Label
-import json, os, subprocess, threading, time
+import os, subprocess, sys
+import perf_log, state_columns, weather_simulation
+from background_reload import BackgroundReloader
+from env_document import EnvDocument
+from env_ops import EXCLUDED_STATES, EXPORT_EXCLUDED_STATES, envparam_depot_path, export_rows, format_lua, new_state
+from edit_history import RemoveStateEdit
+from edit_journal import EditJournal, effective_ops, file_version, replay_ops
+from env_session import EnvSession
+from envparam_index import EnvparamIndex
+from envparam_summaries import EnvparamSummaries, summary_text
+from file_watcher import shared_watcher
+from film_grain import FilmGrainApp
+from global_properties import EditDebugApp
+from listbox_sync import labelled, reconcile_listbox, sync_listbox, unlabelled
+from perf_log import timed
+from matrix_editor import TransitionMatrixApp
+from properties import EditPropertiesApp
+from simulator import SimulatorApp
+from transition_matrix import NUMPY_MISSING, np
+from transitions import EditTransitionsApp
 
 class WeatherApp:
-    def __init__(self, root):
-        self.exclusion_list = ["24h_weather_sunny", "24h_weather_rain", "24h_weather_fog", "24h_weather_pollution", "24h_weather_toxic_rain", "24h_weather_sandstorm", "24h_weather_light_clouds", "24h_weather_cloudy", "24h_weather_heavy_clouds", "q302_squat_morning", "q302_deeb_blue", "sa_courier_clouds", "q306_epilogue_cloudy_morning", "q306_rainy_night", "q302_light_rain"]
+    def __init__(self, root, in_process=True, recursive_envparams=False):
+        self.exclusion_list = list(EXCLUDED_STATES)
 
-        self.exclusion_list_export = ["q302_squat_morning", "q302_deeb_blue", "sa_courier_clouds", "q306_epilogue_cloudy_morning", "q306_rainy_night", "q302_light_rain"]
+        self.exclusion_list_export = list(EXPORT_EXCLUDED_STATES)
 
         self.root = root
         self.root.title("Weather State Manager")
         self.root.minsize(550, 380)
 
+        # With timing enabled (--perf) a status bar shows the last operation's cost
+        self.status_label = None
+        if perf_log.enabled:
+            self.status_label = tk.Label(root, anchor='w')
+            self.status_label.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+            perf_log.subscribe(self.on_span)
+
         left_frame = tk.Frame(root)
         left_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=10, pady=10)
 
@@ -31,6 +57,7 @@ class WeatherApp:
         self.right_listbox = tk.Listbox(right_frame)
         self.right_listbox.pack(fill=tk.BOTH, expand=True, pady=10)
         self.right_listbox.bind("<Motion>", self.show_tooltip)
+        self.right_listbox.bind("<Button-1>", self.disable_click)
 
         button_width = 15
         button_width_arrows = 6
@@ -41,6 +68,12 @@ class WeatherApp:
         self.targets_button = tk.Button(button_frame, text="Transitions", command=self.open_transitions, width=button_width)
         self.targets_button.pack(pady=5)
 
+        self.matrix_button = tk.Button(button_frame, text="Transition Matrix", command=self.open_transition_matrix, width=button_width)
+        self.matrix_button.pack(pady=5)
+
+        self.simulate_button = tk.Button(button_frame, text="Simulate", command=self.open_simulator, width=button_width)
+        self.simulate_button.pack(pady=5)
+
         self.properties_button = tk.Button(button_frame, text="Properties", command=self.open_properties, width=button_width)
         self.properties_button.pack(pady=5)
 
@@ -53,6 +86,18 @@ class WeatherApp:
         self.add_button = tk.Button(move_button_frame, text=">>>", command=self.add_states, width=button_width_arrows)
         self.add_button.pack(side=tk.LEFT, padx=5)
 
+        history_button_frame = tk.Frame(button_frame)
+        history_button_frame.pack(pady=5)
+
+        self.undo_button = tk.Button(history_button_frame, text="Undo", command=self.undo, width=button_width_arrows)
+        self.undo_button.pack(side=tk.LEFT, padx=5)
+
+        self.redo_button = tk.Button(history_button_frame, text="Redo", command=self.redo, width=button_width_arrows)
+        self.redo_button.pack(side=tk.LEFT, padx=5)
+
+        self.root.bind("<Control-z>", lambda event: self.undo())
+        self.root.bind("<Control-y>", lambda event: self.redo())
+
         self.save_button = tk.Button(button_frame, text="Save", command=self.save_states, width=button_width)
         self.save_button.pack(pady=5)
 
@@ -75,13 +120,33 @@ class WeatherApp:
         self.debug_button = tk.Button(button_frame, text="Debug", command=self.open_global_properties, width=button_width)
         self.debug_button.pack(side=tk.BOTTOM, pady=5)
 
+        # .envparam files are listed from a persistent per-directory index;
+        # --recursive also picks them up from nested folders
+        self.recursive_envparams = recursive_envparams
+        self.envparam_index = None
+        self.envparam_summaries = EnvparamSummaries(self.on_envparam_summaries)
+        self.watched_directories = set()
+        # States moved to the enabled list that only get added on Save
+        self.pending_states = []
+        self.reloader = BackgroundReloader(self.root, self.on_reloaded, self.on_reload_failed)
+
         self.env_file_path = self.get_env_file_path()
-        self.data = self.load_json(self.env_file_path)
+        self.document = self.load_json(self.env_file_path)
+        # Edits since the last save are journaled next to the json and
+        # replayed over it after a crash or a reload
+        self.journal = self.open_journal(self.env_file_path)
+        self.apply_journal(self.document)
         self.populate_listboxes(self.get_folder_path_from_env_file())
+        self.update_save_button()
+
+        # Editors open as Toplevel windows on this session's document unless
+        # started with --subprocess
+        self.in_process = in_process
+        self.editors = {}
+        self.session = EnvSession(self.env_file_path, self.document)
+        self.session.subscribe(self.on_document_changed)
 
-        self.stop_watching = False
-        self.file_watcher_thread = threading.Thread(target=self.watch_file)
-        self.file_watcher_thread.start()
+        shared_watcher().subscribe(self.env_file_path, self.on_file_changed)
 
         self.tooltip = None
         self.tooltips_enabled = False
@@ -90,7 +155,12 @@ class WeatherApp:
     def select_json_file(self):
         file_path = filedialog.askopenfilename(title="Select main env.json file", filetypes=(("JSON files", "*.json"), ("all files", "*.*")))
         if file_path:
+            shared_watcher().unsubscribe(self.env_file_path, self.on_file_changed)
             self.env_file_path = file_path
+            self.pending_states = []
+            self.journal.close()
+            self.journal = self.open_journal(file_path)
+            shared_watcher().subscribe(self.env_file_path, self.on_file_changed)
             with open('env_file_path.txt', 'w') as file:
                 file.write(file_path)
             self.reload_json()
@@ -101,7 +171,7 @@ class WeatherApp:
         widget = event.widget
         index = widget.nearest(event.y)
         if index != -1:
-            state_name = widget.get(index)
+            state_name = unlabelled(widget.get(index))
             handle_id = self.get_handle_id_by_name(state_name)
             if handle_id:
                 if self.tooltip:
@@ -118,237 +188,63 @@ class WeatherApp:
         self.toggle_tooltips_button.config(text="Enable Tooltips" if not self.tooltips_enabled else "Disable Tooltips")
 
     def get_handle_id_by_name(self, name):
-        for state in self.data.get('Data', {}).get('RootChunk', {}).get('weatherStates', []):
-            if state['Data']['name']['$value'] == name:
-                return state['HandleId']
-        return None
+        return self.document.get_handle_id(name)
 
     def export_states(self):
-        active_states = []
-        for index in range(self.right_listbox.size()):
-            file_name = self.right_listbox.get(index)
-            if file_name not in self.exclusion_list_export:
-                localized_name = self.generate_localized_name(file_name)
-                category = 1 if file_name in self.exclusion_list else 2
-                dlssd_flag = self.get_dlssd_flag(file_name)
-                active_states.append([file_name, localized_name, category, dlssd_flag])
-        
+        active_states = export_rows(self.document, self.right_listbox.get(0, tk.END))
         if active_states:
             export_path = "exportedWeatherStates.json"
             with open(export_path, 'w') as file:
-                file.write('local weatherStates = {\n')
-                for i, state in enumerate(active_states):
-                    if i == len(active_states) - 1:
-                        file.write(f'\t{{ "{state[0]}", "{state[1]}", {state[2]}, {str(state[3]).lower()} }}\n')
-                    else:
-                        file.write(f'\t{{ "{state[0]}", "{state[1]}", {state[2]}, {str(state[3]).lower()} }},\n')
-                file.write('}\n')
+                file.write(format_lua(active_states))
             messagebox.showinfo("Export Successful", f"Active states exported to {export_path}")
         else:
             messagebox.showinfo("No Active States", "No active states found to export.")
-
-    def get_dlssd_flag(self, file_name):
-        for state in self.data.get('Data', {}).get('RootChunk', {}).get('weatherStates', []):
-            if state['Data']['name']['$value'] == file_name:
-                effect_value = state['Data']['effect']['DepotPath']['$value']
-                if effect_value == 0:
-                    return False
-                elif effect_value.endswith('.effect'):
-                    return True
-        return False
-
-    def generate_localized_name(self, file_name):
-        if file_name.startswith('q302_'):
-            name = file_name.replace('q302_', '')
-        elif file_name.startswith('24h_weather_'):
-            name = file_name.replace('24h_weather_', '')
-        else:
-            name = file_name
-        return ' '.join(word.capitalize() for word in name.split('_'))
     
-    def remove_transitions(self, handle_id):
-        transitions = self.data['Data']['RootChunk']['weatherStateTransitions']
-        self.data['Data']['RootChunk']['weatherStateTransitions'] = [
-            transition for transition in transitions
-            if transition['Data']['sourceWeatherState']['HandleRefId'] != handle_id and
-            transition['Data']['targetWeatherState']['HandleRefId'] != handle_id
-        ]
-
     def save_states(self):
         if messagebox.askyesno("Confirm Save", "Are you sure you want to save the changes?"):
-            existing_names = {state['Data']['name']['$value'] for state in self.data.get('Data', {}).get('RootChunk', {}).get('weatherStates', [])}
             for index in range(self.right_listbox.size()):
                 file_name = self.right_listbox.get(index)
                 name = file_name.replace('.envparam', '')
-                if name not in existing_names:
-                    self.data['Data']['RootChunk']['weatherStates'].append({
-                        'HandleId': "0",
-                        'Data': {
-                            '$type': 'worldWeatherState',
-                            'effect': {
-                                'DepotPath': {
-                                    '$type': 'ResourcePath',
-                                    '$storage': 'uint64',
-                                    '$value': "0"
-                                },
-                                'Flags': "Soft"
-                            },
-                            'environmentAreaParameters': {
-                                'DepotPath': {
-                                    '$type': 'ResourcePath',
-                                    '$storage': 'string',
-                                    '$value': f"base\\weather\\24h_basic\\{file_name}.envparam"
-                                },
-                                'Flags': "Default"
-                            },
-                            'maxDuration': {
-                                'InterpolationType': "Linear",
-                                'LinkType': "ESLT_Normal",
-                                'Elements': [
-                                    {
-                                        'Point': 12,
-                                        'Value': 1.5
-                                    }
-                                ]
-                            },
-                            'minDuration': None,
-                            'name': {
-                                '$type': 'CName',
-                                '$storage': 'string',
-                                '$value': name
-                            },
-                            'probability': {
-                                'InterpolationType': "Linear",
-                                'LinkType': "ESLT_Normal",
-                                'Elements': [
-                                    {
-                                        'Point': 12,
-                                        'Value': 0.0500000007
-                                    }
-                                ]
-                            },
-                            'transitionDuration': {
-                                'InterpolationType': "Linear",
-                                'LinkType': "ESLT_Normal",
-                                'Elements': [
-                                    {
-                                        'Point': 12,
-                                        'Value': 0.25
-                                    }
-                                ]
-                            }
-                        }
-                    })
-
-            self.ensure_unique_handle_ids()
+                if not self.document.has_state(name):
+                    self.document.add_state(new_state(name, self.get_envparam_depot_path(name)))
+
+            self.pending_states = []
             self.save_json(self.env_file_path)
-    
-    def update_handle_ids_after_removal(self, removed_handle_id):
-        removed_handle_id = int(removed_handle_id)
-        for state in self.data['Data']['RootChunk']['weatherStates']:
-            handle_id = int(state['HandleId'])
-            if handle_id > removed_handle_id:
-                state['HandleId'] = str(handle_id - 1)
-
-        for transition in self.data['Data']['RootChunk']['weatherStateTransitions']:
-            handle_id = int(transition['HandleId'])
-            if handle_id > removed_handle_id:
-                transition['HandleId'] = str(handle_id - 1)
-            source_id = int(transition['Data']['sourceWeatherState']['HandleRefId'])
-            target_id = int(transition['Data']['targetWeatherState']['HandleRefId'])
-            if source_id > removed_handle_id:
-                transition['Data']['sourceWeatherState']['HandleRefId'] = str(source_id - 1)
-            if target_id > removed_handle_id:
-                transition['Data']['targetWeatherState']['HandleRefId'] = str(target_id - 1)
-
-    def ensure_unique_handle_ids(self):
-        handle_id = 0
-        handle_id_map = {}
-
-        # Assign unique HandleIds to weatherStates
-        for state in self.data['Data']['RootChunk']['weatherStates']:
-            state['HandleId'] = str(handle_id)
-            handle_id_map[state['HandleId']] = handle_id
-            handle_id += 1
-
-        # Assign unique HandleIds to weatherStateTransitions
-        for transition in self.data['Data']['RootChunk']['weatherStateTransitions']:
-            transition['HandleId'] = str(handle_id)
-            handle_id_map[transition['HandleId']] = handle_id
-            handle_id += 1
-
-        # Assign unique HandleIds to other elements
-        for key, value in self.data['Data']['RootChunk'].items():
-            if key not in ['weatherStates', 'weatherStateTransitions']:
-                if isinstance(value, list):
-                    for item in value:
-                        if 'HandleId' in item:
-                            item['HandleId'] = str(handle_id)
-                            handle_id_map[item['HandleId']] = handle_id
-                            handle_id += 1
-
-        # Update HandleRefIds to match new HandleIds
-        def update_handle_ref_ids(data):
-            if isinstance(data, dict):
-                for key, value in data.items():
-                    if key == 'HandleRefId' and value in handle_id_map:
-                        data[key] = str(handle_id_map[value])
-                    else:
-                        update_handle_ref_ids(value)
-            elif isinstance(data, list):
-                for item in data:
-                    update_handle_ref_ids(item)
-
-        update_handle_ref_ids(self.data['Data']['RootChunk'])
-
-        # Update HandleRefIds in weatherStateTransitions
-        for transition in self.data['Data']['RootChunk']['weatherStateTransitions']:
-            source_id = transition['Data']['sourceWeatherState']['HandleRefId']
-            target_id = transition['Data']['targetWeatherState']['HandleRefId']
-            if source_id in handle_id_map:
-                transition['Data']['sourceWeatherState']['HandleRefId'] = str(handle_id_map[source_id])
-            if target_id in handle_id_map:
-                transition['Data']['targetWeatherState']['HandleRefId'] = str(handle_id_map[target_id])
-
-        # Ensure HandleIds for worldRenderSettings are updated
-        for area in self.data['Data']['RootChunk']['worldRenderSettings']['areaParameters']:
-            area['HandleId'] = str(handle_id)
-            handle_id_map[area['HandleId']] = handle_id
-            handle_id += 1
-
-            if 'hdrMode' in area['Data']:
-                area['Data']['hdrMode']['HandleId'] = str(handle_id)
-                handle_id_map[area['Data']['hdrMode']['HandleId']] = handle_id
-                handle_id += 1
-
-            if 'mode' in area['Data']:
-                area['Data']['mode']['HandleId'] = str(handle_id)
-                handle_id_map[area['Data']['mode']['HandleId']] = handle_id
-                handle_id += 1
+            self.session.notify(self)
     
     def add_states(self):
         selected = self.left_listbox.curselection()
         for index in selected:
-            file_name = self.left_listbox.get(index)
+            file_name = unlabelled(self.left_listbox.get(index))
             if file_name not in self.right_listbox.get(0, tk.END) and file_name not in self.exclusion_list:
                 self.right_listbox.insert(tk.END, file_name)
                 self.left_listbox.delete(index)
+                self.pending_states.append(file_name)
 
     def remove_states(self):
         selected = self.right_listbox.curselection()
         for index in selected:
             file_name = self.right_listbox.get(index)
-            if file_name not in self.left_listbox.get(0, tk.END) and file_name not in self.exclusion_list:
-                self.left_listbox.insert(tk.END, file_name)
+            if file_name not in map(unlabelled, self.left_listbox.get(0, tk.END)) and file_name not in self.exclusion_list:
+                self.left_listbox.insert(tk.END, self.get_disabled_label(file_name))
                 self.right_listbox.delete(index)
-                # Find and remove the corresponding weather state and transitions
-                for state in self.data['Data']['RootChunk']['weatherStates']:
-                    if state['Data']['name']['$value'] == file_name:
-                        handle_id = state['HandleId']
-                        self.data['Data']['RootChunk']['weatherStates'].remove(state)
-                        self.remove_transitions(handle_id)
-                        self.update_handle_ids_after_removal(handle_id)
-                        break
+                # Remove the corresponding weather state and its transitions
+                if file_name in self.pending_states:
+                    self.pending_states.remove(file_name)
+                self.document.history.perform(RemoveStateEdit(file_name))
+                self.session.notify(self)
+
+    def undo(self):
+        if self.document.history.undo():
+            self.on_history_changed()
+
+    def redo(self):
+        if self.document.history.redo():
+            self.on_history_changed()
+
+    def on_history_changed(self):
+        self.populate_listboxes(self.get_folder_path_from_env_file())
+        self.session.notify(self)
     
     def get_env_file_path(self):
         if os.path.exists('env_file_path.txt'):
@@ -366,31 +262,67 @@ class WeatherApp:
 
     def load_json(self, file_path):
         try:
-            with open(file_path, 'r') as file:
-                return json.load(file)
+            return EnvDocument.load(file_path, lazy=True, cache=True)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load JSON file: {e}")
-            return {}
+            return EnvDocument()
 
     def save_json(self, file_path):
         try:
-            with open(file_path, 'w') as file:
-                json.dump(self.data, file, indent=4)
+            self.document.save(file_path)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save JSON file: {e}")
 
     def reload_json(self):
-        self.data = self.load_json(self.env_file_path)
-        self.populate_listboxes(self.get_folder_path_from_env_file())
+        # Parsed on the reloader's worker thread; on_reloaded runs on the Tk thread
+        self.reloader.request(self.env_file_path)
 
-    def watch_file(self):
-        last_modified_time = os.path.getmtime(self.env_file_path)
-        while not self.stop_watching:
-            time.sleep(1)
-            current_modified_time = os.path.getmtime(self.env_file_path)
-            if current_modified_time != last_modified_time:
-                last_modified_time = current_modified_time
-                self.reload_json()
+    def on_reloaded(self, file_path, document):
+        if file_path != self.env_file_path:
+            return
+        self.apply_journal(document)
+        self.document = document
+        self.session.replace(self.document, self, self.env_file_path)
+        self.populate_listboxes(self.get_folder_path_from_env_file())
+        self.update_save_button()
+
+    def open_journal(self, file_path):
+        journal = EditJournal(file_path)
+        base, records = journal.read()
+        ops = effective_ops(records)
+        if ops:
+            changed = " The json has changed since, so some may no longer apply." if base != file_version(file_path) else ""
+            if messagebox.askyesno("Recover Edits", f"Found {len(ops)} unsaved edits from a previous session.{changed} Restore them?"):
+                journal.records = ops
+        return journal
+
+    def apply_journal(self, document):
+        if not document.loaded:
+            # Loading failed; keep the journal for the next start
+            return
+        ops = effective_ops(self.journal.records)
+        applied = replay_ops(document, ops)
+        self.journal.rebase(applied)
+        document.history.journal = self.journal
+        if len(applied) < len(ops):
+            messagebox.showwarning("Warning", f"{len(ops) - len(applied)} unsaved edits no longer apply to the json and were dropped.")
+
+    def on_reload_failed(self, file_path, error):
+        messagebox.showerror("Error", f"Failed to load JSON file: {error}")
+
+    def on_document_changed(self, document, source):
+        # An undo in an editor can bring back a state removed here
+        if source is not self:
+            self.document = document
+            self.populate_listboxes(self.get_folder_path_from_env_file())
+            self.update_save_button()
+
+    def update_save_button(self):
+        # A json that failed to load is never written back over the file
+        self.save_button.config(state=tk.NORMAL if self.document.loaded else tk.DISABLED)
+
+    def on_file_changed(self, path):
+        self.reload_json()
 
     def disable_click(self, event):
         widget = event.widget
@@ -398,43 +330,136 @@ class WeatherApp:
         if widget.get(index) in self.exclusion_list:
             return "break"
 
+    @timed('populate_listboxes')
     def populate_listboxes(self, folder_path):
-        self.right_listbox.delete(0, tk.END)
-        self.left_listbox.delete(0, tk.END)
-        existing_names = {state['Data']['name']['$value'] for state in self.data.get('Data', {}).get('RootChunk', {}).get('weatherStates', [])}
+        # Only rows that changed are touched, so selections and scroll
+        # positions survive a reload
         exclusion_set = set(self.exclusion_list)
 
-        for state in self.data.get('Data', {}).get('RootChunk', {}).get('weatherStates', []):
-            name = state['Data']['name']['$value']
-            self.right_listbox.insert(tk.END, name)
-            if name in exclusion_set:
-                self.right_listbox.itemconfig(tk.END, {'fg': 'grey', 'selectbackground': 'white', 'selectforeground': 'grey'})
-                self.right_listbox.bind("<Button-1>", self.disable_click)
-
-        for file_name in os.listdir(folder_path):
-            if file_name.endswith('.envparam'):
-                name = file_name.replace('.envparam', '')
-                if name not in existing_names and name not in exclusion_set:
-                    self.left_listbox.insert(tk.END, name)
+        state_names = self.document.state_names()
+        state_names += [name for name in self.pending_states if not self.document.has_state(name)]
+        for start, end in sync_listbox(self.right_listbox, state_names):
+            for index in range(start, end):
+                if state_names[index] in exclusion_set:
+                    self.right_listbox.itemconfig(index, {'fg': 'grey', 'selectbackground': 'white', 'selectforeground': 'grey'})
+
+        self.populate_disabled_listbox(folder_path)
+
+    def populate_disabled_listbox(self, folder_path):
+        index = self.get_envparam_index(folder_path)
+        index.refresh()
+        self.watch_envparam_directories()
+        self.envparam_summaries.request(index.root, index.relative_paths().values())
+        self.show_disabled_states()
+
+    def show_disabled_states(self):
+        # The enabled listbox holds the document's states plus any pending moves
+        hidden = set(self.right_listbox.get(0, tk.END)) | set(self.exclusion_list)
+        rows = [self.get_disabled_label(name) for name in self.envparam_index.names() if name not in hidden]
+        reconcile_listbox(self.left_listbox, rows, key=unlabelled)
+
+    def get_disabled_label(self, name):
+        relative = self.envparam_index.relative_paths().get(name)
+        return labelled(name, summary_text(self.envparam_summaries.get(relative)))
+
+    def on_envparam_summaries(self):
+        # Called on the summary indexer's thread
+        self.reloader.call_in_ui(self.show_disabled_states)
+
+    def get_envparam_index(self, folder_path):
+        if self.envparam_index is None or self.envparam_index.root != os.path.abspath(folder_path):
+            self.envparam_index = EnvparamIndex(folder_path, self.recursive_envparams)
+        return self.envparam_index
+
+    def get_envparam_depot_path(self, name):
+        relative = self.envparam_index.relative_paths().get(name, f"{name}.envparam")
+        return envparam_depot_path(relative)
+
+    def watch_envparam_directories(self):
+        directories = set(self.envparam_index.directories)
+        for directory in self.watched_directories - directories:
+            shared_watcher().unsubscribe(directory, self.on_envparam_directory_changed)
+        for directory in directories - self.watched_directories:
+            shared_watcher().subscribe(directory, self.on_envparam_directory_changed)
+        self.watched_directories = directories
+
+    def on_envparam_directory_changed(self, directory):
+        # Called on the watcher thread
+        self.envparam_index.invalidate(directory)
+        self.reloader.call_in_ui(self.refresh_envparams)
+
+    def refresh_envparams(self):
+        self.populate_disabled_listbox(self.get_folder_path_from_env_file())
 
     def open_transitions(self):
-        subprocess.Popen(['python', 'transitions.py'])
+        self.open_editor('transitions.py', EditTransitionsApp)
+
+    def open_transition_matrix(self):
+        if np is None:
+            messagebox.showerror("Error", NUMPY_MISSING)
+            return
+        self.open_editor('matrix_editor.py', TransitionMatrixApp)
+
+    def open_simulator(self):
+        if np is None:
+            messagebox.showerror("Error", weather_simulation.NUMPY_MISSING)
+            return
+        self.open_editor('simulator.py', SimulatorApp)
 
     def open_properties(self):
-        subprocess.Popen(['python', 'properties.py'])
+        self.open_editor('properties.py', EditPropertiesApp)
 
     def open_global_properties(self):
-        subprocess.Popen(['python', 'global_properties.py'])
+        if state_columns.np is None:
+            messagebox.showerror("Error", state_columns.NUMPY_MISSING)
+            return
+        self.open_editor('global_properties.py', EditDebugApp)
 
     def open_film_grain(self):
-        subprocess.Popen(['python', 'film_grain.py'])
+        self.open_editor('film_grain.py', FilmGrainApp)
+
+    def open_editor(self, script, editor_class):
+        if not self.in_process:
+            subprocess.Popen(['python', script])
+            return
+        editor = self.editors.get(script)
+        if editor and editor.root.winfo_exists():
+            editor.root.lift()
+            return
+        window = Toplevel(self.root)
+        editor = editor_class(window, self.session)
+        window.protocol("WM_DELETE_WINDOW", editor.on_closing)
+        self.editors[script] = editor
+
+    def on_span(self, record):
+        # Called on whichever thread finished the span; nested spans are only logged
+        if 'parent' not in record:
+            self.reloader.call_in_ui(self.show_span, record)
+
+    def show_span(self, record):
+        self.status_label.config(text=perf_log.format_record(record))
 
     def on_closing(self):
-        self.stop_watching = True
+        perf_log.unsubscribe(self.on_span)
+        shared_watcher().unsubscribe(self.env_file_path, self.on_file_changed)
+        for directory in self.watched_directories:
+            shared_watcher().unsubscribe(directory, self.on_envparam_directory_changed)
+        self.envparam_summaries.stop()
+        self.reloader.stop()
+        self.journal.close()
         self.root.destroy()
 
 if __name__ == "__main__":
+    if '--perf' in sys.argv and not perf_log.enabled:
+        perf_log.enable()
+    if '--backups' in sys.argv:
+        # Exported too, so windows started with --subprocess keep backups as well
+        generations = sys.argv[sys.argv.index('--backups') + 1:][:1]
+        if not generations or not generations[0].isdigit():
+            raise SystemExit("--backups needs a number of generations, e.g. --backups 3")
+        os.environ['ENVSWITCHER_BACKUPS'] = generations[0]
+        EnvDocument.backups = int(generations[0])
     root = tk.Tk()
-    app = WeatherApp(root)
+    app = WeatherApp(root, in_process='--subprocess' not in sys.argv, recursive_envparams='--recursive' in sys.argv)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop()
\ No newline at end of file
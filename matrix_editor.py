@@ -0,0 +1,360 @@
+import tkinter as tk
+from tkinter import messagebox
+import os
+from background_reload import BackgroundReloader
+from edit_history import EdgesEdit
+from env_document import EnvDocument
+from file_watcher import shared_watcher
+from transition_matrix import NUMPY_MISSING, TransitionMatrix, np
+
+CELL = 16
+ROW_HEADER_WIDTH = 170
+COLUMN_HEADER_HEIGHT = 130
+
+
+class TransitionMatrixApp:
+    # Every transition at once: row = source state, column = target state.
+    # Clicking a cell toggles it, clicking a header selects that row or
+    # column for the bulk actions. Nothing reaches the document until Apply
+    # or Save, which turn all changed cells into one edit.
+    def __init__(self, root, session=None):
+        self.root = root
+        self.root.title("Transition Matrix")
+        self.root.geometry("900x600")
+        self.root.minsize(600, 400)
+
+        # Inside the main window's process the document is shared, not loaded
+        self.session = session
+        if session:
+            self.env_file_path = session.env_file_path
+            self.document = session.document
+        else:
+            self.env_file_path = self.get_env_file_path()
+            self.document = self.load_json(self.env_file_path)
+
+        self.root.bind("<Control-z>", lambda event: self.undo())
+        self.root.bind("<Control-y>", lambda event: self.redo())
+
+        self.matrix = TransitionMatrix(self.document)
+        self.selected_row = None
+        self.selected_column = None
+
+        grid_frame = tk.Frame(root)
+        grid_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        side_frame = tk.Frame(root)
+        side_frame.pack(side=tk.RIGHT, fill=tk.Y, padx=10, pady=10)
+
+        self.column_header = tk.Canvas(grid_frame, height=COLUMN_HEADER_HEIGHT, highlightthickness=0)
+        self.row_header = tk.Canvas(grid_frame, width=ROW_HEADER_WIDTH, highlightthickness=0)
+        self.cells = tk.Canvas(grid_frame, bg="white", highlightthickness=0,
+                               xscrollincrement=CELL, yscrollincrement=CELL,
+                               xscrollcommand=self.on_x_scrolled, yscrollcommand=self.on_y_scrolled)
+        self.x_scrollbar = tk.Scrollbar(grid_frame, orient=tk.HORIZONTAL, command=self.xview)
+        self.y_scrollbar = tk.Scrollbar(grid_frame, orient=tk.VERTICAL, command=self.yview, width=20)
+
+        self.column_header.grid(row=0, column=1, sticky="ew")
+        self.row_header.grid(row=1, column=0, sticky="ns")
+        self.cells.grid(row=1, column=1, sticky="nsew")
+        self.y_scrollbar.grid(row=1, column=2, sticky="ns")
+        self.x_scrollbar.grid(row=2, column=1, sticky="ew")
+        grid_frame.grid_rowconfigure(1, weight=1)
+        grid_frame.grid_columnconfigure(1, weight=1)
+
+        self.cells.bind("<Configure>", lambda event: self.redraw())
+        self.cells.bind("<Button-1>", self.on_cell_click)
+        self.cells.bind("<Motion>", self.on_cell_motion)
+        self.row_header.bind("<Button-1>", self.on_row_click)
+        self.column_header.bind("<Button-1>", self.on_column_click)
+        for canvas in (self.cells, self.row_header, self.column_header):
+            canvas.bind("<MouseWheel>", lambda event: self.yview("scroll", int(-1*(event.delta/120)), "units"))
+
+        self.hover_label = tk.Label(side_frame, text="", width=30, anchor='w')
+        self.hover_label.pack(pady=(0, 5))
+
+        self.selection_label = tk.Label(side_frame, text="", width=30, anchor='w', justify=tk.LEFT)
+        self.selection_label.pack(pady=(0, 10))
+
+        button_width = 22
+        actions = [
+            ("Row: all targets", lambda: self.bulk_rows(True)),
+            ("Row: no targets", lambda: self.bulk_rows(False)),
+            ("Column: all sources", lambda: self.bulk_columns(True)),
+            ("Column: no sources", lambda: self.bulk_columns(False)),
+            ("Make symmetric", self.symmetrize),
+        ]
+        for text, command in actions:
+            tk.Button(side_frame, text=text, command=command, width=button_width).pack(pady=2)
+
+        tk.Label(side_frame, text="Copy the selected row's state to:").pack(pady=(10, 0))
+        copy_frame = tk.Frame(side_frame)
+        copy_frame.pack(fill=tk.BOTH, expand=True)
+        copy_scrollbar = tk.Scrollbar(copy_frame, orient=tk.VERTICAL)
+        copy_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.copy_listbox = tk.Listbox(copy_frame, selectmode=tk.EXTENDED, exportselection=False, yscrollcommand=copy_scrollbar.set)
+        self.copy_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        copy_scrollbar.config(command=self.copy_listbox.yview)
+        tk.Button(side_frame, text="Copy pattern", command=self.copy_pattern, width=button_width).pack(pady=2)
+
+        self.apply_button = tk.Button(side_frame, text="Apply", command=self.apply_changes, width=button_width)
+        self.apply_button.pack(pady=(10, 2))
+        self.save_button = tk.Button(side_frame, text="Save", command=self.save_changes, width=button_width)
+        self.save_button.pack(pady=2)
+
+        self.confirm_label = tk.Label(side_frame, text="", fg="green")
+        self.confirm_label.pack()
+
+        self.show_matrix()
+        self.update_save_buttons()
+
+        if session:
+            session.subscribe(self.on_document_changed)
+        else:
+            self.reloader = BackgroundReloader(self.root, self.on_reloaded, self.on_reload_failed)
+            shared_watcher().subscribe(self.env_file_path, self.on_file_changed)
+
+    def get_env_file_path(self):
+        if os.path.exists('env_file_path.txt'):
+            with open('env_file_path.txt', 'r') as file:
+                return file.read().strip()
+        else:
+            messagebox.showerror("Error", "env_file_path.txt not found.")
+            self.root.quit()
+
+    def load_json(self, file_path):
+        try:
+            return EnvDocument.load(file_path, lazy=True, cache=True)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load JSON file: {e}")
+            return EnvDocument()
+
+    def save_json(self, file_path):
+        try:
+            self.document.save(file_path)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save JSON file: {e}")
+
+    def show_matrix(self):
+        size = len(self.matrix) * CELL
+        self.cells.configure(scrollregion=(0, 0, size, size))
+        self.row_header.configure(scrollregion=(0, 0, ROW_HEADER_WIDTH, size))
+        self.column_header.configure(scrollregion=(0, 0, size, COLUMN_HEADER_HEIGHT))
+        self.copy_listbox.delete(0, tk.END)
+        self.copy_listbox.insert(tk.END, *self.matrix.names)
+        if self.selected_row is not None and self.selected_row >= len(self.matrix):
+            self.selected_row = None
+        if self.selected_column is not None and self.selected_column >= len(self.matrix):
+            self.selected_column = None
+        self.redraw()
+
+    def xview(self, *args):
+        self.cells.xview(*args)
+
+    def yview(self, *args):
+        self.cells.yview(*args)
+
+    def on_x_scrolled(self, first, last):
+        self.x_scrollbar.set(first, last)
+        self.column_header.xview_moveto(first)
+        self.redraw()
+
+    def on_y_scrolled(self, first, last):
+        self.y_scrollbar.set(first, last)
+        self.row_header.yview_moveto(first)
+        self.redraw()
+
+    def visible_range(self):
+        # Rows and columns in view, as (first, last) half-open ranges
+        size = len(self.matrix)
+        left, top = self.cells.canvasx(0), self.cells.canvasy(0)
+        rows = (max(0, int(top // CELL)), min(size, int((top + self.cells.winfo_height()) // CELL) + 1))
+        columns = (max(0, int(left // CELL)), min(size, int((left + self.cells.winfo_width()) // CELL) + 1))
+        return rows, columns
+
+    def redraw(self):
+        # Only the cells in view are drawn: grid lines, then one rectangle per
+        # set cell found with a single argwhere over the visible block
+        (row_start, row_end), (column_start, column_end) = self.visible_range()
+        for canvas in (self.cells, self.row_header, self.column_header):
+            canvas.delete("all")
+        if row_start >= row_end or column_start >= column_end:
+            return
+
+        top, bottom = row_start * CELL, row_end * CELL
+        left, right = column_start * CELL, column_end * CELL
+        if self.selected_row is not None and row_start <= self.selected_row < row_end:
+            y = self.selected_row * CELL
+            self.cells.create_rectangle(left, y, right, y + CELL, fill="#fff2b3", outline="")
+        if self.selected_column is not None and column_start <= self.selected_column < column_end:
+            x = self.selected_column * CELL
+            self.cells.create_rectangle(x, top, x + CELL, bottom, fill="#fff2b3", outline="")
+        for index in range(max(row_start, column_start), min(row_end, column_end)):
+            self.cells.create_rectangle(index * CELL, index * CELL, (index + 1) * CELL, (index + 1) * CELL, fill="#eeeeee", outline="")
+
+        block = self.matrix.matrix[row_start:row_end, column_start:column_end]
+        for row, column in np.argwhere(block).tolist():
+            x, y = (column_start + column) * CELL, (row_start + row) * CELL
+            self.cells.create_rectangle(x + 2, y + 2, x + CELL - 2, y + CELL - 2, fill="steelblue", outline="")
+
+        for row in range(row_start, row_end + 1):
+            self.cells.create_line(left, row * CELL, right, row * CELL, fill="#dddddd")
+        for column in range(column_start, column_end + 1):
+            self.cells.create_line(column * CELL, top, column * CELL, bottom, fill="#dddddd")
+
+        for row in range(row_start, row_end):
+            font = ("TkDefaultFont", 9, "bold") if row == self.selected_row else ("TkDefaultFont", 9)
+            self.row_header.create_text(ROW_HEADER_WIDTH - 4, row * CELL + CELL // 2, text=self.matrix.names[row], anchor='e', font=font)
+        for column in range(column_start, column_end):
+            font = ("TkDefaultFont", 9, "bold") if column == self.selected_column else ("TkDefaultFont", 9)
+            self.column_header.create_text(column * CELL + CELL // 2, COLUMN_HEADER_HEIGHT - 4, text=self.matrix.names[column], anchor='w', angle=90, font=font)
+
+    def cell_at(self, event):
+        row = int(self.cells.canvasy(event.y) // CELL)
+        column = int(self.cells.canvasx(event.x) // CELL)
+        if 0 <= row < len(self.matrix) and 0 <= column < len(self.matrix):
+            return row, column
+        return None
+
+    def on_cell_click(self, event):
+        cell = self.cell_at(event)
+        if cell:
+            self.matrix.toggle(*cell)
+            self.redraw()
+
+    def on_cell_motion(self, event):
+        cell = self.cell_at(event)
+        text = f"{self.matrix.names[cell[0]]} → {self.matrix.names[cell[1]]}" if cell else ""
+        self.hover_label.config(text=text)
+
+    def on_row_click(self, event):
+        row = int(self.row_header.canvasy(event.y) // CELL)
+        if 0 <= row < len(self.matrix):
+            self.selected_row = row
+            self.show_selection()
+
+    def on_column_click(self, event):
+        column = int(self.column_header.canvasx(event.x) // CELL)
+        if 0 <= column < len(self.matrix):
+            self.selected_column = column
+            self.show_selection()
+
+    def show_selection(self):
+        row = self.matrix.names[self.selected_row] if self.selected_row is not None else "-"
+        column = self.matrix.names[self.selected_column] if self.selected_column is not None else "-"
+        self.selection_label.config(text=f"Row: {row}\nColumn: {column}")
+        self.redraw()
+
+    def bulk_rows(self, value):
+        if self.selected_row is None:
+            messagebox.showinfo("Transition Matrix", "Click a state on the left to select its row first.")
+            return
+        self.matrix.set_rows([self.selected_row], value)
+        self.redraw()
+
+    def bulk_columns(self, value):
+        if self.selected_column is None:
+            messagebox.showinfo("Transition Matrix", "Click a state at the top to select its column first.")
+            return
+        self.matrix.set_columns([self.selected_column], value)
+        self.redraw()
+
+    def symmetrize(self):
+        self.matrix.symmetrize()
+        self.redraw()
+
+    def copy_pattern(self):
+        rows = list(self.copy_listbox.curselection())
+        if self.selected_row is None or not rows:
+            messagebox.showinfo("Transition Matrix", "Select a row, then the states to copy its transitions to.")
+            return
+        self.matrix.copy_pattern(self.selected_row, rows)
+        self.redraw()
+
+    def apply_changes(self):
+        # All changed cells become one edit, so one undo reverts them
+        added, removed = self.matrix.changes()
+        if not added and not removed:
+            return False
+        self.document.history.perform(EdgesEdit(self.matrix.state_pairs(added), self.matrix.state_pairs(removed)))
+        self.matrix = TransitionMatrix(self.document)
+        self.notify_session()
+        self.confirm_label.config(text=f"{len(added)} added, {len(removed)} removed")
+        self.root.after(3000, self.clear_confirmation)
+        return True
+
+    def save_changes(self):
+        self.apply_changes()
+        self.save_json(self.env_file_path)
+        self.notify_session()
+
+        self.confirm_label.config(text="Changes saved successfully!")
+        self.root.after(3000, self.clear_confirmation)
+
+    def clear_confirmation(self):
+        self.confirm_label.config(text="")
+
+    def refresh(self):
+        # Rebuilds the matrix from the document, keeping cells changed here
+        # but not applied yet
+        added, removed = self.matrix.pending()
+        self.matrix = TransitionMatrix(self.document)
+        self.matrix.set_pairs(added, True)
+        self.matrix.set_pairs(removed, False)
+        self.show_matrix()
+        self.update_save_buttons()
+
+    def update_save_buttons(self):
+        # A json that failed to load is never edited or written back over the file
+        state = tk.NORMAL if self.document.loaded else tk.DISABLED
+        self.apply_button.config(state=state)
+        self.save_button.config(state=state)
+
+    def undo(self):
+        if self.document.history.undo():
+            self.refresh()
+            self.notify_session()
+
+    def redo(self):
+        if self.document.history.redo():
+            self.refresh()
+            self.notify_session()
+
+    def on_file_changed(self, path):
+        self.reload_json()
+
+    def reload_json(self):
+        self.reloader.request(self.env_file_path)
+
+    def on_reloaded(self, file_path, document):
+        self.document = document
+        self.refresh()
+
+    def on_reload_failed(self, file_path, error):
+        messagebox.showerror("Error", f"Failed to load JSON file: {error}")
+
+    def on_document_changed(self, document, source):
+        if source is self:
+            return
+        self.env_file_path = self.session.env_file_path
+        self.document = document
+        self.refresh()
+
+    def notify_session(self):
+        if self.session:
+            self.session.notify(self)
+
+    def on_closing(self):
+        if self.session:
+            self.session.unsubscribe(self.on_document_changed)
+        else:
+            shared_watcher().unsubscribe(self.env_file_path, self.on_file_changed)
+            self.reloader.stop()
+        self.root.destroy()
+
+if __name__ == "__main__":
+    if np is None:
+        raise SystemExit(NUMPY_MISSING)
+    root = tk.Tk()
+    app = TransitionMatrixApp(root)
+    root.protocol("WM_DELETE_WINDOW", app.on_closing)
+    root.mainloop()
@@ -0,0 +1,154 @@
+import json, os, threading, time
+from functools import wraps
+from doc_cache import CACHE_DIR
+
+# Timing spans around the slow paths (load, save, renumber, listbox updates).
+# Disabled, a span is one flag check and a shared no-op object. Enabled, every
+# finished span is appended to a rotating JSON-lines log and passed to the
+# listeners, e.g. the main window's status bar.
+#
+#   ENVSWITCHER_PERF_LOG=1 python main.py          (log in the cache folder)
+#   ENVSWITCHER_PERF_LOG=perf.jsonl python main.py
+#   python main.py --perf
+
+DEFAULT_LOG = os.path.join(CACHE_DIR, 'perf.jsonl')
+
+enabled = False
+log_path = None
+max_bytes = 1_000_000
+backups = 3
+listeners = []
+lock = threading.Lock()
+local = threading.local()
+
+
+def enable(path=None, size_limit=1_000_000, generations=3):
+    global enabled, log_path, max_bytes, backups
+    log_path = path or DEFAULT_LOG
+    max_bytes = size_limit
+    backups = generations
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def subscribe(callback):
+    # callback(record) runs on whichever thread finished the span
+    if callback not in listeners:
+        listeners.append(callback)
+
+
+def unsubscribe(callback):
+    if callback in listeners:
+        listeners.remove(callback)
+
+
+def document_sizes(document):
+    states = document.root_chunk.get('weatherStates')
+    sizes = {'states': len(states) if isinstance(states, list) else None, 'transitions': len(document.graph)}
+    if document.layout is not None:
+        sizes['bytes'] = len(document.layout.source)
+    return sizes
+
+
+class Span:
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.document = None
+
+    def __enter__(self):
+        stack = getattr(local, 'stack', None)
+        if stack is None:
+            stack = local.stack = []
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        local.stack.pop()
+        record = {'time': round(time.time(), 3), 'name': self.name, 'ms': round(elapsed * 1000, 3)}
+        if self.parent:
+            record['parent'] = self.parent
+        if self.document is not None:
+            record.update(document_sizes(self.document))
+        record.update(self.fields)
+        if exc_info[0] is not None:
+            record['error'] = exc_info[0].__name__
+        write(record)
+        for callback in list(listeners):
+            callback(record)
+
+
+class NullSpan:
+    # Handed out while disabled; setting document or fields on it is harmless
+    document = None
+    fields = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(name, **fields):
+    # with span('save_json') as s: ...; s.document = document
+    if not enabled:
+        return NULL_SPAN
+    return Span(name, fields)
+
+
+def timed(name):
+    # Method decorator; the size fields come from self.document
+    def decorate(function):
+        @wraps(function)
+        def wrapper(self, *args, **kwargs):
+            if not enabled:
+                return function(self, *args, **kwargs)
+            with Span(name, {}) as timing:
+                timing.document = getattr(self, 'document', None)
+                return function(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def rotate():
+    for generation in range(backups - 1, 0, -1):
+        older = f"{log_path}.{generation}"
+        if os.path.exists(older):
+            os.replace(older, f"{log_path}.{generation + 1}")
+    os.replace(log_path, f"{log_path}.1")
+
+
+def write(record):
+    line = json.dumps(record) + '\n'
+    with lock:
+        try:
+            if os.path.exists(log_path) and os.path.getsize(log_path) + len(line) > max_bytes:
+                rotate()
+            else:
+                os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+            with open(log_path, 'a', encoding='utf-8') as file:
+                file.write(line)
+        except OSError:
+            pass
+
+
+def format_record(record):
+    text = f"{record['name']} {record['ms']:.1f} ms"
+    if record.get('states') is not None:
+        text += f", {record['states']} states, {record['transitions']} transitions"
+    return text
+
+
+if os.environ.get('ENVSWITCHER_PERF_LOG'):
+    enable(None if os.environ['ENVSWITCHER_PERF_LOG'] == '1' else os.environ['ENVSWITCHER_PERF_LOG'])
@@ -1,16 +1,35 @@
 import tkinter as tk
 from tkinter import messagebox
 from tkinter import ttk
-import json, os, threading, time
+import os
+from background_reload import BackgroundReloader
+from curves import CurveStore, format_points, np, parse_points
+from env_document import EnvDocument
+from env_ops import curve_problems, make_curve
+from edit_history import StatePropertiesEdit
+from file_watcher import shared_watcher
+from listbox_sync import sync_listbox
+
+CURVE_LABELS = {"Min Duration": 'minDuration', "Max Duration": 'maxDuration',
+                "Probability": 'probability', "Transition Duration": 'transitionDuration'}
 
 class EditPropertiesApp:
-    def __init__(self, root):
+    def __init__(self, root, session=None):
         self.root = root
         self.root.title("Edit Weather Properties")
         self.root.minsize(500, 300)
 
-        self.env_file_path = self.get_env_file_path()
-        self.data = self.load_json(self.env_file_path)
+        # Inside the main window's process the document is shared, not loaded
+        self.session = session
+        if session:
+            self.env_file_path = session.env_file_path
+            self.document = session.document
+        else:
+            self.env_file_path = self.get_env_file_path()
+            self.document = self.load_json(self.env_file_path)
+
+        self.root.bind("<Control-z>", lambda event: self.undo())
+        self.root.bind("<Control-y>", lambda event: self.redo())
 
         # Create frames for the headers and listboxes
         left_frame = tk.Frame(root)
@@ -32,26 +51,37 @@ class EditPropertiesApp:
         self.entries = {}
         self.create_entries(right_frame)
 
+        # The curve being edited, drawn over the day; needs NumPy
+        self.preview_field = "Probability"
+        self.preview = tk.Canvas(right_frame, height=90, bg="white", highlightthickness=0)
+        if np is not None:
+            self.preview.pack(fill=tk.X, padx=10, pady=5)
+            self.preview.bind("<Configure>", lambda event: self.draw_preview())
+
         self.confirm_button = tk.Button(right_frame, text="Save", command=self.save_changes)
         self.confirm_button.pack(side=tk.LEFT, padx=10, pady=10)
 
         self.confirm_label = tk.Label(right_frame, text="", fg="green")
         self.confirm_label.pack(side=tk.LEFT, padx=10)
+        self.update_save_button()
 
-        for state in self.data['Data']['RootChunk']['weatherStates']:
-            self.left_listbox.insert(tk.END, state['Data']['name']['$value'])
+        for name in self.document.state_names():
+            self.left_listbox.insert(tk.END, name)
 
         self.left_listbox.bind('<<ListboxSelect>>', self.on_left_listbox_select)
 
         self.current_selection = None
 
-        # Start the file watcher thread
-        self.stop_watching = False
-        self.file_watcher_thread = threading.Thread(target=self.watch_file)
-        self.file_watcher_thread.start()
+        if session:
+            session.subscribe(self.on_document_changed)
+        else:
+            self.reloader = BackgroundReloader(self.root, self.on_reloaded, self.on_reload_failed)
+            shared_watcher().subscribe(self.env_file_path, self.on_file_changed)
 
     def create_entries(self, parent):
         labels = ["Min Duration", "Max Duration", "Probability", "Transition Duration", "Effect DepotPath"]
+        info_label = tk.Label(parent, text="A single value, or hour:value pairs for a curve through the day.", fg="black")
+        info_label.pack(pady=(0, 5))
         for label in labels:
             frame = tk.Frame(parent)
             frame.pack(fill=tk.X, padx=10, pady=5)
@@ -60,6 +90,9 @@ class EditPropertiesApp:
             entry.pack(side=tk.RIGHT, fill=tk.X, expand=True)
             if label == "Effect DepotPath":
                 entry.bind("<KeyRelease>", self.scroll_to_end)
+            else:
+                entry.bind("<FocusIn>", lambda event, label=label: self.show_preview(label))
+                entry.bind("<KeyRelease>", lambda event: self.draw_preview())
             self.entries[label] = entry
 
     def scroll_to_end(self, event):
@@ -75,16 +108,14 @@ class EditPropertiesApp:
 
     def load_json(self, file_path):
         try:
-            with open(file_path, 'r') as file:
-                return json.load(file)
+            return EnvDocument.load(file_path, lazy=True, cache=True)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load JSON file: {e}")
-            return {}
+            return EnvDocument()
 
     def save_json(self, file_path):
         try:
-            with open(file_path, 'w') as file:
-                json.dump(self.data, file, indent=4)
+            self.document.save(file_path)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save JSON file: {e}")
 
@@ -96,55 +127,43 @@ class EditPropertiesApp:
             state_data = self.get_state_data_by_name(selected_state)
 
             self.entries["Min Duration"].delete(0, tk.END)
-            self.entries["Min Duration"].insert(0, self.get_value(state_data, 'minDuration'))
+            self.entries["Min Duration"].insert(0, format_points(state_data.get('minDuration')))
 
             self.entries["Max Duration"].delete(0, tk.END)
-            self.entries["Max Duration"].insert(0, self.get_value(state_data, 'maxDuration'))
+            self.entries["Max Duration"].insert(0, format_points(state_data.get('maxDuration')))
 
             self.entries["Probability"].delete(0, tk.END)
-            self.entries["Probability"].insert(0, self.get_value(state_data, 'probability'))
+            self.entries["Probability"].insert(0, format_points(state_data.get('probability')))
 
             self.entries["Transition Duration"].delete(0, tk.END)
-            self.entries["Transition Duration"].insert(0, self.get_value(state_data, 'transitionDuration'))
+            self.entries["Transition Duration"].insert(0, format_points(state_data.get('transitionDuration')))
 
             self.entries["Effect DepotPath"].delete(0, tk.END)
             self.entries["Effect DepotPath"].insert(0, self.get_value(state_data, 'effect', 'DepotPath'))
             self.entries["Effect DepotPath"].xview_moveto(1)
+            self.draw_preview()
 
     def save_changes(self):
         if self.current_selection is not None:
             selected_state = self.left_listbox.get(self.current_selection)
-            state_data = self.get_state_data_by_name(selected_state)
-
-            def update_field(field_name, entry_name):
-                value = self.get_entry_value(self.entries[entry_name])
-                if value is None:
-                    state_data[field_name] = None
-                else:
-                    state_data[field_name] = {
-                        "InterpolationType": "Linear",
-                        "LinkType": "ESLT_Normal",
-                        "Elements": [{"Point": 12, "Value": value}]
-                    }
-
-            update_field('minDuration', 'Min Duration')
-            update_field('maxDuration', 'Max Duration')
-            update_field('probability', 'Probability')
-            update_field('transitionDuration', 'Transition Duration')
-
-            depot_path = self.entries["Effect DepotPath"].get()
-            if depot_path == "" or depot_path == "0":
-                state_data['effect']['DepotPath']['$storage'] = "uint64"
-                state_data['effect']['DepotPath']['$value'] = 0
-            else:
-                state_data['effect']['DepotPath']['$storage'] = "string"
-                if not depot_path.endswith(".effect"):
-                    messagebox.showwarning("Warning", "Depot path should end with '.effect'")
-                    return  # Do not save changes
-
-            state_data['effect']['DepotPath']['$value'] = depot_path
+            try:
+                values = {
+                    'minDuration': self.get_entry_value(self.entries["Min Duration"]),
+                    'maxDuration': self.get_entry_value(self.entries["Max Duration"]),
+                    'probability': self.get_entry_value(self.entries["Probability"]),
+                    'transitionDuration': self.get_entry_value(self.entries["Transition Duration"])
+                }
+                problems = self.check_values(selected_state, values)
+                if problems and not messagebox.askyesno("Warning", "\n".join(problems) + "\n\nSave anyway?"):
+                    return
+                values['effect'] = self.entries["Effect DepotPath"].get()
+                self.document.history.perform(StatePropertiesEdit(selected_state, values))
+            except ValueError as e:
+                messagebox.showwarning("Warning", str(e))
+                return  # Do not save changes
 
             self.save_json(self.env_file_path)
+            self.notify_session()
 
             # Highlight the selected state
             self.left_listbox.selection_clear(0, tk.END)
@@ -155,6 +174,19 @@ class EditPropertiesApp:
             self.confirm_label.config(text="Changes saved successfully!")
             self.root.after(3000, self.clear_confirmation)
 
+    def undo(self):
+        if self.document.history.undo():
+            self.on_history_changed()
+
+    def redo(self):
+        if self.document.history.redo():
+            self.on_history_changed()
+
+    def on_history_changed(self):
+        self.show_document(self.document)
+        self.on_left_listbox_select(None)
+        self.notify_session()
+
     def clear_confirmation(self):
         self.confirm_label.config(text="")
 
@@ -172,37 +204,101 @@ class EditPropertiesApp:
         return value
 
     def get_entry_value(self, entry):
-        value = entry.get()
-        if value == "":
-            return None
-        return float(value)
+        return parse_points(entry.get())
+
+    def check_values(self, name, values):
+        # The curves about to be saved, checked through the day like env_cli --check
+        if np is None:
+            return []
+        state_data = self.get_state_data_by_name(name)
+        return curve_problems([name], {field: [make_curve(value, state_data.get(field))] for field, value in values.items()})
+
+    def show_preview(self, label):
+        self.preview_field = label
+        self.draw_preview()
+
+    def draw_preview(self):
+        # The edited text, evaluated every ten minutes, scaled to the canvas
+        if np is None:
+            return
+        self.preview.delete('all')
+        width, height = self.preview.winfo_width(), self.preview.winfo_height()
+        state_data = self.get_state_data_by_name(self.left_listbox.get(self.current_selection)) if self.current_selection is not None else None
+        if state_data is None or width < 50:
+            return
+        field = CURVE_LABELS[self.preview_field]
+        try:
+            curve = make_curve(parse_points(self.entries[self.preview_field].get()), state_data.get(field))
+        except ValueError:
+            self.preview.create_text(width // 2, height // 2, text="Not a number or hour:value pairs", fill="red")
+            return
+        if curve is None:
+            self.preview.create_text(width // 2, height // 2, text=f"{self.preview_field}: null", fill="grey40")
+            return
+        day = CurveStore([curve]).day(10)[0]
+        low, high = float(day.min()), float(day.max())
+        span = (high - low) or 1.0
+        for hour in range(0, 25, 6):
+            x = 5 + (width - 10) * hour / 24
+            self.preview.create_line(x, 5, x, height - 15, fill="grey85")
+            self.preview.create_text(x, height - 7, text=f"{hour:02d}", fill="grey40", font=("Segoe UI", 7))
+        xs = 5 + (width - 10) * np.arange(len(day)) / len(day)
+        ys = 5 + (height - 25) * (1 - (day - low) / span)
+        self.preview.create_line(*np.column_stack((xs, ys)).ravel().tolist(), fill="blue", width=2)
+        self.preview.create_text(8, 8, text=f"{self.preview_field} {low:g}..{high:g}", anchor='nw', fill="grey20", font=("Segoe UI", 8))
 
     def get_state_data_by_name(self, name):
-        for state in self.data['Data']['RootChunk']['weatherStates']:
-            if state['Data']['name']['$value'] == name:
-                return state['Data']
-        return None
-
-    def watch_file(self):
-        last_modified_time = os.path.getmtime(self.env_file_path)
-        while not self.stop_watching:
-            time.sleep(1)
-            current_modified_time = os.path.getmtime(self.env_file_path)
-            if current_modified_time != last_modified_time:
-                last_modified_time = current_modified_time
-                self.reload_json()
+        return self.document.get_state_data(name)
+
+    def on_file_changed(self, path):
+        self.reload_json()
 
     def reload_json(self):
-        self.data = self.load_json(self.env_file_path)
-        self.populate_listbox()
+        self.reloader.request(self.env_file_path)
+
+    def on_reloaded(self, file_path, document):
+        self.show_document(document)
+
+    def on_reload_failed(self, file_path, error):
+        messagebox.showerror("Error", f"Failed to load JSON file: {error}")
 
     def populate_listbox(self):
-        self.left_listbox.delete(0, tk.END)
-        for state in self.data['Data']['RootChunk']['weatherStates']:
-            self.left_listbox.insert(tk.END, state['Data']['name']['$value'])
+        sync_listbox(self.left_listbox, self.document.state_names())
+
+    def on_document_changed(self, document, source):
+        if source is self:
+            return
+        self.env_file_path = self.session.env_file_path
+        self.show_document(document)
+
+    def show_document(self, document):
+        selected_state = self.left_listbox.get(self.current_selection) if self.current_selection is not None else None
+        self.document = document
+        self.populate_listbox()
+        self.update_save_button()
+
+        # Keep the state being edited selected if it still exists
+        self.current_selection = None
+        self.left_listbox.selection_clear(0, tk.END)
+        names = self.left_listbox.get(0, tk.END)
+        if selected_state in names:
+            self.current_selection = names.index(selected_state)
+            self.left_listbox.selection_set(self.current_selection)
+
+    def update_save_button(self):
+        # A json that failed to load is never written back over the file
+        self.confirm_button.config(state=tk.NORMAL if self.document.loaded else tk.DISABLED)
+
+    def notify_session(self):
+        if self.session:
+            self.session.notify(self)
 
     def on_closing(self):
-        self.stop_watching = True
+        if self.session:
+            self.session.unsubscribe(self.on_document_changed)
+        else:
+            shared_watcher().unsubscribe(self.env_file_path, self.on_file_changed)
+            self.reloader.stop()
         self.root.destroy()
 
 if __name__ == "__main__":
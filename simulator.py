@@ -0,0 +1,144 @@
+import tkinter as tk
+from tkinter import messagebox
+import os, threading
+from env_document import EnvDocument
+from weather_simulation import NUMPY_MISSING, STATE_HEADER, WeatherModel, np, simulate, state_rows, transition_rows
+
+class SimulatorApp:
+    # Runs the weather simulation on the current json and lists what came
+    # out: each state's share of the time, visits and mean dwell, when in
+    # the day it happens, and the most frequent transitions. The model is
+    # built on the Tk thread; the simulation itself runs on a worker thread.
+    def __init__(self, root, session=None):
+        self.root = root
+        self.root.title("Simulate Weather")
+        self.root.geometry("900x600")
+        self.root.minsize(600, 400)
+
+        # Inside the main window's process the document is shared, not loaded
+        self.session = session
+        if session:
+            self.env_file_path = session.env_file_path
+            self.document = session.document
+            session.subscribe(self.on_document_changed)
+        else:
+            self.env_file_path = self.get_env_file_path()
+            self.document = self.load_json(self.env_file_path)
+
+        self.worker = None
+        self.result = None
+        self.error = None
+
+        controls = tk.Frame(root)
+        controls.pack(fill=tk.X, padx=10, pady=10)
+
+        tk.Label(controls, text="Days").pack(side=tk.LEFT)
+        self.days_entry = tk.Entry(controls, width=8)
+        self.days_entry.insert(0, "10000")
+        self.days_entry.pack(side=tk.LEFT, padx=(5, 15))
+
+        tk.Label(controls, text="Seed").pack(side=tk.LEFT)
+        self.seed_entry = tk.Entry(controls, width=8)
+        self.seed_entry.pack(side=tk.LEFT, padx=(5, 15))
+
+        self.run_button = tk.Button(controls, text="Run", command=self.run, width=12)
+        self.run_button.pack(side=tk.LEFT)
+
+        self.status_label = tk.Label(controls, text="", anchor='w')
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10)
+
+        self.states_header = tk.Label(root, text=STATE_HEADER, font=("Consolas", 9), anchor='w')
+        self.states_header.pack(fill=tk.X, padx=10)
+        self.states_listbox = self.create_listbox(root, 16)
+
+        tk.Label(root, text="Most frequent transitions", anchor='w').pack(fill=tk.X, padx=10, pady=(10, 0))
+        self.transitions_listbox = self.create_listbox(root, 8)
+
+    def create_listbox(self, parent, height):
+        frame = tk.Frame(parent)
+        frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        scrollbar = tk.Scrollbar(frame, orient=tk.VERTICAL)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        listbox = tk.Listbox(frame, height=height, font=("Consolas", 9), yscrollcommand=scrollbar.set)
+        listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=listbox.yview)
+        return listbox
+
+    def get_env_file_path(self):
+        if os.path.exists('env_file_path.txt'):
+            with open('env_file_path.txt', 'r') as file:
+                return file.read().strip()
+        else:
+            messagebox.showerror("Error", "env_file_path.txt not found.")
+            self.root.quit()
+
+    def load_json(self, file_path):
+        try:
+            return EnvDocument.load(file_path, lazy=True, cache=True)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load JSON file: {e}")
+            return EnvDocument()
+
+    def run(self):
+        if self.worker:
+            return
+        try:
+            days = int(self.days_entry.get())
+            seed = int(self.seed_entry.get()) if self.seed_entry.get().strip() else None
+        except ValueError:
+            messagebox.showerror("Error", "Days and seed must be whole numbers.")
+            return
+        if days < 1:
+            messagebox.showerror("Error", "Simulate at least one day.")
+            return
+        model = WeatherModel(self.document)
+        self.run_button.config(state=tk.DISABLED)
+        self.status_label.config(text=f"Simulating {days} days...")
+        self.worker = threading.Thread(target=self.work, args=(model, days, seed), daemon=True)
+        self.worker.start()
+        self.root.after(100, self.poll)
+
+    def work(self, model, days, seed):
+        try:
+            self.result = simulate(model, days, seed=seed)
+        except Exception as e:
+            self.error = e
+
+    def poll(self):
+        if self.worker.is_alive():
+            self.root.after(100, self.poll)
+            return
+        self.worker = None
+        self.run_button.config(state=tk.NORMAL)
+        if self.error is not None:
+            messagebox.showerror("Error", f"Simulation failed: {self.error}")
+            self.error = None
+            self.status_label.config(text="")
+            return
+        self.show_result(self.result)
+
+    def show_result(self, result):
+        self.status_label.config(text=f"{result.days} days in {result.seconds:.2f}s")
+        self.states_listbox.delete(0, tk.END)
+        self.states_listbox.insert(tk.END, *state_rows(result))
+        self.transitions_listbox.delete(0, tk.END)
+        self.transitions_listbox.insert(tk.END, *transition_rows(result, 100))
+
+    def on_document_changed(self, document, source):
+        self.env_file_path = self.session.env_file_path
+        self.document = document
+        if self.result is not None and not self.worker:
+            self.status_label.config(text="The json changed; run again to update.")
+
+    def on_closing(self):
+        if self.session:
+            self.session.unsubscribe(self.on_document_changed)
+        self.root.destroy()
+
+if __name__ == "__main__":
+    if np is None:
+        raise SystemExit(NUMPY_MISSING)
+    root = tk.Tk()
+    app = SimulatorApp(root)
+    root.protocol("WM_DELETE_WINDOW", app.on_closing)
+    root.mainloop()
@@ -0,0 +1,125 @@
+import fnmatch, re
+from curves import CurveStore
+from env_ops import CURVE_FIELDS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NUMPY_MISSING = "The bulk property editor needs NumPy: pip install numpy"
+
+
+def has_effect(state_data):
+    depot_path = (state_data.get('effect') or {}).get('DepotPath') or {}
+    return depot_path.get('$value') not in (None, "", "0", 0)
+
+
+class StateColumns:
+    # The curve fields of every weather state as CurveStores in weatherStates
+    # order, plus a has-effect column. Filters build a row mask; operations
+    # change every point of the masked curves of one field, and changes()
+    # diffs all of them against the document in one pass.
+    def __init__(self, document):
+        if np is None:
+            raise ImportError(NUMPY_MISSING)
+        states = document.weather_states
+        self.names = [state['Data']['name']['$value'] for state in states]
+        self.stores = {field: CurveStore.for_states(document, field) for field in CURVE_FIELDS}
+        self.original = {field: store.values.copy() for field, store in self.stores.items()}
+        # Curves set to null, and curves set to a single value, by set()
+        self.null = {field: store.null.copy() for field, store in self.stores.items()}
+        self.constant = {field: np.full(len(states), np.nan) for field in CURVE_FIELDS}
+        self.effects = np.array([has_effect(state['Data']) for state in states], dtype=bool)
+
+    def __len__(self):
+        return len(self.names)
+
+    def ranges(self, field):
+        # (lowest, highest) value of every curve of field; nan for null
+        low, high = self.stores[field].ranges()
+        constant = self.constant[field]
+        fixed = ~np.isnan(constant)
+        low[fixed] = high[fixed] = constant[fixed]
+        low[self.null[field]] = high[self.null[field]] = np.nan
+        return low, high
+
+    def select(self, pattern=None, effect=None, field=None, low=None, high=None):
+        # pattern is a glob on the state name; effect True/False keeps states
+        # with/without one; low/high bound every value a curve of field takes,
+        # and null curves never fall in a range
+        mask = np.ones(len(self.names), dtype=bool)
+        if pattern and pattern != '*':
+            match = re.compile(fnmatch.translate(pattern)).match
+            mask &= np.fromiter((match(name) is not None for name in self.names), dtype=bool, count=len(self.names))
+        if effect is not None:
+            mask &= self.effects if effect else ~self.effects
+        if field is not None and (low is not None or high is not None):
+            lowest, highest = self.ranges(field)
+            mask &= ~np.isnan(lowest)
+            if low is not None:
+                mask &= lowest >= low
+            if high is not None:
+                mask &= highest <= high
+        return mask
+
+    def set(self, field, mask, value):
+        # One value for the whole day, or null
+        store = self.stores[field]
+        self.null[field][mask] = value is None
+        self.constant[field][mask] = np.nan if value is None else value
+        if value is not None:
+            store.values[store.point_mask(mask)] = value
+
+    # Null curves stay null when scaled, offset or clamped
+    def scale(self, field, mask, factor):
+        self.stores[field].values[self.stores[field].point_mask(mask)] *= factor
+        self.constant[field][mask] *= factor
+
+    def offset(self, field, mask, delta):
+        self.stores[field].values[self.stores[field].point_mask(mask)] += delta
+        self.constant[field][mask] += delta
+
+    def clamp(self, field, mask, low=None, high=None):
+        if low is None and high is None:
+            return
+        values = self.stores[field].values
+        points = self.stores[field].point_mask(mask)
+        values[points] = np.clip(values[points], low, high)
+        self.constant[field][mask] = np.clip(self.constant[field][mask], low, high)
+
+    def rows(self, mask):
+        return np.flatnonzero(mask).tolist()
+
+    def values(self, rows):
+        # {field: None or (lowest, highest)} for each of the rows, for display
+        ranges = {field: self.ranges(field) for field in CURVE_FIELDS}
+        return [{field: None if np.isnan(low[row]) else (float(low[row]), float(high[row]))
+                 for field, (low, high) in ranges.items()} for row in rows]
+
+    def changes(self):
+        # {name: {field: value}} for every curve that differs from the document:
+        # None for null, a number for one value, else [[point, value], ...]
+        changed = {}
+        for field in CURVE_FIELDS:
+            store, null, constant = self.stores[field], self.null[field], self.constant[field]
+            moved = np.zeros(len(self.names), dtype=bool)
+            filled = store.counts > 0
+            if filled.any():
+                differs = (store.values != self.original[field]).astype(np.int64)
+                moved[filled] = np.add.reduceat(differs, store.offsets[:-1][filled]) > 0
+            fixed = ~np.isnan(constant) & ~null
+            # A single point at noon already holding the value is left alone
+            unchanged = (store.counts == 1) & ~store.null
+            if unchanged.any():
+                unchanged[unchanged] = (store.points[store.offsets[:-1][unchanged]] == 12) & ~moved[unchanged]
+            rows = (null != store.null) | (moved & ~null) | (fixed & ~unchanged)
+            for row in np.flatnonzero(rows).tolist():
+                if null[row]:
+                    value = None
+                elif fixed[row]:
+                    value = float(constant[row])
+                else:
+                    value = [[int(point) if point.is_integer() else point, value] for point, value in store.points_of(row)]
+                changed.setdefault(self.names[row], {})[field] = value
+        return changed
@@ -0,0 +1,20 @@
+import os, sys
+import pytest
+
+# The modules live at the top of the repository, next to main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generate import make_env
+from env_loader import dumps_env
+
+
+@pytest.fixture
+def env_data():
+    return make_env(states=6, transitions=12, areas=3, points=4)
+
+
+@pytest.fixture
+def env_file(tmp_path, env_data):
+    file_path = tmp_path / 'env.json'
+    file_path.write_bytes(dumps_env(env_data).encode('utf-8'))
+    return str(file_path)
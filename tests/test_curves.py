@@ -0,0 +1,57 @@
+import pytest
+from curves import CurveStore, format_points, parse_points
+from env_ops import make_curve
+
+np = pytest.importorskip('numpy')
+
+
+def curve(points, interpolation='Linear'):
+    result = make_curve([list(point) for point in points])
+    result['InterpolationType'] = interpolation
+    return result
+
+
+def test_points_round_trip_through_text():
+    assert format_points(make_curve(0.25)) == "0.25"
+    assert format_points(None) == ""
+    text = format_points(curve([(6, 0.1), (18.5, 0.3)]))
+    assert text == "6:0.1, 18.5:0.3"
+    assert parse_points(text) == [[6, 0.1], [18.5, 0.3]]
+    assert parse_points("0.5") == 0.5
+    assert parse_points(" null ") is None
+    with pytest.raises(ValueError):
+        parse_points("6:0.1, 0.3")
+    with pytest.raises(ValueError):
+        parse_points("25:0.1")
+
+
+def test_linear_curves_wrap_around_midnight():
+    store = CurveStore([curve([(6, 0.0), (18, 1.0)])])
+    values = store.evaluate([6, 12, 18, 0, 21, 3, 30])[0]
+    assert values == pytest.approx([0.0, 0.5, 1.0, 0.5, 0.75, 0.25, 0.0])
+
+
+def test_constant_curves_hold_until_the_next_point():
+    store = CurveStore([curve([(6, 0.2), (18, 0.8)], 'Constant')])
+    assert store.evaluate([5.9, 6, 17.9, 18, 23.9])[0] == pytest.approx([0.8, 0.2, 0.2, 0.8, 0.8])
+
+
+def test_evaluate_matches_each_curve_on_its_own():
+    curves = [make_curve(0.4), None, curve([(0, 1.0), (12, 2.0)]), curve([(3, 5.0), (9, 1.0), (20, 2.0)]),
+              curve([(23.5, 3.0), (0.5, 1.0)])]
+    hours = np.linspace(0, 24, 97)
+    together = CurveStore(curves).evaluate(hours)
+    assert together.shape == (len(curves), len(hours))
+    assert np.isnan(together[1]).all()
+    for index, single in enumerate(curves):
+        if single is not None:
+            assert together[index] == pytest.approx(CurveStore([single]).evaluate(hours)[0])
+    assert (together[0] == 0.4).all()
+
+
+def test_ranges_and_day_sampling():
+    store = CurveStore([curve([(0, 1.0), (12, 3.0)]), None])
+    low, high = store.ranges()
+    assert (low[0], high[0]) == (1.0, 3.0)
+    assert np.isnan(low[1]) and np.isnan(high[1])
+    assert store.day(60).shape == (2, 24)
@@ -0,0 +1,71 @@
+import os
+import pytest
+import doc_cache
+from env_loader import RawJSON
+from doc_cache import cache_path, load_env_cached
+
+
+@pytest.fixture
+def parses(tmp_path, monkeypatch):
+    # Counts the loads that had to parse the file instead of using the cache
+    monkeypatch.setattr(doc_cache, 'CACHE_DIR', str(tmp_path / 'cache'))
+    count = []
+    loads_env = doc_cache.loads_env
+    monkeypatch.setattr(doc_cache, 'loads_env', lambda *args: count.append(1) or loads_env(*args))
+    return count
+
+
+def loaded(file_path):
+    # The document as plain json, raw members included
+    data, layout = load_env_cached(file_path)
+    root_chunk = data['Data']['RootChunk']
+    return {member: value.load() if isinstance(value, RawJSON) else value for member, value in root_chunk.items()}
+
+
+def test_an_unchanged_file_is_a_hit(env_file, env_data, parses):
+    first = loaded(env_file)
+    assert os.path.exists(cache_path(env_file))
+    assert loaded(env_file) == first
+    assert len(parses) == 1
+    assert first == env_data['Data']['RootChunk']
+
+
+@pytest.mark.parametrize('change', ['size', 'mtime_ns', 'sha256'])
+def test_a_changed_file_is_a_miss(env_file, parses, change):
+    loaded(env_file)
+    stat = os.stat(env_file)
+    with open(env_file, 'rb') as file:
+        source = file.read()
+    if change == 'size':
+        source = source.replace(b'bench_state_0', b'bench_state_0x')
+    elif change == 'sha256':
+        source = source.replace(b'bench_state_0', b'bench_state_9')
+    with open(env_file, 'wb') as file:
+        file.write(source)
+    # Same size and mtime as before unless that's what the test changes
+    mtime_ns = stat.st_mtime_ns + 1000 if change == 'mtime_ns' else stat.st_mtime_ns
+    os.utime(env_file, ns=(stat.st_atime_ns, mtime_ns))
+
+    root_chunk = loaded(env_file)
+    assert len(parses) == 2
+    names = [state['Data']['name']['$value'] for state in root_chunk['weatherStates']]
+    assert names[0] == {'size': 'bench_state_0x', 'mtime_ns': 'bench_state_0', 'sha256': 'bench_state_9'}[change]
+
+
+@pytest.mark.parametrize('damage', ['garbage', 'truncated', 'empty'])
+def test_a_corrupt_cache_entry_is_ignored(env_file, parses, damage):
+    expected = loaded(env_file)
+    path = cache_path(env_file)
+    with open(path, 'rb') as file:
+        entry = file.read()
+    with open(path, 'wb') as file:
+        if damage == 'garbage':
+            file.write(b'not a pickle at all')
+        elif damage == 'truncated':
+            file.write(entry[:len(entry) // 2])
+
+    assert loaded(env_file) == expected
+    assert len(parses) == 2
+    # The entry is written again and used on the next load
+    assert loaded(env_file) == expected
+    assert len(parses) == 2
@@ -0,0 +1,63 @@
+import copy
+from edit_history import EdgesEdit, RemoveStateEdit, StatePropertiesEdit, TransitionsEdit
+from env_document import EnvDocument
+from transition_graph import make_transition
+
+
+def edges_by_name(document):
+    # Ends that aren't weather states show as None
+    return sorted(((document.get_state_name(source_id), document.get_state_name(target_id))
+                   for source_id, target_id in document.graph.edges), key=str)
+
+
+def test_undo_restores_a_removed_state_and_its_transitions(env_file):
+    document = EnvDocument.load(env_file, lazy=True)
+    names, edges = document.state_names(), edges_by_name(document)
+    document.history.perform(RemoveStateEdit('bench_state_1'))
+    assert 'bench_state_1' not in document.state_names()
+    document.history.undo()
+    assert document.state_names() == names
+    assert edges_by_name(document) == edges
+    document.history.redo()
+    assert 'bench_state_1' not in document.state_names()
+
+
+def test_edits_that_change_nothing_are_not_recorded(env_file):
+    document = EnvDocument.load(env_file, lazy=True)
+    state = document.get_state('bench_state_0')
+    sources = [document.get_state_by_handle_id(source_id) for source_id in document.graph.sources(state['HandleId'])]
+    assert document.history.perform(TransitionsEdit(state, sources=sources)) is False
+    assert document.history.perform(RemoveStateEdit('missing')) is False
+    assert document.history.undo() is None
+
+
+def test_property_and_edge_edits_undo(env_file):
+    document = EnvDocument.load(env_file, lazy=True)
+    before = copy.deepcopy(document.weather_states)
+    edges = edges_by_name(document)
+    first, second = document.get_state('bench_state_0'), document.get_state('bench_state_5')
+    document.history.perform(StatePropertiesEdit('bench_state_0', {'probability': 0.5, 'minDuration': None}))
+    document.history.perform(EdgesEdit(add=[(first, second), (second, first)]))
+    document.history.undo()
+    document.history.undo()
+    assert document.weather_states == before
+    assert edges_by_name(document) == edges
+
+
+def test_dangling_transitions_dont_break_undo(env_file):
+    # A HandleRefId that names something other than a weather state
+    document = EnvDocument.load(env_file, lazy=True)
+    state = document.get_state('bench_state_1')
+    document.graph.add('9999', state['HandleId'], make_transition('9999', state['HandleId']))
+    document.graph.add(state['HandleId'], '9998', make_transition(state['HandleId'], '9998'))
+    edges = [edge for edge in edges_by_name(document) if None not in edge]
+
+    document.history.perform(RemoveStateEdit('bench_state_1'))
+    document.history.undo()
+    assert edges_by_name(document) == edges
+
+    state = document.get_state('bench_state_1')
+    document.graph.add(state['HandleId'], '9998', make_transition(state['HandleId'], '9998'))
+    document.history.perform(TransitionsEdit(state, targets=[]))
+    document.history.undo()
+    assert [edge for edge in edges_by_name(document) if None not in edge] == edges
@@ -0,0 +1,90 @@
+import os
+from edit_history import RemoveStateEdit, StatePropertiesEdit
+from edit_journal import EditJournal, effective_ops, file_version, replay_ops
+from env_document import EnvDocument
+
+
+def open_document(env_file):
+    document = EnvDocument.load(env_file, lazy=True)
+    journal = EditJournal(env_file)
+    journal.rebase()
+    document.history.journal = journal
+    return document, journal
+
+
+def max_duration(document, name):
+    return document.get_state(name)['Data']['maxDuration']['Elements'][0]['Value']
+
+
+def test_effective_ops_resolves_undo_and_redo():
+    first, second, third = {'op': 'set', 'n': 1}, {'op': 'set', 'n': 2}, {'op': 'set', 'n': 3}
+    records = [first, second, {'op': 'undo'}, {'op': 'redo'}, {'op': 'undo'}, third]
+    assert effective_ops(records) == [first, third]
+    assert effective_ops([first, {'op': 'undo'}, {'op': 'undo'}, {'op': 'redo'}]) == [first]
+    # Edits pushed out of the history can no longer be undone
+    assert effective_ops([first, second, {'op': 'undo'}, {'op': 'undo'}], limit=1) == [first]
+
+
+def test_journaled_edits_replay_onto_the_saved_file(env_file):
+    document, journal = open_document(env_file)
+    saved_duration = max_duration(document, 'bench_state_2')
+    document.history.perform(StatePropertiesEdit('bench_state_1', {'maxDuration': 4.0}))
+    document.history.perform(RemoveStateEdit('bench_state_4'))
+    document.history.perform(StatePropertiesEdit('bench_state_2', {'maxDuration': 5.0}))
+    document.history.undo()
+    journal.close()
+
+    base, records = EditJournal(env_file).read()
+    assert base == file_version(env_file)
+    reloaded = EnvDocument.load(env_file, lazy=True)
+    applied = replay_ops(reloaded, effective_ops(records))
+    assert [op['op'] for op in applied] == ['set', 'disable']
+    assert max_duration(reloaded, 'bench_state_1') == 4.0
+    assert max_duration(reloaded, 'bench_state_2') == saved_duration
+    assert reloaded.get_state('bench_state_4') is None
+    # Replayed edits go through the history and can be undone
+    reloaded.history.undo()
+    assert reloaded.get_state('bench_state_4') is not None
+
+
+def test_ops_that_no_longer_apply_are_dropped(env_file):
+    document = EnvDocument.load(env_file, lazy=True)
+    ops = [{'op': 'disable', 'state': 'missing'}, {'op': 'set', 'state': 'missing', 'values': {'maxDuration': 1}},
+           {'op': 'set', 'state': 'bench_state_0', 'values': {'maxDuration': 3.0}}]
+    assert replay_ops(document, ops) == ops[2:]
+
+
+def test_saving_empties_the_journal(env_file):
+    document, journal = open_document(env_file)
+    document.history.perform(StatePropertiesEdit('bench_state_1', {'maxDuration': 4.0}))
+    assert os.path.exists(journal.path)
+    document.save(env_file)
+    assert not os.path.exists(journal.path)
+    assert journal.base == file_version(env_file)
+
+    document.history.perform(StatePropertiesEdit('bench_state_1', {'maxDuration': 6.0}))
+    base, records = EditJournal(env_file).read()
+    assert base == file_version(env_file)
+    assert records == [{'op': 'set', 'state': 'bench_state_1', 'values': {'maxDuration': 6.0}}]
+
+
+def test_rebase_replaces_the_journal_in_one_step(env_file):
+    document, journal = open_document(env_file)
+    kept = [{'op': 'set', 'state': 'bench_state_1', 'values': {'maxDuration': 4.0}}]
+    journal.append({'op': 'set', 'state': 'bench_state_0', 'values': {'maxDuration': 2.0}}, {'op': 'undo'})
+    journal.rebase(kept)
+    assert EditJournal(env_file).read() == (file_version(env_file), kept)
+    assert journal.records == kept
+    # No temp files are left behind and appends continue the new journal
+    journal.append({'op': 'undo'})
+    assert sorted(os.listdir(os.path.dirname(env_file))) == ['env.json', 'env.json.journal']
+    assert EditJournal(env_file).read()[1] == kept + [{'op': 'undo'}]
+
+
+def test_a_torn_last_line_is_ignored(env_file):
+    document, journal = open_document(env_file)
+    document.history.perform(StatePropertiesEdit('bench_state_1', {'maxDuration': 4.0}))
+    journal.close()
+    with open(journal.path, 'a', encoding='utf-8') as file:
+        file.write('{"op": "set", "sta')
+    assert len(EditJournal(env_file).read()[1]) == 1
@@ -0,0 +1,85 @@
+import copy, json, os
+import pytest
+from env_batch import expand_files, ops_for_file, process_file, run_batch
+from env_document import EnvDocument
+from env_loader import dumps_env
+from env_ops import check_ops
+
+
+def test_process_file_applies_ops_and_saves(env_file, tmp_path):
+    output = str(tmp_path / 'variant.json')
+    ops = [{'op': 'disable', 'state': 'bench_state_2'},
+           {'op': 'set', 'state': 'bench_state_0', 'values': {'probability': 0.3}},
+           {'op': 'export', 'path': str(tmp_path / '{name}.lua')}]
+    result = process_file(env_file, ops, output)
+    assert result['ok'], result['error']
+    assert len(result['log']) == 3
+    document = EnvDocument.load(output)
+    assert document.get_state('bench_state_2') is None
+    assert document.get_state('bench_state_0')['Data']['probability']['Elements'] == [{'Point': 12, 'Value': 0.3}]
+    assert 'bench_state_0' in (tmp_path / 'env.lua').read_text()
+
+
+@pytest.mark.parametrize('ops', [
+    [{'op': 'set', 'state': 'bench_state_0', 'values': [1]}],
+    [{'op': 'global'}],
+    [{'op': 'edges', 'add': 'bench_state_0'}],
+    [{'op': 'factor', 'category': 'resolutionFilmGrainScale', 'values': ['x']}],
+    [{'op': 'check', 'minutes': 0}],
+    [{'op': 'frobnicate'}],
+    ['disable'],
+])
+def test_malformed_ops_fail_the_file_without_touching_it(env_file, ops):
+    with open(env_file, 'rb') as file:
+        source = file.read()
+    with pytest.raises(ValueError):
+        check_ops(ops)
+    result = process_file(env_file, ops)
+    assert not result['ok']
+    assert result['error']
+    with open(env_file, 'rb') as file:
+        assert file.read() == source
+
+
+def test_export_paths_name_their_file():
+    ops = ops_for_file([{'op': 'export', 'path': 'out/{folder}-{name}.lua'}, {'op': 'check'}], 'regions/city/env.json')
+    assert ops == [{'op': 'export', 'path': 'out/city-env.lua'}, {'op': 'check'}]
+
+
+def test_run_batch_reports_every_file(env_file, tmp_path):
+    missing = str(tmp_path / 'missing.json')
+    results = run_batch([env_file, missing], [{'op': 'disable', 'state': 'bench_state_1'}], jobs=2)
+    assert [result['file'] for result in results] == [env_file, missing]
+    assert [result['ok'] for result in results] == [True, False]
+    with open(env_file, 'r', encoding='utf-8') as file:
+        assert 'bench_state_1' not in json.dumps(json.load(file)['Data']['RootChunk']['weatherStates'])
+
+
+def test_one_bad_file_in_a_glob_fails_on_its_own(tmp_path, env_data):
+    # The middle file lacks the state of the second op, so it fails after the
+    # first op already changed it in memory
+    sources = {}
+    for region in ('a', 'b', 'c'):
+        data = copy.deepcopy(env_data)
+        if region == 'b':
+            states = data['Data']['RootChunk']['weatherStates']
+            states[:] = [state for state in states if state['Data']['name']['$value'] != 'bench_state_3']
+        (tmp_path / region).mkdir()
+        sources[region] = dumps_env(data).encode('utf-8')
+        (tmp_path / region / 'env.json').write_bytes(sources[region])
+
+    env_files = expand_files([str(tmp_path / '*' / 'env.json')])
+    assert [os.path.basename(os.path.dirname(path)) for path in env_files] == ['a', 'b', 'c']
+    ops = [{'op': 'disable', 'state': 'bench_state_1'},
+           {'op': 'set', 'state': 'bench_state_3', 'values': {'probability': 0.2}}]
+    reported = []
+    results = run_batch(env_files, ops, jobs=2, on_result=reported.append)
+
+    assert [result['ok'] for result in results] == [True, False, True]
+    assert sorted(result['file'] for result in reported) == env_files
+    assert 'bench_state_3' in results[1]['error']
+    assert (tmp_path / 'b' / 'env.json').read_bytes() == sources['b']
+    for region in ('a', 'c'):
+        document = EnvDocument.load(str(tmp_path / region / 'env.json'))
+        assert document.get_state('bench_state_1') is None
+        assert document.get_state('bench_state_3')['Data']['probability']['Elements'] == [{'Point': 12, 'Value': 0.2}]
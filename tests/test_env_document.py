@@ -0,0 +1,76 @@
+import json
+import pytest
+from collections import Counter
+from edit_history import RemoveStateEdit, StatePropertiesEdit, TransitionsEdit
+from env_document import EnvDocument
+from env_ops import new_state
+
+
+def saved_handle_ids(file_path):
+    with open(file_path, 'r', encoding='utf-8') as file:
+        root_chunk = json.load(file)['Data']['RootChunk']
+    ids = [entry['HandleId'] for key in ('weatherStates', 'weatherStateTransitions') for entry in root_chunk[key]]
+    for area in root_chunk['worldRenderSettings']['areaParameters']:
+        ids += [area['HandleId'], area['Data']['hdrMode']['HandleId'], area['Data']['mode']['HandleId']]
+    return ids
+
+
+def assert_unique(ids):
+    assert [handle_id for handle_id, count in Counter(ids).items() if count > 1] == []
+
+
+def test_save_renumbers_new_transitions(env_file):
+    # A Transitions click followed by a save from another window
+    document = EnvDocument.load(env_file, lazy=True)
+    state = document.get_state('bench_state_0')
+    targets = [document.get_state_by_handle_id(target_id) for target_id in document.graph.targets(state['HandleId'])]
+    added = [entry for entry in document.weather_states if entry not in targets][:2]
+    assert len(added) == 2
+    targets += added
+    document.history.perform(TransitionsEdit(state, targets=targets))
+    document.history.perform(StatePropertiesEdit('bench_state_1', {'maxDuration': 3.0}))
+    document.save(env_file)
+    assert_unique(saved_handle_ids(env_file))
+    assert EnvDocument.load(env_file).graph.targets(document.get_handle_id('bench_state_0')) == \
+        {target['HandleId'] for target in targets}
+
+
+def test_save_renumbers_added_and_removed_states(env_file):
+    document = EnvDocument.load(env_file, lazy=True)
+    document.add_state(new_state('added'))
+    document.history.perform(RemoveStateEdit('bench_state_2'))
+    document.save(env_file)
+    ids = saved_handle_ids(env_file)
+    assert ids == [str(handle_id) for handle_id in range(len(ids))]
+    assert not document.renumber_needed
+
+
+def test_save_without_structural_edits_keeps_handle_ids(env_file):
+    document = EnvDocument.load(env_file, lazy=True)
+    document.history.perform(StatePropertiesEdit('bench_state_1', {'maxDuration': 3.0}))
+    document.save(env_file)
+    # Nothing needed renumbering, so the lazily loaded members stay raw
+    assert type(document.root_chunk['worldRenderSettings']).__name__ == 'RawJSON'
+
+
+def test_a_document_that_failed_to_load_is_never_saved(env_file):
+    with open(env_file, 'rb') as file:
+        source = file.read()
+    with open(env_file, 'wb') as file:
+        file.write(source[:len(source) // 2])
+    with pytest.raises(ValueError):
+        EnvDocument.load(env_file, lazy=True)
+
+    # What the windows fall back to after showing the load error
+    document = EnvDocument()
+    assert not document.loaded
+    document.ensure_unique_handle_ids()
+    with pytest.raises(ValueError):
+        document.save(env_file)
+    with open(env_file, 'rb') as file:
+        assert file.read() == source[:len(source) // 2]
+
+
+def test_loaded_needs_a_root_chunk(env_file):
+    assert EnvDocument.load(env_file, lazy=True).loaded
+    assert not EnvDocument({'Data': {}}).loaded
@@ -0,0 +1,54 @@
+import json
+from env_document import EnvDocument
+from env_loader import PARSED_KEYS, RawJSON, dumps_env, load_env, loads_env, materialize
+
+
+def test_lazy_load_parses_only_the_edited_members(env_file, env_data):
+    data, layout = load_env(env_file)
+    root_chunk = data['Data']['RootChunk']
+    assert list(root_chunk) == list(env_data['Data']['RootChunk'])
+    for key, value in root_chunk.items():
+        if key in PARSED_KEYS:
+            assert value == env_data['Data']['RootChunk'][key]
+        else:
+            assert isinstance(value, RawJSON)
+    assert root_chunk['worldRenderSettings'].load() == env_data['Data']['RootChunk']['worldRenderSettings']
+    assert layout is not None
+
+
+def test_lazy_load_matches_a_full_parse(env_file):
+    data, layout = load_env(env_file)
+    materialize(data['Data']['RootChunk'])
+    with open(env_file, 'r', encoding='utf-8') as file:
+        assert data == json.load(file)
+
+
+def test_crlf_file_loads_the_same(env_data):
+    source = dumps_env(env_data).replace('\n', '\r\n').encode('utf-8')
+    data, layout = loads_env(source)
+    assert layout.newline == b'\r\n'
+    materialize(data['Data']['RootChunk'])
+    assert data == env_data
+
+
+def test_compact_file_falls_back_to_a_full_parse(env_data):
+    data, layout = loads_env(json.dumps(env_data).encode('utf-8'))
+    assert layout is None
+    assert data == env_data
+    assert not any(isinstance(value, RawJSON) for value in data['Data']['RootChunk'].values())
+
+
+def test_materialize_reports_whether_it_parsed_anything(env_file):
+    data, layout = load_env(env_file)
+    root_chunk = data['Data']['RootChunk']
+    assert materialize(root_chunk)
+    assert not materialize(root_chunk)
+
+
+def test_document_materialize_keeps_the_renumber_cache_once_parsed(env_file):
+    document = EnvDocument.load(env_file, lazy=True)
+    document.ensure_unique_handle_ids()
+    renumbered = document.renumberer.root_chunk
+    assert renumbered is document.root_chunk
+    document.materialize()
+    assert document.renumberer.root_chunk is renumbered
@@ -0,0 +1,35 @@
+import copy
+import pytest
+from env_document import EnvDocument
+from env_ops import apply_ops, check_curve_value, check_ops, set_state_properties
+
+
+@pytest.mark.parametrize('effect', [12, 1.5, True, ['base/fx/rain.effect'], {'DepotPath': 'x.effect'}])
+def test_set_ops_need_a_string_or_null_effect(env_data, effect):
+    ops = [{'op': 'set', 'state': 'bench_state_0', 'values': {'effect': effect}}]
+    with pytest.raises(ValueError):
+        check_ops(ops)
+    document = EnvDocument(copy.deepcopy(env_data))
+    with pytest.raises(ValueError):
+        set_state_properties(document, 'bench_state_0', {'effect': effect})
+    assert document.data == env_data
+
+
+def test_set_ops_take_an_effect_path_or_null(env_data):
+    document = EnvDocument(env_data)
+    apply_ops(document, [{'op': 'set', 'state': 'bench_state_0', 'values': {'effect': 'base/fx/rain.effect'}},
+                         {'op': 'set', 'state': 'bench_state_1', 'values': {'effect': None, 'probability': 0.5}}])
+    assert document.get_state('bench_state_0')['Data']['effect']['DepotPath'] == {
+        '$type': 'ResourcePath', '$storage': 'string', '$value': 'base/fx/rain.effect'}
+    assert document.get_state('bench_state_1')['Data']['effect']['DepotPath']['$value'] == 0
+
+
+@pytest.mark.parametrize('value', [True, False, [[6, True]], [[False, 0.5]], 'abc', [], {'6': 0.5}])
+def test_curve_values_reject_bools_and_other_types(value):
+    with pytest.raises(ValueError):
+        check_curve_value('probability', value)
+
+
+@pytest.mark.parametrize('value', [None, 0, 0.5, [[6, 0.1], [18.5, 1]], [(0, 2)]])
+def test_curve_values_take_numbers_null_or_pairs(value):
+    check_curve_value('probability', value)
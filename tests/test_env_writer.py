@@ -0,0 +1,122 @@
+import json, os
+import pytest
+from edit_history import TransitionsEdit
+from env_document import EnvDocument
+from env_loader import dumps_env
+from env_ops import set_state_properties
+from env_writer import write_env
+
+
+def read_bytes(file_path):
+    with open(file_path, 'rb') as file:
+        return file.read()
+
+
+def write_bytes(file_path, source):
+    with open(file_path, 'wb') as file:
+        file.write(source)
+
+
+def test_saving_an_unchanged_document_is_byte_identical(env_file):
+    # Including the key order, float formatting and indentation WolvenKit wrote
+    source = read_bytes(env_file).replace(b'"Version": 195', b'"Version":   195')
+    write_bytes(env_file, source)
+    document = EnvDocument.load(env_file, lazy=True)
+    document.save(env_file)
+    assert read_bytes(env_file) == source
+
+
+def test_an_edit_rewrites_only_its_state(env_file, env_data):
+    source = read_bytes(env_file)
+    document = EnvDocument.load(env_file, lazy=True)
+    set_state_properties(document, 'bench_state_1', {'maxDuration': 2.5})
+    document.save(env_file)
+    saved = read_bytes(env_file)
+
+    expected = json.loads(source)
+    expected['Data']['RootChunk']['weatherStates'][1]['Data']['maxDuration']['Elements'][0]['Value'] = 2.5
+    assert json.loads(saved) == expected
+    # Everything before the edited state is copied over untouched
+    state = expected['Data']['RootChunk']['weatherStates'][1]
+    prefix = source[:source.index(b'"bench_state_1"')]
+    prefix = prefix[:prefix.rindex(f'"HandleId": "{state["HandleId"]}"'.encode())]
+    assert saved.startswith(prefix)
+    assert saved.endswith(source[source.index(b'"bench_state_2"'):])
+
+
+def test_crlf_files_keep_their_line_endings(env_file):
+    source = read_bytes(env_file).replace(b'\n', b'\r\n')
+    write_bytes(env_file, source)
+
+    document = EnvDocument.load(env_file, lazy=True)
+    document.save(env_file)
+    assert read_bytes(env_file) == source
+
+    set_state_properties(document, 'bench_state_3', {'probability': [[6, 0.1], [18, 0.3]]})
+    document.save(env_file)
+    saved = read_bytes(env_file)
+    assert saved.count(b'\n') == saved.count(b'\r\n')
+    assert EnvDocument.load(env_file).get_state('bench_state_3')['Data']['probability']['Elements'] == [
+        {'Point': 6, 'Value': 0.1}, {'Point': 18, 'Value': 0.3}]
+
+
+def test_compact_files_are_rewritten_whole(env_file, env_data):
+    write_bytes(env_file, json.dumps(env_data).encode('utf-8'))
+    document = EnvDocument.load(env_file, lazy=True)
+    assert document.layout is None
+    set_state_properties(document, 'bench_state_0', {'minDuration': 1.0})
+    document.save(env_file)
+
+    saved = read_bytes(env_file)
+    assert json.loads(saved) == json.loads(dumps_env(document.data))
+    assert document.layout is not None
+    # The next save splices into the pretty-printed file
+    document.save(env_file)
+    assert read_bytes(env_file) == saved
+
+
+def test_renumbering_after_a_removal_round_trips(env_file):
+    document = EnvDocument.load(env_file, lazy=True)
+    document.remove_state('bench_state_2')
+    document.ensure_unique_handle_ids()
+    document.save(env_file)
+    assert json.loads(read_bytes(env_file)) == document.data
+
+
+def test_a_payload_without_root_chunk_never_replaces_the_json(env_file):
+    source = read_bytes(env_file)
+    for payload in (b'{}', b'', json.dumps({'Header': {}, 'Data': {}}).encode('utf-8')):
+        with pytest.raises(ValueError):
+            write_env(env_file, payload)
+    assert read_bytes(env_file) == source
+    assert sorted(os.listdir(os.path.dirname(env_file))) == ['env.json']
+
+
+def test_a_new_or_empty_file_can_be_written(tmp_path):
+    file_path = str(tmp_path / 'empty.json')
+    write_env(file_path, b'{}')
+    write_bytes(file_path, b'')
+    write_env(file_path, b'{"Data": {"RootChunk": {}}}')
+    assert read_bytes(file_path) == b'{"Data": {"RootChunk": {}}}'
+
+
+def test_swapping_a_transition_rewrites_only_the_moved_ones(env_file):
+    source = read_bytes(env_file)
+    document = EnvDocument.load(env_file, lazy=True)
+    transitions = document.transitions
+    last_source = transitions[-1]['Data']['sourceWeatherState']['HandleRefId']
+    state = document.get_state_by_handle_id(last_source)
+    targets = [document.get_state_by_handle_id(target_id) for target_id in document.graph.targets(last_source)]
+    free = [entry for entry in document.weather_states if entry not in targets]
+    # One target swapped for another keeps the number of transitions
+    document.history.perform(TransitionsEdit(state, targets=targets[1:] + free[:1]))
+    document.ensure_unique_handle_ids()
+    assert 'weatherStateTransitions' not in document.changed_members
+    moved = len(document.changed_elements['weatherStateTransitions'])
+    assert 0 < moved < len(transitions)
+
+    document.save(env_file)
+    saved = read_bytes(env_file)
+    assert json.loads(saved) == json.loads(dumps_env(document.data))
+    first_transition = source.index(b'"worldWeatherStateTransition"')
+    assert saved[:first_transition] == source[:first_transition]
@@ -0,0 +1,87 @@
+import os
+import pytest
+import envparam_index
+from envparam_index import EnvparamIndex
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.setattr(envparam_index, 'CACHE_DIR', str(tmp_path / 'cache'))
+    root = tmp_path / 'archive'
+    (root / 'rain').mkdir(parents=True)
+    for path in ('clear.envparam', 'notes.txt', 'rain/storm.envparam', 'rain/clear.envparam'):
+        (root / path).write_text('{}')
+    return root
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    # The directories each refresh had to list
+    scanned = []
+    scan_directory = EnvparamIndex.scan_directory
+    monkeypatch.setattr(EnvparamIndex, 'scan_directory',
+                        lambda self, directory, mtime_ns: scanned.append(directory) or scan_directory(self, directory, mtime_ns))
+    return scanned
+
+
+def add_file(path):
+    # Moves the directory mtime forward even on coarse clocks
+    stat = os.stat(path.parent)
+    path.write_text('{}')
+    os.utime(path.parent, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_only_directories_whose_mtime_moved_are_listed_again(root, scans):
+    index = EnvparamIndex(str(root), recursive=True)
+    assert index.refresh()
+    assert index.relative_paths() == {'clear': 'clear.envparam', 'storm': os.path.join('rain', 'storm.envparam')}
+    assert sorted(scans) == [str(root), str(root / 'rain')]
+
+    del scans[:]
+    assert not index.refresh()
+    assert scans == []
+
+    add_file(root / 'rain' / 'fog.envparam')
+    assert index.refresh()
+    assert scans == [str(root / 'rain')]
+    assert sorted(index.names()) == ['clear', 'fog', 'storm']
+
+
+def test_invalidate_lists_a_directory_whose_mtime_did_not_move(root, scans):
+    index = EnvparamIndex(str(root))
+    index.refresh()
+    stat = os.stat(root)
+    (root / 'snow.envparam').write_text('{}')
+    os.utime(root, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert not index.refresh()
+
+    index.invalidate(str(root))
+    assert index.refresh()
+    assert sorted(index.names()) == ['clear', 'snow']
+    # Not recursive, so the subdirectory is never listed
+    assert str(root / 'rain') not in scans
+
+
+def test_the_index_is_reused_across_instances(root, scans):
+    EnvparamIndex(str(root), recursive=True).refresh()
+    del scans[:]
+    index = EnvparamIndex(str(root), recursive=True)
+    assert not index.refresh()
+    assert scans == []
+    assert sorted(index.names()) == ['clear', 'storm']
+
+    add_file(root / 'haze.envparam')
+    index = EnvparamIndex(str(root), recursive=True)
+    assert index.refresh()
+    assert scans == [str(root)]
+    assert sorted(index.names()) == ['clear', 'haze', 'storm']
+
+
+def test_removed_directories_drop_their_files(root):
+    index = EnvparamIndex(str(root), recursive=True)
+    index.refresh()
+    for file_name in os.listdir(root / 'rain'):
+        os.remove(root / 'rain' / file_name)
+    os.rmdir(root / 'rain')
+    assert index.refresh()
+    assert index.relative_paths() == {'clear': 'clear.envparam'}
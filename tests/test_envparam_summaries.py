@@ -0,0 +1,89 @@
+import json, os
+import pytest
+import envparam_summaries
+from envparam_summaries import EnvparamSummaries, summary_path, summary_text
+
+
+def envparam(*areas):
+    # areas are (name, enabled) pairs
+    return {'Data': {'RootChunk': {'$type': 'worldEnvironmentAreaParameters', 'areaParameters': [
+        {'Data': {'$type': f"{name}AreaSettings", 'enable': enabled}} for name, enabled in areas]}}}
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.setattr(envparam_summaries, 'CACHE_DIR', str(tmp_path / 'cache'))
+    root = tmp_path / 'archive'
+    root.mkdir()
+    (root / 'clear.envparam').write_text(json.dumps(envparam(('Fog', True), ('Rain', False))))
+    (root / 'storm.envparam').write_text(json.dumps(envparam(('Rain', True))))
+    (root / 'broken.envparam').write_text('{"Data": ')
+    return root
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    # The files each index() had to read
+    parsed = []
+    summarize_envparam = envparam_summaries.summarize_envparam
+    monkeypatch.setattr(envparam_summaries, 'summarize_envparam',
+                        lambda file_path: parsed.append(os.path.basename(file_path)) or summarize_envparam(file_path))
+    return parsed
+
+
+def make_summaries(root, paths=('clear.envparam', 'storm.envparam', 'broken.envparam')):
+    summaries = EnvparamSummaries(lambda: None)
+    summaries.index(str(root), list(paths))
+    return summaries
+
+
+def test_summaries_describe_the_enabled_areas(root, parses):
+    summaries = make_summaries(root)
+    assert summary_text(summaries.get('clear.envparam')) == "1/2 on: Fog"
+    assert summary_text(summaries.get('storm.envparam')) == "1/1 on: Rain"
+    assert summary_text(summaries.get('broken.envparam')) == "unreadable"
+    assert summary_text(summaries.get('missing.envparam')) == ""
+    assert sorted(parses) == ['broken.envparam', 'clear.envparam', 'storm.envparam']
+
+
+def test_entries_are_keyed_by_size_and_mtime(root, parses):
+    summaries = make_summaries(root)
+    del parses[:]
+    summaries.index(str(root), ['clear.envparam', 'storm.envparam', 'broken.envparam'])
+    # Unreadable files are remembered too
+    assert parses == []
+
+    # Same size, new mtime
+    stat = os.stat(root / 'clear.envparam')
+    (root / 'clear.envparam').write_text(json.dumps(envparam(('Fog', False), ('Rain', True))))
+    os.utime(root / 'clear.envparam', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    # New size, same mtime
+    stat = os.stat(root / 'storm.envparam')
+    (root / 'storm.envparam').write_text(json.dumps(envparam(('Rain', True), ('Snow', True))))
+    os.utime(root / 'storm.envparam', ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    summaries.index(str(root), ['clear.envparam', 'storm.envparam', 'broken.envparam'])
+    assert sorted(parses) == ['clear.envparam', 'storm.envparam']
+    assert summary_text(summaries.get('clear.envparam')) == "1/2 on: Rain"
+    assert summary_text(summaries.get('storm.envparam')) == "2/2 on: Rain, Snow"
+
+
+def test_summaries_are_kept_on_disk_per_root(root, tmp_path, parses):
+    make_summaries(root)
+    assert os.path.exists(summary_path(str(root)))
+    del parses[:]
+    summaries = make_summaries(root)
+    assert parses == []
+    assert summary_text(summaries.get('storm.envparam')) == "1/1 on: Rain"
+
+    # A file no longer asked for is dropped from the saved entries
+    summaries.index(str(root), ['storm.envparam'])
+    assert summaries.get('clear.envparam') is None
+    assert make_summaries(root, ['storm.envparam']).entries.keys() == {'storm.envparam'}
+
+    other = tmp_path / 'other'
+    other.mkdir()
+    (other / 'storm.envparam').write_text(json.dumps(envparam()))
+    summaries.index(str(other), ['storm.envparam'])
+    assert summary_path(str(other)) != summary_path(str(root))
+    assert summary_text(summaries.get('storm.envparam')) == "worldEnvironmentAreaParameters"
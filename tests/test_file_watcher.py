@@ -0,0 +1,78 @@
+import os, threading, time
+import pytest
+from env_document import EnvDocument
+from env_ops import set_state_properties
+from file_watcher import FileWatcher, PollingBackend
+
+DEBOUNCE = 0.2
+
+
+@pytest.fixture(params=['native', 'polling'])
+def watcher(request):
+    watcher = FileWatcher(debounce=DEBOUNCE, poll_interval=0.05)
+    if request.param == 'polling':
+        watcher.make_backend = lambda: PollingBackend(watcher.poll_interval)
+    yield watcher
+    watcher.stop()
+
+
+class Calls:
+    def __init__(self):
+        self.times = []
+        self.event = threading.Event()
+
+    def __call__(self, path):
+        self.times.append(time.monotonic())
+        self.event.set()
+
+    def wait(self, timeout=5.0):
+        # Waits for the first call, then long enough for any late duplicates
+        called = self.event.wait(timeout)
+        time.sleep(DEBOUNCE * 2)
+        return called
+
+
+def write_from_elsewhere(file_path, text):
+    with open(file_path, 'a', encoding='utf-8') as file:
+        file.write(text)
+
+
+def test_a_burst_of_writes_is_one_call(env_file, watcher):
+    calls = Calls()
+    watcher.subscribe(env_file, calls)
+    for number in range(5):
+        write_from_elsewhere(env_file, f"\n{number}")
+        time.sleep(0.03)
+    last_write = time.monotonic()
+
+    assert calls.wait()
+    assert len(calls.times) == 1
+    assert calls.times[0] >= last_write + DEBOUNCE * 0.5
+
+
+def test_own_saves_and_touches_are_skipped(env_file, watcher):
+    calls = Calls()
+    watcher.subscribe(env_file, calls)
+    document = EnvDocument.load(env_file, lazy=True)
+    set_state_properties(document, 'bench_state_0', {'maxDuration': 2.0})
+    document.save(env_file)
+    # A new mtime on the same contents isn't a change either
+    os.utime(env_file)
+    assert not calls.wait(DEBOUNCE * 3)
+
+    write_from_elsewhere(env_file, "\n")
+    assert calls.wait()
+    assert len(calls.times) == 1
+
+
+def test_a_write_after_an_own_save_is_reported(env_file, watcher):
+    # The stamp of the save no longer matches once someone else writes
+    calls = Calls()
+    watcher.subscribe(env_file, calls)
+    EnvDocument.load(env_file, lazy=True).save(env_file)
+    with open(env_file, 'rb') as file:
+        source = file.read()
+    with open(env_file, 'wb') as file:
+        file.write(source.replace(b'bench_state_0', b'bench_state_9'))
+    assert calls.wait()
+    assert len(calls.times) == 1
@@ -0,0 +1,73 @@
+import copy
+from env_ops import new_state
+from handle_ids import HandleRenumberer, collect_handle_refs, max_handle_id
+
+
+def edges_by_name(root_chunk):
+    names = {state['HandleId']: state['Data']['name']['$value'] for state in root_chunk['weatherStates']}
+    return sorted((names[transition['Data']['sourceWeatherState']['HandleRefId']],
+                   names[transition['Data']['targetWeatherState']['HandleRefId']])
+                  for transition in root_chunk['weatherStateTransitions'])
+
+
+def handle_ids(root_chunk):
+    ids = [state['HandleId'] for state in root_chunk['weatherStates']]
+    ids += [transition['HandleId'] for transition in root_chunk['weatherStateTransitions']]
+    for area in root_chunk['worldRenderSettings']['areaParameters']:
+        ids += [area['HandleId'], area['Data']['hdrMode']['HandleId'], area['Data']['mode']['HandleId']]
+    return ids
+
+
+def test_renumbering_a_numbered_file_changes_nothing(env_data):
+    root_chunk = env_data['Data']['RootChunk']
+    before = copy.deepcopy(root_chunk)
+    assert HandleRenumberer().renumber(root_chunk) == set()
+    assert root_chunk == before
+
+
+def test_a_new_state_shifts_everything_after_it(env_data):
+    root_chunk = env_data['Data']['RootChunk']
+    edges = edges_by_name(root_chunk)
+    root_chunk['weatherStates'].append(new_state('added', handle_id="0"))
+
+    changed = HandleRenumberer().renumber(root_chunk)
+
+    assert changed == {'weatherStates', 'weatherStateTransitions', 'worldRenderSettings'}
+    assert handle_ids(root_chunk) == [str(handle_id) for handle_id in range(len(handle_ids(root_chunk)))]
+    assert edges_by_name(root_chunk) == edges
+    assert max_handle_id(root_chunk) == len(handle_ids(root_chunk)) - 1
+
+
+def test_area_parameter_refs_follow_their_handles(env_data):
+    root_chunk = env_data['Data']['RootChunk']
+    root_chunk['weatherStates'].pop(0)
+    root_chunk['weatherStateTransitions'] = [transition for transition in root_chunk['weatherStateTransitions']
+                                             if '0' not in (transition['Data']['sourceWeatherState']['HandleRefId'],
+                                                            transition['Data']['targetWeatherState']['HandleRefId'])]
+
+    HandleRenumberer().renumber(root_chunk)
+
+    areas = root_chunk['worldRenderSettings']['areaParameters']
+    for area in areas:
+        assert area['Data']['ref']['HandleRefId'] == area['Data']['hdrMode']['HandleId']
+    refs = collect_handle_refs(root_chunk['worldRenderSettings'], [])
+    assert len(refs) == len(areas)
+
+
+def test_static_locations_are_cached_per_root_chunk(env_data, monkeypatch):
+    root_chunk = env_data['Data']['RootChunk']
+    renumberer = HandleRenumberer()
+    scans = []
+    scan_static = renumberer.scan_static
+    monkeypatch.setattr(renumberer, 'scan_static', lambda root_chunk: scans.append(1) or scan_static(root_chunk))
+
+    for index in range(3):
+        root_chunk['weatherStates'].append(new_state(f"added_{index}", handle_id="0"))
+        renumberer.renumber(root_chunk)
+    assert len(scans) == 1
+    for area in root_chunk['worldRenderSettings']['areaParameters']:
+        assert area['Data']['ref']['HandleRefId'] == area['Data']['hdrMode']['HandleId']
+
+    renumberer.invalidate()
+    renumberer.renumber(root_chunk)
+    assert len(scans) == 2
@@ -0,0 +1,62 @@
+import pytest
+from env_document import EnvDocument
+from env_ops import make_curve, new_state
+
+np = pytest.importorskip('numpy')
+
+from state_columns import StateColumns
+
+
+def make_columns(probabilities):
+    # probabilities maps state names to a curve value: a number, pairs or None
+    states = []
+    for handle_id, (name, value) in enumerate(probabilities.items()):
+        state = new_state(name, handle_id=str(handle_id))
+        state['Data']['probability'] = None if value is None else make_curve(value)
+        states.append(state)
+    return StateColumns(EnvDocument({'Data': {'RootChunk': {'weatherStates': states, 'weatherStateTransitions': []}}}))
+
+
+def probabilities(columns):
+    return {name: fields.get('probability') for name, fields in columns.changes().items()}
+
+
+@pytest.fixture
+def columns():
+    return make_columns({'curve': [[6, 0.1], [18, 0.3]], 'null': None, 'flat': 0.5})
+
+
+def test_scale_leaves_null_curves_null(columns):
+    columns.scale('probability', columns.select(), 2)
+    assert probabilities(columns) == {'curve': [[6, pytest.approx(0.2)], [18, pytest.approx(0.6)]], 'flat': [[12, 1.0]]}
+    assert columns.values([1])[0]['probability'] is None
+
+
+def test_offset_leaves_null_curves_null(columns):
+    columns.offset('probability', columns.select(), 0.25)
+    assert probabilities(columns) == {'curve': [[6, pytest.approx(0.35)], [18, pytest.approx(0.55)]], 'flat': [[12, 0.75]]}
+
+
+def test_clamp_bounds_each_point(columns):
+    mask = columns.select()
+    columns.clamp('probability', mask)
+    assert probabilities(columns) == {}
+    columns.clamp('probability', mask, high=0.2)
+    assert probabilities(columns) == {'curve': [[6, 0.1], [18, 0.2]], 'flat': [[12, 0.2]]}
+    columns.clamp('probability', mask, low=0.15)
+    assert probabilities(columns) == {'curve': [[6, 0.15], [18, 0.2]], 'flat': [[12, 0.2]]}
+
+
+def test_set_values_and_nulls_carry_through_later_ops(columns):
+    columns.set('probability', columns.select('null'), 0.4)
+    columns.set('probability', columns.select('curve'), None)
+    columns.scale('probability', columns.select(), 0.5)
+    columns.offset('probability', columns.select(), 0.1)
+    columns.clamp('probability', columns.select(), high=0.3)
+    assert probabilities(columns) == {'curve': None, 'null': pytest.approx(0.3), 'flat': [[12, pytest.approx(0.3)]]}
+
+
+def test_ranges_never_select_null_curves(columns):
+    assert columns.select(field='probability', low=0).tolist() == [True, False, True]
+    assert columns.select(field='probability', high=0.3).tolist() == [True, False, False]
+    assert columns.select('*l*', field='probability', low=0.4).tolist() == [False, False, True]
@@ -0,0 +1,62 @@
+import copy, json
+from env_document import EnvDocument
+from env_loader import dumps_env
+from env_ops import set_state_properties
+from transition_graph import TransitionGraph, make_transition, transition_key
+
+
+def test_duplicate_transitions_keep_the_first():
+    first, duplicate = make_transition("0", "1"), make_transition("0", "1")
+    graph = TransitionGraph([first, make_transition("1", "0"), duplicate])
+    assert len(graph) == 2
+    assert graph.get("0", "1") is first
+    assert not graph.dirty
+
+
+def test_adjacency_follows_adds_and_removes():
+    graph = TransitionGraph([make_transition("0", "1"), make_transition("2", "1")])
+    assert graph.sources("1") == {"0", "2"}
+    transition = graph.add("1", "2")
+    assert graph.add("1", "2") is transition
+    assert graph.targets("1") == {"2"}
+    assert graph.remove("0", "1")['Data']['sourceWeatherState']['HandleRefId'] == "0"
+    assert graph.remove("0", "1") is None
+    assert graph.sources("1") == {"2"}
+    assert graph.dirty
+
+
+def test_set_targets_keeps_existing_transition_dicts():
+    kept = make_transition("0", "1")
+    graph = TransitionGraph([kept, make_transition("0", "2")])
+    graph.set_targets("0", ["3", "1", "3"])
+    assert graph.targets("0") == {"1", "3"}
+    assert graph.get("0", "1") is kept
+    assert [transition_key(transition) for transition in graph.to_transitions()] == [("0", "1"), ("0", "3")]
+
+
+def test_remove_state_drops_both_directions():
+    graph = TransitionGraph([make_transition("0", "1"), make_transition("1", "2"), make_transition("1", "1")])
+    removed = graph.remove_state("1")
+    assert len(removed) == 3
+    assert len(graph) == 0
+
+
+def test_duplicate_transitions_are_dropped_on_the_next_edge_edit(env_file):
+    with open(env_file, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    transitions = data['Data']['RootChunk']['weatherStateTransitions']
+    transitions.append(copy.deepcopy(transitions[0]))
+    with open(env_file, 'w', encoding='utf-8') as file:
+        file.write(dumps_env(data))
+
+    document = EnvDocument.load(env_file, lazy=True)
+    assert len(document.graph) == len(transitions) - 1
+    # Saves that don't touch the edges copy the file's transitions as they are
+    set_state_properties(document, 'bench_state_0', {'maxDuration': 2.0})
+    document.save(env_file)
+    assert len(EnvDocument.load(env_file).root_chunk['weatherStateTransitions']) == len(transitions)
+
+    document.graph.add(*transition_key(transitions[0])[::-1])
+    document.save(env_file)
+    saved = [transition_key(transition) for transition in EnvDocument.load(env_file).root_chunk['weatherStateTransitions']]
+    assert len(saved) == len(set(saved)) == len(transitions)
@@ -0,0 +1,54 @@
+import pytest
+from env_document import EnvDocument
+from env_ops import new_state
+from transition_graph import make_transition
+
+np = pytest.importorskip('numpy')
+
+from transition_matrix import TransitionMatrix
+
+
+def make_matrix(names, edges):
+    # edges are (source, target) names; HandleIds follow the order of names
+    states = [new_state(name, handle_id=str(handle_id)) for handle_id, name in enumerate(names)]
+    ids = {name: str(handle_id) for handle_id, name in enumerate(names)}
+    transitions = [make_transition(ids[source], ids[target]) for source, target in edges]
+    return TransitionMatrix(EnvDocument({'Data': {'RootChunk': {'weatherStates': states, 'weatherStateTransitions': transitions}}}))
+
+
+def test_rows_are_sources_and_columns_targets():
+    matrix = make_matrix(['a', 'b', 'c'], [('a', 'b'), ('b', 'c')])
+    assert matrix.matrix.tolist() == [[False, True, False], [False, False, True], [False, False, False]]
+    assert matrix.changes() == ([], [])
+
+
+def test_set_rows_and_columns():
+    matrix = make_matrix(['a', 'b', 'c'], [('a', 'b'), ('b', 'c')])
+    matrix.set_rows([0], True)
+    assert matrix.changes() == ([(0, 0), (0, 2)], [])
+    matrix.set_columns([2], False)
+    assert matrix.changes() == ([(0, 0)], [(1, 2)])
+    assert matrix.pending() == ([('a', 'a')], [('b', 'c')])
+    matrix.set_rows([0, 1], False)
+    matrix.set_columns([0, 1], True)
+    assert matrix.matrix[:, :2].all() and not matrix.matrix[:2, 2:].any()
+
+
+def test_symmetrize_adds_every_reverse_edge():
+    matrix = make_matrix(['a', 'b', 'c'], [('a', 'b'), ('b', 'c'), ('c', 'c')])
+    matrix.symmetrize()
+    assert (matrix.matrix == matrix.matrix.T).all()
+    assert matrix.pending() == ([('b', 'a'), ('c', 'b')], [])
+    matrix.symmetrize()
+    assert matrix.pending() == ([('b', 'a'), ('c', 'b')], [])
+
+
+def test_copy_pattern_and_pairs():
+    matrix = make_matrix(['a', 'b', 'c', 'd'], [('a', 'b'), ('c', 'a')])
+    matrix.copy_pattern(0, [0, 3])
+    assert matrix.matrix[3].tolist() == [False, True, False, False]
+    assert matrix.matrix[:, 3].tolist() == [False, False, True, False]
+    matrix.set_pairs([('a', 'b'), ('missing', 'a')], False)
+    added, removed = matrix.changes()
+    assert added == [(2, 3), (3, 1)] and removed == [(0, 1)]
+    assert matrix.state_pairs(removed) == [(matrix.states[0], matrix.states[1])]
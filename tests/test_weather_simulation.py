@@ -0,0 +1,64 @@
+import pytest
+from env_document import EnvDocument
+from env_ops import make_curve, new_state
+from transition_graph import make_transition
+
+np = pytest.importorskip('numpy')
+
+from weather_simulation import WeatherModel, simulate
+
+
+def make_document(durations, edges):
+    # durations maps state names to fixed hours; edges are (source, target)
+    # names. Without transition durations no time goes to blending.
+    states = []
+    for handle_id, (name, hours) in enumerate(durations.items()):
+        state = new_state(name, handle_id=str(handle_id))
+        state['Data']['minDuration'] = make_curve(hours)
+        state['Data']['maxDuration'] = make_curve(hours)
+        state['Data']['probability'] = make_curve(1.0)
+        state['Data']['transitionDuration'] = None
+        states.append(state)
+    ids = {state['Data']['name']['$value']: state['HandleId'] for state in states}
+    transitions = [make_transition(ids[source], ids[target]) for source, target in edges]
+    return EnvDocument({'Data': {'RootChunk': {'weatherStates': states, 'weatherStateTransitions': transitions}}})
+
+
+def test_fixed_durations_split_the_time_by_length():
+    document = make_document({'short': 2.0, 'long': 6.0}, [('short', 'long'), ('long', 'short')])
+    result = simulate(document, days=200, chains=20, seed=1)
+    assert result.days == 200
+    assert result.occupancy == pytest.approx([0.25, 0.75], abs=0.01)
+    assert result.mean_dwell == pytest.approx([2.0, 6.0])
+    assert result.hours.sum() == pytest.approx(200 * 24)
+    assert result.heatmap.sum(axis=0) == pytest.approx(np.ones(24))
+    assert abs(int(result.transitions[0, 1]) - int(result.transitions[1, 0])) <= 20
+    assert not result.dead_ends.any()
+
+
+def test_transition_probabilities_pick_targets():
+    document = make_document({'hub': 1.0, 'often': 1.0, 'rarely': 1.0},
+                             [('hub', 'often'), ('hub', 'rarely'), ('often', 'hub'), ('rarely', 'hub')])
+    document.get_state('rarely')['Data']['probability'] = make_curve(0.25)
+    model = WeatherModel(document)
+    assert model.degree.tolist() == [2, 1, 1]
+    result = simulate(model, days=500, chains=50, seed=2)
+    often, rarely = result.transitions[0, 1], result.transitions[0, 2]
+    assert rarely / (often + rarely) == pytest.approx(0.2, abs=0.03)
+
+
+def test_states_without_transitions_are_dead_ends():
+    document = make_document({'stuck': 3.0, 'other': 1.0}, [('other', 'stuck')])
+    result = simulate(document, days=10, chains=5, start='stuck', seed=3)
+    assert result.occupancy[0] == pytest.approx(1.0)
+    assert result.dead_ends[0] > 0
+    with pytest.raises(ValueError):
+        simulate(document, days=10, start='missing')
+
+
+def test_a_seed_makes_runs_repeatable():
+    document = make_document({'a': 1.5, 'b': 2.5, 'c': 4.0}, [('a', 'b'), ('b', 'c'), ('c', 'a'), ('a', 'c')])
+    first = simulate(document, days=50, chains=10, seed=4).to_json()
+    second = simulate(document, days=50, chains=10, seed=4).to_json()
+    first.pop('seconds'), second.pop('seconds')
+    assert first == second
@@ -0,0 +1,100 @@
+def make_transition(source_id, target_id):
+    return {
+        "HandleId": "0",
+        "Data": {
+            "$type": "worldWeatherStateTransition",
+            "probability": None,
+            "sourceWeatherState": {
+                "HandleRefId": source_id
+            },
+            "targetWeatherState": {
+                "HandleRefId": target_id
+            },
+            "transitionDuration": None
+        }
+    }
+
+
+def transition_key(transition):
+    data = transition['Data']
+    return data['sourceWeatherState']['HandleRefId'], data['targetWeatherState']['HandleRefId']
+
+
+class TransitionGraph:
+    # Edges are kept in an insertion ordered dict keyed by (source, target)
+    # HandleId, with outgoing/incoming adjacency sets on the side, so reading
+    # or rewriting the edges of one state only touches that state's degree.
+    def __init__(self, transitions=()):
+        self.edges = {}
+        self.outgoing = {}
+        self.incoming = {}
+        self.dirty = False
+        for transition in transitions:
+            key = transition_key(transition)
+            if key not in self.edges:
+                self._link(key, transition)
+
+    def __len__(self):
+        return len(self.edges)
+
+    def _link(self, key, transition):
+        source_id, target_id = key
+        self.edges[key] = transition
+        self.outgoing.setdefault(source_id, set()).add(target_id)
+        self.incoming.setdefault(target_id, set()).add(source_id)
+
+    def targets(self, source_id):
+        return self.outgoing.get(source_id, set())
+
+    def sources(self, target_id):
+        return self.incoming.get(target_id, set())
+
+    def has_edge(self, source_id, target_id):
+        return (source_id, target_id) in self.edges
+
+    def get(self, source_id, target_id):
+        return self.edges.get((source_id, target_id))
+
+    def add(self, source_id, target_id, transition=None):
+        key = (source_id, target_id)
+        if key in self.edges:
+            return self.edges[key]
+        if transition is None:
+            transition = make_transition(source_id, target_id)
+        self._link(key, transition)
+        self.dirty = True
+        return transition
+
+    def remove(self, source_id, target_id):
+        transition = self.edges.pop((source_id, target_id), None)
+        if transition is None:
+            return None
+        self.outgoing[source_id].discard(target_id)
+        self.incoming[target_id].discard(source_id)
+        self.dirty = True
+        return transition
+
+    def remove_state(self, handle_id):
+        removed = []
+        for target_id in list(self.targets(handle_id)):
+            removed.append(self.remove(handle_id, target_id))
+        for source_id in list(self.sources(handle_id)):
+            removed.append(self.remove(source_id, handle_id))
+        return removed
+
+    def set_targets(self, source_id, target_ids):
+        target_ids = list(dict.fromkeys(target_ids))
+        for target_id in self.targets(source_id) - set(target_ids):
+            self.remove(source_id, target_id)
+        for target_id in target_ids:
+            self.add(source_id, target_id)
+
+    def set_sources(self, target_id, source_ids):
+        source_ids = list(dict.fromkeys(source_ids))
+        for source_id in self.sources(target_id) - set(source_ids):
+            self.remove(source_id, target_id)
+        for source_id in source_ids:
+            self.add(source_id, target_id)
+
+    def to_transitions(self):
+        return list(self.edges.values())
@@ -0,0 +1,83 @@
+from env_loader import gc_paused
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NUMPY_MISSING = "The transition matrix needs NumPy: pip install numpy"
+
+
+class TransitionMatrix:
+    # weatherStateTransitions as an N×N boolean matrix, row = source state,
+    # column = target state, in weatherStates order. Bulk actions are array
+    # operations; changes() diffs against the document's edges in one pass.
+    def __init__(self, document):
+        if np is None:
+            raise ImportError(NUMPY_MISSING)
+        states = document.weather_states
+        self.names = [state['Data']['name']['$value'] for state in states]
+        self.states = list(states)
+        self.rows = {}
+        for row, name in enumerate(self.names):
+            self.rows.setdefault(name, row)
+        row_by_id = {}
+        for row, state in enumerate(states):
+            row_by_id.setdefault(state['HandleId'], row)
+
+        edges = [(row_by_id[source_id], row_by_id[target_id]) for source_id, target_id in document.graph.edges
+                 if source_id in row_by_id and target_id in row_by_id]
+        size = len(self.names)
+        self.original = np.zeros((size, size), dtype=bool)
+        if edges:
+            sources, targets = zip(*edges)
+            self.original[list(sources), list(targets)] = True
+        self.matrix = self.original.copy()
+
+    def __len__(self):
+        return len(self.names)
+
+    def toggle(self, row, column):
+        self.matrix[row, column] = not self.matrix[row, column]
+
+    def set_rows(self, rows, value):
+        self.matrix[rows, :] = value
+
+    def set_columns(self, columns, value):
+        self.matrix[:, columns] = value
+
+    def symmetrize(self):
+        # Every edge gets its reverse
+        self.matrix |= self.matrix.T
+
+    def copy_pattern(self, source, rows):
+        # The listed states get the sources and targets of the source state
+        rows = [row for row in rows if row != source]
+        if not rows:
+            return
+        self.matrix[rows, :] = self.matrix[source, :]
+        self.matrix[:, rows] = self.matrix[:, [source]]
+
+    def changes(self):
+        # (added, removed) lists of (source, target) row pairs
+        added = np.argwhere(self.matrix & ~self.original)
+        removed = np.argwhere(self.original & ~self.matrix)
+        with gc_paused():
+            return list(zip(*added.T.tolist())), list(zip(*removed.T.tolist()))
+
+    def pending(self):
+        # The same changes by state name, to carry over to a new document
+        added, removed = self.changes()
+        return ([(self.names[source], self.names[target]) for source, target in added],
+                [(self.names[source], self.names[target]) for source, target in removed])
+
+    def set_pairs(self, pairs, value):
+        rows = [(self.rows[source], self.rows[target]) for source, target in pairs
+                if source in self.rows and target in self.rows]
+        if rows:
+            sources, targets = zip(*rows)
+            self.matrix[list(sources), list(targets)] = value
+
+    def state_pairs(self, pairs):
+        with gc_paused():
+            return [(self.states[source], self.states[target]) for source, target in pairs]
@@ -1,13 +1,16 @@
 import tkinter as tk
 from tkinter import messagebox
-from tkinter import ttk
-import json
 import os
-import threading
-import time
+from background_reload import BackgroundReloader
+from checklist import VirtualChecklist
+from edit_history import TransitionsEdit
+from env_document import EnvDocument
+from file_watcher import shared_watcher
+from listbox_sync import sync_listbox
+from perf_log import timed
 
 class EditTransitionsApp:
-    def __init__(self, root):
+    def __init__(self, root, session=None):
         self.root = root
         self.root.title("Edit Weather Transitions")
 
@@ -16,8 +19,17 @@ class EditTransitionsApp:
         self.root.minsize(700, 300)
         self.root.maxsize(1920, 2160)
 
-        self.env_file_path = self.get_env_file_path()
-        self.data = self.load_json(self.env_file_path)
+        # Inside the main window's process the document is shared, not loaded
+        self.session = session
+        if session:
+            self.env_file_path = session.env_file_path
+            self.document = session.document
+        else:
+            self.env_file_path = self.get_env_file_path()
+            self.document = self.load_json(self.env_file_path)
+
+        self.root.bind("<Control-z>", lambda event: self.undo())
+        self.root.bind("<Control-y>", lambda event: self.redo())
 
         # Create frames for the headers and listboxes
         left_frame = tk.Frame(root)
@@ -51,33 +63,14 @@ class EditTransitionsApp:
         self.right_header = tk.Label(right_frame, text="Select Target States")
         self.right_header.pack(pady=(0, 5))
 
-        # Add scrollbars to the left and right frames
-        left_scrollbar = tk.Scrollbar(left_frame, orient=tk.VERTICAL, width=20)
-        left_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-        right_scrollbar = tk.Scrollbar(right_frame, orient=tk.VERTICAL, width=20)
-        right_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
         self.left_listbox = tk.Listbox(middle_frame)
         self.left_listbox.pack(fill=tk.BOTH, expand=True, pady=0)
 
-        self.preceding_vars = {}
-        self.target_vars = {}
-        self.current_transitions = self.load_current_transitions()
-
-        left_canvas = tk.Canvas(left_frame, yscrollcommand=left_scrollbar.set)
-        left_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        left_scrollbar.config(command=left_canvas.yview)
-
-        left_inner_frame = tk.Frame(left_canvas)
-        left_canvas.create_window((0, 0), window=left_inner_frame, anchor='nw')
-
-        right_canvas = tk.Canvas(right_frame, yscrollcommand=right_scrollbar.set)
-        right_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        right_scrollbar.config(command=right_canvas.yview)
-
-        right_inner_frame = tk.Frame(right_canvas)
-        right_canvas.create_window((0, 0), window=right_inner_frame, anchor='nw')
+        # Source and target checkboxes only draw the rows in view
+        self.preceding_list = VirtualChecklist(left_frame, self.on_checkbox_select)
+        self.target_list = VirtualChecklist(right_frame, self.on_checkbox_select)
+        left_canvas = self.preceding_list.canvas
+        right_canvas = self.target_list.canvas
 
         # Bind mouse wheel events to the canvases for scrolling
         left_canvas.bind("<Enter>", lambda event: self._bind_mousewheel(event, left_canvas))
@@ -86,20 +79,11 @@ class EditTransitionsApp:
         right_canvas.bind("<Enter>", lambda event: self._bind_mousewheel(event, right_canvas))
         right_canvas.bind("<Leave>", lambda event: self._unbind_mousewheel(event))
 
-        for state in self.data['Data']['RootChunk']['weatherStates']:
-            var = tk.BooleanVar()
-            chk = ttk.Checkbutton(left_inner_frame, text=state['Data']['name']['$value'], variable=var, command=self.on_checkbox_select)
-            chk.pack(anchor='w', padx=10, pady=0)
-            self.preceding_vars[state['Data']['name']['$value']] = var
+        self.populate_checkboxes()
+        self.update_save_button()
 
-        for state in self.data['Data']['RootChunk']['weatherStates']:
-            var = tk.BooleanVar()
-            chk = ttk.Checkbutton(right_inner_frame, text=state['Data']['name']['$value'], variable=var, command=self.on_checkbox_select)
-            chk.pack(anchor='w', padx=10, pady=0)
-            self.target_vars[state['Data']['name']['$value']] = var
-
-        for state in self.data['Data']['RootChunk']['weatherStates']:
-            self.left_listbox.insert(tk.END, state['Data']['name']['$value'])
+        for name in self.document.state_names():
+            self.left_listbox.insert(tk.END, name)
 
         self.left_listbox.bind('<<ListboxSelect>>', self.on_left_listbox_select)
 
@@ -109,12 +93,16 @@ class EditTransitionsApp:
         root.grid_columnconfigure(1, weight=1, minsize=200)
         root.grid_columnconfigure(2, weight=1, minsize=200)
 
-        # Update scrollregion when the inner frames change size
-        left_inner_frame.bind("<Configure>", lambda e: left_canvas.configure(scrollregion=left_canvas.bbox("all")))
-        right_inner_frame.bind("<Configure>", lambda e: right_canvas.configure(scrollregion=right_canvas.bbox("all")))
+        if session:
+            session.subscribe(self.on_document_changed)
+        else:
+            self.reloader = BackgroundReloader(self.root, self.on_reloaded, self.on_reload_failed)
+            shared_watcher().subscribe(self.env_file_path, self.on_file_changed)
 
-        self.watch_thread = threading.Thread(target=self.watch_file, daemon=True)
-        self.watch_thread.start()
+    def populate_checkboxes(self):
+        state_names = self.document.state_names()
+        self.preceding_list.set_names(state_names)
+        self.target_list.set_names(state_names)
 
     def _bind_mousewheel(self, event, canvas):
         canvas.bind_all("<MouseWheel>", lambda e: self._on_mousewheel(e, canvas))
@@ -135,144 +123,97 @@ class EditTransitionsApp:
 
     def load_json(self, file_path):
         try:
-            with open(file_path, 'r') as file:
-                return json.load(file)
+            return EnvDocument.load(file_path, lazy=True, cache=True)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load JSON file: {e}")
-            return {}
+            return EnvDocument()
 
     def save_json(self, file_path):
         try:
-            with open(file_path, 'w') as file:
-                json.dump(self.data, file, indent=4)
+            self.document.save(file_path)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save JSON file: {e}")
 
-    def watch_file(self):
-        last_modified_time = os.path.getmtime(self.env_file_path)
-        self.stop_watching = False
-        while not self.stop_watching:
-            time.sleep(1)
-            current_modified_time = os.path.getmtime(self.env_file_path)
-            if current_modified_time != last_modified_time:
-                last_modified_time = current_modified_time
-                self.reload_json()
+    def on_file_changed(self, path):
+        self.reload_json()
 
     def reload_json(self):
-        self.data = self.load_json(self.env_file_path)
+        self.reloader.request(self.env_file_path)
+
+    def on_reloaded(self, file_path, document):
+        self.document = document
         self.update_ui()
 
+    def on_reload_failed(self, file_path, error):
+        messagebox.showerror("Error", f"Failed to load JSON file: {error}")
+
+    @timed('update_ui')
     def update_ui(self):
-        self.left_listbox.delete(0, tk.END)
-        for state in self.data['Data']['RootChunk']['weatherStates']:
-            self.left_listbox.insert(tk.END, state['Data']['name']['$value'])
-        self.current_transitions = self.load_current_transitions()
-
-    def load_current_transitions(self):
-        transitions = {}
-        for transition in self.data['Data']['RootChunk']['weatherStateTransitions']:
-            source_id = transition['Data']['sourceWeatherState']['HandleRefId']
-            target_id = transition['Data']['targetWeatherState']['HandleRefId']
-            if source_id not in transitions:
-                transitions[source_id] = []
-            transitions[source_id].append(target_id)
-        return transitions
+        sync_listbox(self.left_listbox, self.document.state_names())
+        if self.target_list.names != self.document.state_names():
+            self.populate_checkboxes()
+        # The selected state survives the update; show its new transitions
+        self.on_left_listbox_select(None)
+        self.update_save_button()
+
+    def update_save_button(self):
+        # A json that failed to load is never written back over the file
+        self.confirm_button.config(state=tk.NORMAL if self.document.loaded else tk.DISABLED)
+
+    def on_document_changed(self, document, source):
+        if source is self:
+            return
+        self.env_file_path = self.session.env_file_path
+        self.document = document
+        self.update_ui()
 
+    def notify_session(self):
+        if self.session:
+            self.session.notify(self)
+
+    @timed('on_left_listbox_select')
     def on_left_listbox_select(self, event):
         selected_index = self.left_listbox.curselection()
         if selected_index:
             selected_state = self.left_listbox.get(selected_index)
             source_state_id = self.get_state_id_by_name(selected_state)
 
-            for state_name, var in self.preceding_vars.items():
-                var.set(False)
-
-            for state_name, var in self.target_vars.items():
-                var.set(False)
-
-            for transition in self.data['Data']['RootChunk']['weatherStateTransitions']:
-                if transition['Data']['targetWeatherState']['HandleRefId'] == source_state_id:
-                    preceding_state_name = self.get_state_name_by_id(transition['Data']['sourceWeatherState']['HandleRefId'])
-                    self.preceding_vars[preceding_state_name].set(True)
-
-            if source_state_id in self.current_transitions:
-                for target_state_id in self.current_transitions[source_state_id]:
-                    target_state_name = self.get_state_name_by_id(target_state_id)
-                    self.target_vars[target_state_name].set(True)
+            self.preceding_list.set_checked(self.get_state_name_by_id(preceding_state_id)
+                                            for preceding_state_id in self.document.graph.sources(source_state_id))
+            self.target_list.set_checked(self.get_state_name_by_id(target_state_id)
+                                         for target_state_id in self.document.graph.targets(source_state_id))
 
     def on_checkbox_select(self):
         selected_index = self.left_listbox.curselection()
         if selected_index:
             source_state_name = self.left_listbox.get(selected_index)
-            source_state_id = self.get_state_id_by_name(source_state_name)
+            self.apply_checkboxes(source_state_name)
+            self.notify_session()
+
+    def apply_checkboxes(self, state_name):
+        # Only the edges touching the selected state are rewritten
+        selected_preceding = [self.document.get_state(name) for name in self.preceding_list.checked_names()]
+        selected_targets = [self.document.get_state(name) for name in self.target_list.checked_names()]
+        self.document.history.perform(TransitionsEdit(self.document.get_state(state_name), selected_preceding, selected_targets))
 
-            selected_targets = [name for name, var in self.target_vars.items() if var.get()]
-            self.current_transitions[source_state_id] = [self.get_state_id_by_name(name) for name in selected_targets]
+    def undo(self):
+        if self.document.history.undo():
+            self.update_ui()
+            self.notify_session()
 
-            selected_preceding = [name for name, var in self.preceding_vars.items() if var.get()]
-            for name in selected_preceding:
-                preceding_state_id = self.get_state_id_by_name(name)
-                if preceding_state_id not in self.current_transitions:
-                    self.current_transitions[preceding_state_id] = []
-                if source_state_id not in self.current_transitions[preceding_state_id]:
-                    self.current_transitions[preceding_state_id].append(source_state_id)
+    def redo(self):
+        if self.document.history.redo():
+            self.update_ui()
+            self.notify_session()
 
     def save_changes(self):
-        new_transitions = []
         selected_index = self.left_listbox.curselection()
         if selected_index:
             selected_state_name = self.left_listbox.get(selected_index)
-            selected_state_id = self.get_state_id_by_name(selected_state_name)
-
-            for state_name, var in self.preceding_vars.items():
-                if var.get():
-                    source_state_id = self.get_state_id_by_name(state_name)
-                    transition = {
-                        "HandleId": "0",
-                        "Data": {
-                            "$type": "worldWeatherStateTransition",
-                            "probability": None,
-                            "sourceWeatherState": {
-                                "HandleRefId": source_state_id
-                            },
-                            "targetWeatherState": {
-                                "HandleRefId": selected_state_id
-                            },
-                            "transitionDuration": None
-                        }
-                    }
-                    new_transitions.append(transition)
-
-            for state_name, var in self.target_vars.items():
-                if var.get():
-                    target_state_id = self.get_state_id_by_name(state_name)
-                    transition = {
-                        "HandleId": "0",
-                        "Data": {
-                            "$type": "worldWeatherStateTransition",
-                            "probability": None,
-                            "sourceWeatherState": {
-                                "HandleRefId": selected_state_id
-                            },
-                            "targetWeatherState": {
-                                "HandleRefId": target_state_id
-                            },
-                            "transitionDuration": None
-                        }
-                    }
-                    new_transitions.append(transition)
-
-            # Remove transitions related to the selected state that are not in the new transitions
-            self.data['Data']['RootChunk']['weatherStateTransitions'] = [
-                t for t in self.data['Data']['RootChunk']['weatherStateTransitions']
-                if not (t['Data']['sourceWeatherState']['HandleRefId'] == selected_state_id or
-                        t['Data']['targetWeatherState']['HandleRefId'] == selected_state_id)
-            ]
-
-            self.data['Data']['RootChunk']['weatherStateTransitions'].extend(new_transitions)
-
-        self.ensure_unique_handle_ids()
+            self.apply_checkboxes(selected_state_name)
+
         self.save_json(self.env_file_path)
+        self.notify_session()
 
         self.confirm_label.config(text="Changes saved successfully!")
         self.root.after(3000, self.clear_confirmation)
@@ -281,96 +222,17 @@ class EditTransitionsApp:
         self.confirm_label.config(text="")
 
     def get_state_id_by_name(self, name):
-        for state in self.data['Data']['RootChunk']['weatherStates']:
-            if state['Data']['name']['$value'] == name:
-                return state['HandleId']
-        return None
+        return self.document.get_handle_id(name)
 
     def get_state_name_by_id(self, id):
-        for state in self.data['Data']['RootChunk']['weatherStates']:
-            if state['HandleId'] == id:
-                return state['Data']['name']['$value']
-        return None
-
-    def remove_duplicates(self, transitions):
-        unique_transitions = []
-        seen = set()
-        for transition in transitions:
-            source_id = transition['Data']['sourceWeatherState']['HandleRefId']
-            target_id = transition['Data']['targetWeatherState']['HandleRefId']
-            if (source_id, target_id) not in seen:
-                seen.add((source_id, target_id))
-                unique_transitions.append(transition)
-        return unique_transitions
-
-    def ensure_unique_handle_ids(self):
-        handle_id = 0
-        handle_id_map = {}
-
-        # Assign unique HandleIds to weatherStates
-        for state in self.data['Data']['RootChunk']['weatherStates']:
-            state['HandleId'] = str(handle_id)
-            handle_id_map[state['HandleId']] = handle_id
-            handle_id += 1
-
-        # Assign unique HandleIds to weatherStateTransitions
-        for transition in self.data['Data']['RootChunk']['weatherStateTransitions']:
-            transition['HandleId'] = str(handle_id)
-            handle_id_map[transition['HandleId']] = handle_id
-            handle_id += 1
-
-        # Assign unique HandleIds to other elements
-        for key, value in self.data['Data']['RootChunk'].items():
-            if key not in ['weatherStates', 'weatherStateTransitions']:
-                if isinstance(value, list):
-                    for item in value:
-                        if 'HandleId' in item:
-                            item['HandleId'] = str(handle_id)
-                            handle_id_map[item['HandleId']] = handle_id
-                            handle_id += 1
-
-        # Update HandleRefIds to match new HandleIds
-        def update_handle_ref_ids(data):
-            if isinstance(data, dict):
-                for key, value in data.items():
-                    if key == 'HandleRefId' and value in handle_id_map:
-                        data[key] = str(handle_id_map[value])
-                    else:
-                        update_handle_ref_ids(value)
-            elif isinstance(data, list):
-                for item in data:
-                    update_handle_ref_ids(item)
-
-        update_handle_ref_ids(self.data['Data']['RootChunk'])
-
-        # Update HandleRefIds in weatherStateTransitions
-        for transition in self.data['Data']['RootChunk']['weatherStateTransitions']:
-            source_id = transition['Data']['sourceWeatherState']['HandleRefId']
-            target_id = transition['Data']['targetWeatherState']['HandleRefId']
-            if source_id in handle_id_map:
-                transition['Data']['sourceWeatherState']['HandleRefId'] = str(handle_id_map[source_id])
-            if target_id in handle_id_map:
-                transition['Data']['targetWeatherState']['HandleRefId'] = str(handle_id_map[target_id])
-
-        # Ensure HandleIds for worldRenderSettings are updated
-        for area in self.data['Data']['RootChunk']['worldRenderSettings']['areaParameters']:
-            area['HandleId'] = str(handle_id)
-            handle_id_map[area['HandleId']] = handle_id
-            handle_id += 1
-
-            # Update HandleIds for hdrMode and mode
-            if 'hdrMode' in area['Data']:
-                area['Data']['hdrMode']['HandleId'] = str(handle_id)
-                handle_id_map[area['Data']['hdrMode']['HandleId']] = handle_id
-                handle_id += 1
-
-            if 'mode' in area['Data']:
-                area['Data']['mode']['HandleId'] = str(handle_id)
-                handle_id_map[area['Data']['mode']['HandleId']] = handle_id
-                handle_id += 1
+        return self.document.get_state_name(id)
 
     def on_closing(self):
-        self.stop_watching = True
+        if self.session:
+            self.session.unsubscribe(self.on_document_changed)
+        else:
+            shared_watcher().unsubscribe(self.env_file_path, self.on_file_changed)
+            self.reloader.stop()
         self.root.destroy()
 
 if __name__ == "__main__":
@@ -0,0 +1,295 @@
+# Monte Carlo runs of the weather state machine in an env.json, to see what
+# probability/minDuration/maxDuration/transitionDuration add up to without
+# playing for hours. Many chains run side by side as NumPy arrays; each step
+# draws every chain's next state and duration at once.
+#
+#   python -m weather_simulation env.json --days 10000 --seed 1
+#
+# The model: a state lasts a duration drawn uniformly between its
+# minDuration and maxDuration at the time it's entered (one bound null means
+# a fixed duration, both null DEFAULT_DURATION). It then moves along one of
+# its weatherStateTransitions, picked with the transition's probability at
+# that time of day, or the target state's when the transition has none. The
+# transitionDuration (the transition's, else the target's) is spent blending
+# into the target and counts as time in the target. A state without a usable
+# transition starts over in itself and counts as a dead end. Durations are
+# in in-game hours; curves are sampled per minute.
+import argparse, json, math, sys, time
+from curves import CurveStore
+from env_document import EnvDocument
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NUMPY_MISSING = "The weather simulation needs NumPy: pip install numpy"
+
+DAY = 24
+MINUTES = DAY * 60
+DEFAULT_DURATION = 1.0
+MIN_DURATION = 1 / 60
+
+
+class WeatherModel:
+    # The document's states and transitions as per-minute tables: one row per
+    # state, one column per minute of the day, and the transitions as a padded
+    # [state, slot] table of target rows
+    def __init__(self, document):
+        if np is None:
+            raise ImportError(NUMPY_MISSING)
+        states = document.weather_states
+        self.names = [state['Data']['name']['$value'] for state in states]
+        rows = {}
+        for row, state in enumerate(states):
+            rows.setdefault(state['HandleId'], row)
+
+        def table(curves):
+            return CurveStore(curves).day(1)
+
+        self.min_duration = table(state['Data'].get('minDuration') for state in states)
+        self.max_duration = table(state['Data'].get('maxDuration') for state in states)
+        self.probability = table(state['Data'].get('probability') for state in states)
+        self.transition_duration = table(state['Data'].get('transitionDuration') for state in states)
+
+        # Transitions with curves of their own get a row in the edge tables;
+        # row 0 is all nan and stands for "use the target state's curve"
+        targets = [[] for _ in states]
+        own = [[] for _ in states]
+        own_curves = []
+        for (source_id, target_id), transition in document.graph.edges.items():
+            if source_id not in rows or target_id not in rows:
+                continue
+            data = transition['Data']
+            targets[rows[source_id]].append(rows[target_id])
+            if data.get('probability') is not None or data.get('transitionDuration') is not None:
+                own_curves.append((data.get('probability'), data.get('transitionDuration')))
+                own[rows[source_id]].append(len(own_curves))
+            else:
+                own[rows[source_id]].append(0)
+        self.edge_probability = table([None] + [probability for probability, _ in own_curves])
+        self.edge_duration = table([None] + [duration for _, duration in own_curves])
+
+        slots = max((len(row) for row in targets), default=0) or 1
+        self.degree = np.array([len(row) for row in targets], dtype=np.int64)
+        self.targets = np.zeros((len(states), slots), dtype=np.int64)
+        self.own = np.zeros((len(states), slots), dtype=np.int64)
+        for row, (row_targets, row_own) in enumerate(zip(targets, own)):
+            self.targets[row, :len(row_targets)] = row_targets
+            self.own[row, :len(row_own)] = row_own
+
+    def __len__(self):
+        return len(self.names)
+
+    def durations(self, states, minutes, rng):
+        low = self.min_duration[states, minutes]
+        high = self.max_duration[states, minutes]
+        low, high = np.where(np.isnan(low), high, low), np.where(np.isnan(high), low, high)
+        low, high = np.fmin(low, high), np.fmax(low, high)
+        duration = low + rng.random(len(states)) * (high - low)
+        return np.maximum(np.nan_to_num(duration, nan=DEFAULT_DURATION), MIN_DURATION)
+
+    def next_states(self, states, minutes, rng):
+        # (target, blend hours, dead end) for every chain
+        slots = self.targets.shape[1]
+        targets = self.targets[states]
+        own = self.own[states]
+        column = minutes[:, None]
+        weights = self.edge_probability[own, column]
+        weights = np.where(np.isnan(weights), self.probability[targets, column], weights)
+        weights = np.where(np.arange(slots) < self.degree[states, None], np.nan_to_num(weights), 0)
+        weights = np.clip(weights, 0, None)
+        cumulative = np.cumsum(weights, axis=1)
+        total = cumulative[:, -1]
+        dead_end = total <= 0
+        picks = (cumulative <= (rng.random(len(states)) * total)[:, None]).sum(axis=1)
+        picks = np.minimum(picks, slots - 1)
+        chosen = np.take_along_axis(targets, picks[:, None], axis=1)[:, 0]
+        blend = self.edge_duration[np.take_along_axis(own, picks[:, None], axis=1)[:, 0], minutes]
+        blend = np.where(np.isnan(blend), self.transition_duration[chosen, minutes], blend)
+        blend = np.clip(np.nan_to_num(blend), 0, None)
+        return np.where(dead_end, states, chosen), np.where(dead_end, 0, blend), dead_end
+
+
+def hours_before(times):
+    # Hours spent in each hour of the day between time 0 and times, shape (n, 24)
+    days, hour = np.divmod(times, DAY)
+    return days[:, None] + np.clip(hour[:, None] - np.arange(DAY), 0, 1)
+
+
+class SimulationResult:
+    def __init__(self, names, days):
+        size = len(names)
+        self.names = names
+        self.days = days
+        self.hours = np.zeros(size)
+        self.visits = np.zeros(size, dtype=np.int64)
+        self.dwell_hours = np.zeros(size)
+        self.dead_ends = np.zeros(size, dtype=np.int64)
+        self.transitions = np.zeros((size, size), dtype=np.int64)
+        self.hour_of_day = np.zeros((size, DAY))
+        self.seconds = 0.0
+
+    @property
+    def occupancy(self):
+        # Share of all simulated time spent in each state
+        total = self.hours.sum()
+        return self.hours / total if total else self.hours
+
+    @property
+    def mean_dwell(self):
+        # Mean hours per visit, nan for states never entered
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.dwell_hours / self.visits
+
+    @property
+    def heatmap(self):
+        # Share of each hour of the day spent in each state; columns sum to 1
+        return self.hour_of_day / self.days if self.days else self.hour_of_day
+
+    def top_transitions(self, count=20):
+        order = np.argsort(self.transitions, axis=None)[::-1][:count]
+        pairs = []
+        for source, target in zip(*np.unravel_index(order, self.transitions.shape)):
+            if self.transitions[source, target]:
+                pairs.append((self.names[source], self.names[target], int(self.transitions[source, target])))
+        return pairs
+
+    def to_json(self):
+        occupancy, dwell, heatmap = self.occupancy, self.mean_dwell, self.heatmap
+        return {
+            'days': self.days,
+            'seconds': round(self.seconds, 3),
+            'states': [{
+                'name': name,
+                'occupancy': float(occupancy[row]),
+                'visits_per_day': float(self.visits[row] / self.days),
+                'mean_dwell_hours': None if math.isnan(dwell[row]) else float(dwell[row]),
+                'dead_ends': int(self.dead_ends[row]),
+                'hour_of_day': heatmap[row].round(4).tolist(),
+            } for row, name in enumerate(self.names)],
+            'transitions': [{'source': source, 'target': target, 'count': count}
+                            for source, target, count in self.top_transitions(int(np.count_nonzero(self.transitions)))],
+        }
+
+
+def simulate(document, days=10000, chains=1000, warmup=24.0, start=None, seed=None):
+    # Runs chains side by side for days / chains days each, after warmup hours
+    # that aren't counted; every chain starts at midnight in start, or in a
+    # random state with transitions
+    model = document if isinstance(document, WeatherModel) else WeatherModel(document)
+    rng = np.random.default_rng(seed)
+    began = time.perf_counter()
+    chains = max(1, min(chains, days))
+    per_chain = math.ceil(days / chains)
+    result = SimulationResult(model.names, chains * per_chain)
+    if not len(model):
+        return result
+    end = warmup + per_chain * DAY
+
+    if start is not None:
+        if start not in model.names:
+            raise ValueError(f"Unknown weather state: {start}")
+        states = np.full(chains, model.names.index(start), dtype=np.int64)
+    else:
+        candidates = np.flatnonzero(model.degree > 0)
+        if not len(candidates):
+            candidates = np.arange(len(model))
+        states = rng.choice(candidates, chains)
+    times = np.zeros(chains)
+    blends = np.zeros(chains)
+    size = len(model)
+
+    while len(states):
+        minutes = (np.mod(times, DAY) * 60).astype(np.int64) % MINUTES
+        ends = times + blends + model.durations(states, minutes, rng)
+
+        # The visit's share of the counted window [warmup, end)
+        first, last = np.clip(times, warmup, end), np.clip(ends, warmup, end)
+        result.hours += np.bincount(states, weights=last - first, minlength=size)
+        overlap = hours_before(last) - hours_before(first)
+        for hour in range(DAY):
+            result.hour_of_day[:, hour] += np.bincount(states, weights=overlap[:, hour], minlength=size)
+        counted = (times >= warmup) & (times < end)
+        result.visits += np.bincount(states[counted], minlength=size)
+        result.dwell_hours += np.bincount(states[counted], weights=(ends - times)[counted], minlength=size)
+
+        # Chains whose visit runs past the window are done
+        running = ends < end
+        states, ends = states[running], ends[running]
+        minutes = (np.mod(ends, DAY) * 60).astype(np.int64) % MINUTES
+        targets, blends, dead_end = model.next_states(states, minutes, rng)
+        counted = ends >= warmup
+        result.dead_ends += np.bincount(states[counted & dead_end], minlength=size)
+        moved = counted & ~dead_end
+        result.transitions += np.bincount(states[moved] * size + targets[moved], minlength=size * size).reshape(size, size)
+        states, times = targets, ends
+
+    result.seconds = time.perf_counter() - began
+    return result
+
+
+def heat_bar(shares):
+    # One character per hour, scaled to the state's busiest hour
+    peak = shares.max()
+    return "".join(" .:-=+*#%@"[min(9, int(share / peak * 10))] if peak else " " for share in shares)
+
+
+STATE_HEADER = f"{'state':40} {'share':>7} {'visits/day':>10} {'dwell h':>8} {'dead ends':>9}  hour of day 0-23"
+
+
+def state_rows(result, limit=None):
+    # One text line per state, most common first
+    occupancy, dwell, heatmap = result.occupancy, result.mean_dwell, result.heatmap
+    rows = []
+    for row in np.argsort(-occupancy, kind='stable')[:limit].tolist():
+        dwell_text = "-" if math.isnan(dwell[row]) else f"{dwell[row]:.2f}"
+        rows.append(f"{result.names[row]:40} {occupancy[row]:7.1%} {result.visits[row] / result.days:10.2f} "
+                    f"{dwell_text:>8} {result.dead_ends[row]:9}  |{heat_bar(heatmap[row])}|")
+    return rows
+
+
+def transition_rows(result, limit=20):
+    return [f"{count / result.days:8.3f}/day  {source} -> {target}" for source, target, count in result.top_transitions(limit)]
+
+
+def print_result(result, limit=None):
+    print(f"{result.days} days in {result.seconds:.2f}s")
+    print(STATE_HEADER)
+    for row in state_rows(result, limit):
+        print(row)
+    print("\nmost frequent transitions")
+    for row in transition_rows(result, limit or 20):
+        print(f"  {row}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m weather_simulation',
+                                     description="Simulate the weather states of an env.json over many in-game days.")
+    parser.add_argument('env_file')
+    parser.add_argument('--days', type=int, default=10000, help="simulated days (default 10000)")
+    parser.add_argument('--chains', type=int, default=1000, help="days simulated side by side (default 1000)")
+    parser.add_argument('--warmup', type=float, default=24.0, metavar='HOURS', help="uncounted hours at the start of each chain")
+    parser.add_argument('--start', metavar='STATE', help="state every chain starts in (default: random)")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--top', type=int, metavar='N', help="only show the N most common states and transitions")
+    parser.add_argument('--json', metavar='PATH', help="also write the full results as JSON")
+    args = parser.parse_args(argv)
+    if np is None:
+        print(f"error: {NUMPY_MISSING}", file=sys.stderr)
+        return 1
+    try:
+        document = EnvDocument.load(args.env_file, lazy=True, cache=True)
+        result = simulate(document, args.days, args.chains, args.warmup, args.start, args.seed)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print_result(result, args.top)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(result.to_json(), file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())